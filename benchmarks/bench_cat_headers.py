@@ -0,0 +1,54 @@
+"""
+Benchmark CAT header extraction from large `request.META` dictionaries.
+
+Run with: `python -m benchmarks.bench_cat_headers`
+"""
+
+import os
+import timeit
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.project.settings")
+django.setup()
+
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from cat_service.authentication import CATAuthentication, get_cat_headers  # noqa: E402
+from cat_service.schema import get_cat_header_schema  # noqa: E402
+
+NUMBER = 100_000
+
+
+def make_request(meta_size: int):
+    extra = {f"HTTP_X_FORWARDED_HEADER_{i}": f"value-{i}" for i in range(meta_size)}
+    return RequestFactory().get(
+        "/",
+        HTTP_AUTHORIZATION="CAT foo",
+        HTTP_CAT_IDENTITY="1",
+        HTTP_CAT_SERVICE_NAME="backend",
+        HTTP_CAT_NONCE=b"nonce",
+        **extra,
+    )
+
+
+def run(meta_size: int, *, reject_unrecognized: bool) -> float:
+    request = make_request(meta_size)
+    cat_settings = {"CA_NAME": "ca", "REJECT_UNRECOGNIZED_CAT_HEADERS": reject_unrecognized}
+    with override_settings(CAT_SETTINGS=cat_settings):
+        schema = get_cat_header_schema(CATAuthentication.header_validators)
+        assert len(get_cat_headers(request, schema)) == 3
+        return timeit.timeit(lambda: get_cat_headers(request, schema), number=NUMBER)
+
+
+def main() -> None:
+    print(f"{'META size':>10} | {'prefix scan (us)':>17} | {'targeted (us)':>14}")
+    for meta_size in (10, 30, 60, 100, 200):
+        scan = run(meta_size, reject_unrecognized=True)
+        targeted = run(meta_size, reject_unrecognized=False)
+        size = len(make_request(meta_size).META)
+        print(f"{size:>10} | {scan / NUMBER * 1e6:>17.3f} | {targeted / NUMBER * 1e6:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
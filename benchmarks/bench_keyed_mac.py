@@ -0,0 +1,45 @@
+"""
+Benchmark creating HMACs for short messages with a prepared key compared to `hmac.digest`.
+
+Run with: `python -m benchmarks.bench_keyed_mac`
+"""
+
+import hmac
+import os
+import timeit
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.project.settings")
+django.setup()
+
+from cat_common.cryptography import KeyedHMAC  # noqa: E402
+
+NUMBER = 200_000
+
+
+def main() -> None:
+    key = hmac.digest(b"root", b"service", "sha256").hex().encode()
+    print(f"{'msg size':>8} | {'hmac.digest (us)':>16} | {'hmac.new().copy() (us)':>22} | {'KeyedHMAC (us)':>14}")
+    for size in (16, 64, 128, 512, 4096):
+        msg = b"x" * size
+        prepared_hmac = hmac.new(key, digestmod="sha256")
+        keyed_mac = KeyedHMAC(key, digestmod="sha256")
+        assert keyed_mac.digest(msg) == hmac.digest(key, msg, "sha256")
+
+        def copy_hmac(msg: bytes = msg, prepared_hmac: hmac.HMAC = prepared_hmac) -> bytes:
+            copied = prepared_hmac.copy()
+            copied.update(msg)
+            return copied.digest()
+
+        one_shot = timeit.timeit(lambda msg=msg: hmac.digest(key, msg, "sha256"), number=NUMBER)
+        copied = timeit.timeit(copy_hmac, number=NUMBER)
+        prepared = timeit.timeit(lambda msg=msg, keyed_mac=keyed_mac: keyed_mac.digest(msg), number=NUMBER)
+        print(
+            f"{size:>8} | {one_shot / NUMBER * 1e6:>16.3f} | {copied / NUMBER * 1e6:>22.3f} "
+            f"| {prepared / NUMBER * 1e6:>14.3f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark the MAC backends against HMAC-SHA256 for CAT-sized messages.
+
+Run with: `python -m benchmarks.bench_mac_backends`
+"""
+
+import hmac
+import json
+import os
+import timeit
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.project.settings")
+django.setup()
+
+from cat_common.cryptography import KeyedBLAKE2, KeyedHMAC  # noqa: E402
+
+NUMBER = 200_000
+
+
+def main() -> None:
+    key = hmac.digest(b"root", b"service", "sha256").hex().encode()
+    claims = {"identity": "1234", "service_name": "backend", "nonce": "x" * 22, "valid_until": "1700000000"}
+    msg = json.dumps(claims, sort_keys=True).encode()
+
+    one_shot = timeit.timeit(lambda: hmac.digest(key, msg, "sha256"), number=NUMBER)
+    print(f"{'hmac.digest sha256':>20} | {one_shot / NUMBER * 1e6:>7.3f} us")
+
+    backends = [
+        (KeyedHMAC, "sha256"),
+        (KeyedBLAKE2, "blake2b"),
+        (KeyedBLAKE2, "blake2s"),
+    ]
+    for keyed_mac_class, digestmod in backends:
+        keyed_mac = keyed_mac_class(key, digestmod=digestmod)
+        prepared = timeit.timeit(lambda keyed_mac=keyed_mac: keyed_mac.digest(msg), number=NUMBER)
+        setup = timeit.timeit(
+            lambda keyed_mac_class=keyed_mac_class, digestmod=digestmod: keyed_mac_class(key, digestmod=digestmod),
+            number=NUMBER,
+        )
+        name = f"{keyed_mac_class.__name__} {digestmod}"
+        print(f"{name:>20} | {prepared / NUMBER * 1e6:>7.3f} us | key setup {setup / NUMBER * 1e6:>7.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@
 from cryptography.hazmat.primitives.asymmetric import ed25519
 
 from cat_ca.settings import cat_ca_settings
-from cat_common.cryptography import hmac
+from cat_common.cryptography import encode_key, get_keyed_mac
 from cat_common.settings import cat_common_settings
 
 __all__ = [
@@ -19,12 +19,12 @@
 
 
 def create_cat_verification_key(*, service: str) -> str:
-    return hmac(msg=service, key=cat_ca_settings.CAT_ROOT_KEY)
+    return encode_key(get_keyed_mac(cat_ca_settings.CAT_ROOT_KEY.encode()).derive_key(service))
 
 
 def create_cat_creation_key(*, identity: str, service: str) -> str:
-    verification_key = create_cat_verification_key(service=service)
-    return hmac(msg=identity, key=verification_key)
+    verification_key = get_keyed_mac(cat_ca_settings.CAT_ROOT_KEY.encode()).derive_key(service)
+    return encode_key(get_keyed_mac(verification_key).derive_key(identity))
 
 
 def get_ca_certificate() -> x509.Certificate:
@@ -9,8 +9,9 @@
 
 from cat_ca.validation import validate_issuer
 from cat_common import error_codes
+from cat_common.authentication import get_authorization_header, to_authentication_failed
 from cat_common.cryptography import deserialize_certificate
-from cat_common.utils import get_authorization_header
+from cat_common.exceptions import CATVerificationError
 from cat_common.validation import validate_basic_constraints, validate_key_usage, validate_valid_period
 
 User = get_user_model()
@@ -48,7 +49,10 @@ def has_permission(self, request: Request, view: APIView) -> bool:
             msg = __("Invalid certificate.")
             raise AuthenticationFailed(msg, code=error_codes.INVALID_CERTIFICATE) from error
 
-        for validator in self.certificate_validators:
-            validator(certificate)
+        try:
+            for validator in self.certificate_validators:
+                validator(certificate)
+        except CATVerificationError as error:
+            raise to_authentication_failed(error) from error
 
         return True
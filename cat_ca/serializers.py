@@ -29,6 +29,7 @@ class CATVerificationKeyInputSerializer(serializers.Serializer):
 
 class CATVerificationKeyOutputSerializer(serializers.Serializer):
     verification_key = serializers.CharField()
+    mac_backend = serializers.CharField()
 
 
 class CATCreationKeyInputSerializer(serializers.Serializer):
@@ -37,6 +38,7 @@ class CATCreationKeyInputSerializer(serializers.Serializer):
 
 class CATCreationKeyOutputSerializer(serializers.Serializer):
     creation_key = serializers.CharField()
+    mac_backend = serializers.CharField()
 
 
 class CSRInputSerializer(serializers.Serializer):
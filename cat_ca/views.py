@@ -24,7 +24,7 @@
     CSRInputSerializer,
     CSROutputSerializer,
 )
-from cat_common.cryptography import serialize_certificate
+from cat_common.cryptography import get_mac_backend_name, serialize_certificate
 from cat_common.settings import cat_common_settings
 
 if TYPE_CHECKING:
@@ -79,7 +79,7 @@ def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
 
         verification_key = create_cat_verification_key(service=input_data["type"])
 
-        output_data = {"verification_key": verification_key}
+        output_data = {"verification_key": verification_key, "mac_backend": get_mac_backend_name()}
         response_output = CATVerificationKeyOutputSerializer(data=output_data)
         response_output.is_valid(raise_exception=True)
 
@@ -100,7 +100,8 @@ def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         identify = cat_common_settings.IDENTITY_CONVERTER(request.user.pk)
         creation_key = create_cat_creation_key(identity=identify, service=input_data["service"])
 
-        response_output = CATCreationKeyOutputSerializer(data={"creation_key": creation_key})
+        output_data = {"creation_key": creation_key, "mac_backend": get_mac_backend_name()}
+        response_output = CATCreationKeyOutputSerializer(data=output_data)
         response_output.is_valid(raise_exception=True)
 
         return Response(data=response_output.validated_data, status=200)
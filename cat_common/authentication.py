@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.utils.translation import gettext_lazy as __
+from rest_framework.exceptions import AuthenticationFailed
+
+from cat_common.exceptions import CATVerificationError
+from cat_common.utils import parse_authorization_header
+
+if TYPE_CHECKING:
+    from rest_framework.request import Request
+
+
+__all__ = [
+    "get_authorization_header",
+    "to_authentication_failed",
+]
+
+
+def get_authorization_header(request: Request) -> tuple[str, str]:
+    """
+    Return request's 'Authorization' header, split into the scheme and token.
+
+    :raises AuthenticationFailed: The header is invalid or missing.
+    """
+    try:
+        return parse_authorization_header(request.META.get("HTTP_AUTHORIZATION", ""))
+    except CATVerificationError as error:
+        raise to_authentication_failed(error) from error
+
+
+def to_authentication_failed(error: CATVerificationError) -> AuthenticationFailed:
+    """Convert a `CATVerificationError` to DRF's `AuthenticationFailed` with a translated message."""
+    msg = __(error.message)
+    if error.params is not None:
+        msg %= error.params
+    return AuthenticationFailed(msg, code=error.code)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from cat_common.typing import NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable
+
+    from cat_common.typing import Any
+
+
+__all__ = [
+    "CacheStats",
+    "LRUCache",
+]
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    """How many times a value was found in the cache."""
+    misses: int
+    """How many times a value was not found in the cache, or it had expired."""
+    evictions: int
+    """How many values were removed from the cache to make room for new ones."""
+    expirations: int
+    """How many values were removed from the cache because they had expired."""
+    size: int
+    """Number of values currently in the cache."""
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with a bounded size and an optional time-to-live for the values.
+    If `maxsize` is zero or less, the cache is disabled.
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float | None = None) -> None:
+        """
+        Create a new cache.
+
+        :param maxsize: Maximum number of values to keep in the cache.
+        :param ttl: How long values are kept in the cache in seconds. If `None`, values don't expire.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+        self._expirations: int = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return default
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, *, ttl: float | None = None) -> None:
+        """
+        Set a value to the cache.
+
+        :param key: Key for the value.
+        :param value: The value to cache.
+        :param ttl: How long the value is kept in the cache in seconds, if it should be shorter than the default.
+        """
+        if self.maxsize <= 0:
+            return
+
+        if self.ttl is not None:
+            ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        expires_at = None if ttl is None else time.monotonic() + ttl
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                size=len(self._data),
+            )
+
+    def __len__(self) -> int:
+        return len(self._data)
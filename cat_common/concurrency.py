@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Hashable
+
+    from cat_common.typing import Any, Callable
+
+
+__all__ = [
+    "SingleFlight",
+]
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into a single call.
+
+    While a call for a key is in flight, other callers for the same key wait for it to finish
+    and get its result, or have its error raised, instead of making the call themselves.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Call] = {}
+        self._tasks: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        Call the given function, unless a call for the given key is already in flight in another thread.
+
+        :param key: Key for the call.
+        :param func: Function to call.
+        :return: Result of the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    async def ado(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await the given function, unless a call for the given key is already in flight in the running event loop.
+
+        :param key: Key for the call.
+        :param func: Async function to call.
+        :return: Result of the call.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(func())
+                task.add_done_callback(lambda _: self._remove_task(task_key))
+
+        # Shield the call so that a cancelled caller doesn't cancel it for the others.
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Is a call for the given key in flight in any thread or event loop?"""
+        with self._lock:
+            return key in self._calls or any(task_key == key for _, task_key in self._tasks)
+
+    def reset(self) -> None:
+        """
+        Forget all calls in flight, e.g. in a forked process,
+        where the threads and event loops making them no longer exist and would never finish them.
+        """
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def _remove_task(self, task_key: tuple[asyncio.AbstractEventLoop, Hashable]) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
@@ -1,29 +1,239 @@
 from __future__ import annotations
 
 import base64
+import binascii
+import hashlib
+from abc import ABC, abstractmethod
+from functools import cache
 from hmac import digest
+from typing import TYPE_CHECKING
 
 from cryptography import x509
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from django.test.signals import setting_changed
 
-from cat_common.settings import cat_common_settings
+from cat_common.cache import LRUCache
+from cat_common.settings import SETTING_NAME, cat_common_settings
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any, ClassVar
 
 __all__ = [
+    "KeyedBLAKE2",
+    "KeyedHMAC",
+    "KeyedMAC",
+    "decode_key",
+    "derive_key",
     "deserialize_certificate",
     "deserialize_csr",
+    "deserialize_private_key",
+    "drop_keyed_mac",
+    "encode_key",
+    "get_keyed_mac",
+    "get_mac_backend_name",
+    "mac",
+    "new_keyed_mac",
     "serialize_certificate",
     "serialize_csr",
+    "serialize_private_key",
 ]
 
 
-def hmac(*, msg: str, key: str) -> str:
+def hmac(*, msg: str | bytes, key: str) -> str:
     return digest(
         key=key.encode(),
-        msg=msg.encode(),
+        msg=msg.encode() if isinstance(msg, str) else msg,
         digest=cat_common_settings.PSEUDO_RANDOM_FUNCTION,
     ).hex()
 
 
+def mac(*, msg: str | bytes, key: bytes) -> bytes:
+    """Create a MAC for the message, encoded for sending it over the wire based on the `CAT_ENCODING` setting."""
+    return encode_mac(mac_digest(msg=msg, key=key))
+
+
+def derive_key(*, msg: str | bytes, key: bytes) -> bytes:
+    """
+    Derive a key from another key. With the `base64url` encoding, keys are the raw digest bytes.
+    Otherwise, keys are the bytes of the digest's hex string, so that hex keys are used as-is for the next MAC.
+    """
+    return to_key(mac_digest(msg=msg, key=key))
+
+
+def mac_digest(*, msg: str | bytes, key: bytes) -> bytes:
+    """Create a MAC for the message with the backend set by the `MAC_BACKEND` setting."""
+    msg = msg.encode() if isinstance(msg, str) else msg
+    if cat_common_settings.MAC_BACKEND == "hmac":
+        return digest(key=key, msg=msg, digest=cat_common_settings.PSEUDO_RANDOM_FUNCTION)
+    return new_keyed_mac(key).digest(msg)
+
+
+def get_mac_backend_name() -> str:
+    """
+    Get the name of the MAC backend in use, e.g., `hmac-sha256` or `blake2b`.
+    CA includes this in its responses so that services can check that they use the same backend.
+    """
+    if cat_common_settings.MAC_BACKEND == "hmac":
+        return f"hmac-{cat_common_settings.PSEUDO_RANDOM_FUNCTION}"
+    return cat_common_settings.MAC_BACKEND
+
+
+def encode_mac(value: bytes) -> bytes:
+    if cat_common_settings.CAT_ENCODING == "base64url":
+        return base64.urlsafe_b64encode(value).rstrip(b"=")
+    return value.hex().encode()
+
+
+def to_key(value: bytes) -> bytes:
+    if cat_common_settings.CAT_ENCODING == "base64url":
+        return value
+    return value.hex().encode()
+
+
+_trans_36 = bytes((x ^ 0x36) for x in range(256))
+_trans_5c = bytes((x ^ 0x5C) for x in range(256))
+
+
+class KeyedMAC(ABC):
+    """Base class for MACs for a single key, prepared once so that each message needs as little work as possible."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: bytes) -> None:
+        self.key = key
+
+    @abstractmethod
+    def digest(self, msg: str | bytes) -> bytes:
+        """Create the raw MAC digest for the message."""
+
+    def mac(self, msg: str | bytes) -> bytes:
+        """Create a MAC for the message, like `mac`."""
+        return encode_mac(self.digest(msg))
+
+    def derive_key(self, msg: str | bytes) -> bytes:
+        """Derive a key from this key, like `derive_key`."""
+        return to_key(self.digest(msg))
+
+
+class KeyedHMAC(KeyedMAC):
+    """
+    HMAC for a single key, with the hash states for the padded key prepared once,
+    so that creating a MAC for a message only needs copies of the states instead of the full key setup.
+    Produces the same results as `hmac.digest`.
+    """
+
+    __slots__ = ("_inner", "_outer")
+
+    def __init__(self, key: bytes, *, digestmod: str) -> None:
+        """
+        Prepare HMAC for a key.
+
+        :param key: The key to use.
+        :param digestmod: Name of the hash function to use, e.g., `sha256`.
+        """
+        super().__init__(key)
+        self._inner = hashlib.new(digestmod)
+        self._outer = hashlib.new(digestmod)
+
+        block_size = self._inner.block_size
+        if len(key) > block_size:
+            key = hashlib.new(digestmod, key).digest()
+        key = key.ljust(block_size, b"\0")
+
+        self._inner.update(key.translate(_trans_36))
+        self._outer.update(key.translate(_trans_5c))
+
+    def digest(self, msg: str | bytes) -> bytes:
+        inner = self._inner.copy()
+        inner.update(msg.encode() if isinstance(msg, str) else msg)
+        outer = self._outer.copy()
+        outer.update(inner.digest())
+        return outer.digest()
+
+
+class KeyedBLAKE2(KeyedMAC):
+    """
+    BLAKE2 in its native keyed mode, which is a MAC with a single hash pass, unlike HMAC's two.
+    Keys longer than BLAKE2 allows, like the CAT root key, are hashed to the maximum key size first.
+    Digests are 32 bytes, the same as HMAC-SHA256.
+    """
+
+    __slots__ = ("_state",)
+
+    digest_size: ClassVar[int] = 32
+
+    def __init__(self, key: bytes, *, digestmod: str) -> None:
+        """
+        Prepare keyed BLAKE2 for a key.
+
+        :param key: The key to use.
+        :param digestmod: `blake2b` or `blake2s`.
+        """
+        super().__init__(key)
+        blake2 = hashlib.blake2b if digestmod == "blake2b" else hashlib.blake2s
+        if len(key) > blake2.MAX_KEY_SIZE:
+            key = blake2(key, digest_size=blake2.MAX_KEY_SIZE).digest()
+        self._state = blake2(key=key, digest_size=self.digest_size)
+
+    def digest(self, msg: str | bytes) -> bytes:
+        state = self._state.copy()
+        state.update(msg.encode() if isinstance(msg, str) else msg)
+        return state.digest()
+
+
+def new_keyed_mac(key: bytes) -> KeyedMAC:
+    """Prepare a MAC for a key with the backend set by the `MAC_BACKEND` setting."""
+    backend = cat_common_settings.MAC_BACKEND
+    if backend == "hmac":
+        return KeyedHMAC(key, digestmod=cat_common_settings.PSEUDO_RANDOM_FUNCTION)
+    if backend in {"blake2b", "blake2s"}:
+        return KeyedBLAKE2(key, digestmod=backend)
+
+    msg = f"Unknown MAC backend: {backend!r}."
+    raise ValueError(msg)
+
+
+def get_keyed_mac(key: bytes) -> KeyedMAC:
+    """
+    Get a prepared MAC for a long-lived key, like the CAT root key or a verification key.
+    Prepared keys are kept in a bounded cache, so keys that are rotated out are eventually dropped.
+    """
+    cache_key = (key, get_mac_backend_name())
+    keyed_mac_cache = get_keyed_mac_cache()
+    keyed_mac: KeyedMAC | None = keyed_mac_cache.get(cache_key)
+    if keyed_mac is None:
+        keyed_mac = new_keyed_mac(key)
+        keyed_mac_cache.set(cache_key, keyed_mac)
+    return keyed_mac
+
+
+def drop_keyed_mac(key: bytes) -> None:
+    """Drop the prepared MAC for a key that is no longer used, e.g., when the key has been rotated."""
+    get_keyed_mac_cache().delete((key, get_mac_backend_name()))
+
+
+@cache
+def get_keyed_mac_cache() -> LRUCache:
+    return LRUCache(maxsize=cat_common_settings.KEYED_MAC_CACHE_SIZE)
+
+
+def encode_key(key: bytes) -> str:
+    if cat_common_settings.CAT_ENCODING == "base64url":
+        return base64.urlsafe_b64encode(key).rstrip(b"=").decode()
+    return key.decode()
+
+
+def decode_key(key: str) -> bytes:
+    if cat_common_settings.CAT_ENCODING == "base64url":
+        try:
+            return base64.urlsafe_b64decode(key + "=" * (-len(key) % 4))
+        except (binascii.Error, ValueError) as error:
+            msg = "Key is not valid base64url."
+            raise ValueError(msg) from error
+    return key.encode()
+
+
 def serialize_certificate(certificate: x509.Certificate) -> str:
     return base64.b64encode(certificate.public_bytes(serialization.Encoding.DER)).decode()
 
@@ -38,3 +248,25 @@ def serialize_csr(csr: x509.CertificateSigningRequest) -> str:
 
 def deserialize_csr(csr: str) -> x509.CertificateSigningRequest:
     return x509.load_der_x509_csr(base64.b64decode(csr))
+
+
+def serialize_private_key(private_key: ed25519.Ed25519PrivateKey) -> str:
+    return base64.b64encode(
+        private_key.private_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PrivateFormat.Raw,
+            encryption_algorithm=serialization.NoEncryption(),
+        ),
+    ).decode()
+
+
+def deserialize_private_key(private_key: str) -> ed25519.Ed25519PrivateKey:
+    return ed25519.Ed25519PrivateKey.from_private_bytes(base64.b64decode(private_key))
+
+
+def reset_keyed_mac_cache(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_keyed_mac_cache.cache_clear()
+
+
+setting_changed.connect(reset_keyed_mac_cache)
@@ -17,8 +17,11 @@
 MISSING_KEY_USAGE = "missing_key_usage"
 MISSING_REQUIRED_HEADERS = "missing_required_headers"
 MISSING_VALIDATION_FUNCTION = "missing_validation_function"
+NONCE_ALREADY_USED = "nonce_already_used"
+NONCE_OUTSIDE_WINDOW = "nonce_outside_window"
 NOT_DIRECTLY_ISSUED_BY_CA = "not_directly_issued_by_ca"
 SERVICE_SETUP_ERROR = "service_setup_error"
+TOO_MANY_FAILED_ATTEMPTS = "too_many_failed_attempts"
 UNRECOGNIZED_CAT_HEADER = "unrecognized_cat_header"
 USER_DOES_NOT_EXIST = "user_does_not_exist"
 WRONG_ISSUER = "wrong_issuer"
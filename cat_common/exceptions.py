@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any
+
+
+__all__ = [
+    "CATVerificationError",
+]
+
+
+class CATVerificationError(Exception):
+    """
+    CAT, its headers or a certificate are not valid.
+
+    Messages are marked for translation with `gettext_noop`, but not translated. `params` are formatted into `message`
+    for `str(error)`, and `to_authentication_failed` translates `message` before formatting them.
+    """
+
+    def __init__(self, message: str, *, code: str, params: dict[str, Any] | None = None) -> None:
+        self.message = message
+        self.code = code
+        self.params = params
+        super().__init__(message if params is None else message % params)
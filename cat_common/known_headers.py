@@ -3,3 +3,4 @@
 TIMESTAMP = "CAT-Timestamp"
 VALID_UNTIL = "CAT-Valid-Until"
 NONCE = "CAT-Nonce"
+CLAIMS = "CAT-Claims"
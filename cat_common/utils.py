@@ -3,13 +3,14 @@
 from typing import TYPE_CHECKING
 
 from cryptography import x509
-from django.utils.translation import gettext_lazy as __
-from rest_framework.exceptions import AuthenticationFailed
+from django.utils.translation import gettext_noop
 
 from cat_common import error_codes
+from cat_common.exceptions import CATVerificationError
 
 if TYPE_CHECKING:
-    from rest_framework.request import Request
+    from cat_common.authentication import get_authorization_header
+    from cat_common.typing import Any
 
 
 __all__ = [
@@ -17,32 +18,32 @@
     "get_basic_constraints",
     "get_common_name",
     "get_key_usage",
+    "parse_authorization_header",
 ]
 
 
-def get_authorization_header(request: Request) -> tuple[str, str]:
+def parse_authorization_header(authorization: str | bytes) -> tuple[str, str]:
     """
-    Return request's 'Authorization' header, split into the scheme and token.
+    Split the value of the 'Authorization' header into the scheme and token.
 
-    :raises AuthenticationFailed: The header is invalid or missing.
+    :raises CATVerificationError: The header is invalid or missing.
     """
-    authorization: str | bytes = request.META.get("HTTP_AUTHORIZATION", "")
     if not authorization:
-        msg = __("Missing Authorization header.")
-        raise AuthenticationFailed(msg, code=error_codes.MISSING_AUTH_HEADER)
+        msg = gettext_noop("Missing Authorization header.")
+        raise CATVerificationError(msg, code=error_codes.MISSING_AUTH_HEADER)
 
     if isinstance(authorization, bytes):
         try:
             authorization = authorization.decode()
         except UnicodeError as error:
-            msg = __("Invalid Authorization header. Should not contain non-ASCII characters.")
-            raise AuthenticationFailed(msg, code=error_codes.INVALID_AUTH_HEADER) from error
+            msg = gettext_noop("Invalid Authorization header. Should not contain non-ASCII characters.")
+            raise CATVerificationError(msg, code=error_codes.INVALID_AUTH_HEADER) from error
 
     try:
         scheme, token = authorization.strip().split()
     except ValueError as error:
-        msg = __("Invalid Authorization header. Must be of form: '<scheme> <token>'.")
-        raise AuthenticationFailed(msg, code=error_codes.INVALID_AUTH_HEADER) from error
+        msg = gettext_noop("Invalid Authorization header. Must be of form: '<scheme> <token>'.")
+        raise CATVerificationError(msg, code=error_codes.INVALID_AUTH_HEADER) from error
 
     return scheme, token
 
@@ -68,3 +69,15 @@ def get_key_usage(certificate: x509.Certificate) -> x509.KeyUsage | None:
     except x509.ExtensionNotFound:  # pragma: no cover
         return None
     return extension.value  # type: ignore[return-value]
+
+
+def __getattr__(name: str) -> Any:
+    # `get_authorization_header` moved to `cat_common.authentication`. It's imported from there only when used,
+    # so that importing this module doesn't import DRF.
+    if name == "get_authorization_header":
+        from cat_common.authentication import get_authorization_header  # noqa: PLC0415
+
+        return get_authorization_header
+
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
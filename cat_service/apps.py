@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+
+__all__ = [
+    "CatServiceConfig",
+]
+
+
+class CatServiceConfig(AppConfig):
+    name = "cat_service"
+
+    def ready(self) -> None:
+        from cat_service.cryptography import warm_up  # noqa: PLC0415
+        from cat_service.http import close_http_clients  # noqa: PLC0415
+        from cat_service.settings import cat_service_settings  # noqa: PLC0415
+
+        if cat_service_settings.WARM_UP_ON_STARTUP:
+            warm_up()
+            # Don't leave open connections to the CA for forked worker processes to inherit.
+            close_http_clients()
@@ -1,42 +1,56 @@
 from __future__ import annotations
 
+import copy
+import time
+from functools import partial
 from typing import TYPE_CHECKING
 
 from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject, empty
 from django.utils.translation import gettext_lazy as __
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
 from cat_common import error_codes, known_headers
-from cat_common.utils import get_authorization_header
-from cat_service.cryptography import create_cat
-from cat_service.settings import cat_service_settings
-from cat_service.utils import (
-    as_human_readable_list,
-    from_cat_header_name,
-    get_required_cat_headers,
-    get_valid_cat_headers,
-    to_cat_header_name,
-)
-from cat_service.validation import (
-    validate_identity,
-    validate_nonce,
-    validate_service_name,
-    validate_timestamp,
-    validate_valid_until,
+from cat_common.authentication import to_authentication_failed
+from cat_common.utils import parse_authorization_header
+from cat_service import core
+from cat_service.core import (
+    DEFAULT_HEADER_VALIDATORS,
+    CATClaims,
+    get_cat_headers_and_claims,
+    get_cat_headers_from_meta,
 )
+from cat_service.exceptions import CATVerificationError
+from cat_service.failures import count_failure, get_failure_limiter
+from cat_service.schema import get_cat_header_schema
+from cat_service.settings import cat_service_settings
+from cat_service.user_cache import aget_user_by_identity, get_user_by_identity
+from cat_service.utils import to_meta_key
+from cat_service.validation import request_time
 
 if TYPE_CHECKING:
     from rest_framework.request import Request
 
     from cat_common.typing import Any, Callable, ClassVar, HeaderKey, HeaderValue
+    from cat_service.schema import CATHeaderSchema
 
 User = get_user_model()
 
+IDENTITY_META_KEY = to_meta_key(known_headers.IDENTITY)
+
+# Request attribute where `CATAuthenticationMiddleware` stores the results of authentication.
+AUTHENTICATED_ATTRIBUTE = "_cat_authenticated"
+
 
 __all__ = [
+    "AsyncCATAuthentication",
     "CATAuthentication",
+    "CATClaims",
+    "LazyCATUser",
     "get_cat_headers",
+    "get_cat_headers_and_claims",
+    "get_cat_headers_from_meta",
 ]
 
 
@@ -56,104 +70,283 @@ class CATAuthentication(BaseAuthentication):
     CAT-Timestamp: The time the request was sent.
     CAT-Valid-Until: The time until the request is valid.
     CAT-Nonce: A random nonce that can be used for replay attack prevention.
+
+    Validated claims are available in `request.auth` as `CATClaims`.
+    CATs are verified with `cat_service.core`, which can also be used without DRF.
+
+    Header validators should raise `CATVerificationError` for invalid values. `AuthenticationFailed` works here too,
+    but not when the same validators are used with `cat_service.core.verify` or `cat_service.batch.verify_cats`.
     """
 
     auth_scheme: str = cat_service_settings.AUTH_SCHEME
 
-    header_validators: ClassVar[dict[str, Callable[[str], Any]]] = {
-        known_headers.IDENTITY: validate_identity,
-        known_headers.SERVICE_NAME: validate_service_name,
-        known_headers.TIMESTAMP: validate_timestamp,
-        known_headers.VALID_UNTIL: validate_valid_until,
-        known_headers.NONCE: validate_nonce,
-    }
+    header_validators: ClassVar[dict[str, Callable[[str], Any]]] = DEFAULT_HEADER_VALIDATORS
+
+    def authenticate(self, request: Request) -> tuple[User, CATClaims] | None:
+        authenticated = self.get_authenticated(request)
+        if authenticated is not None:
+            return authenticated
 
-    def authenticate(self, request: Request) -> tuple[User, None] | None:
-        scheme, token = get_authorization_header(request)
-        cat_headers = get_cat_headers(request)
+        failure_keys = self.get_failure_keys(request)
+        self.validate_failure_limit(failure_keys)
 
-        self.validate_auth_scheme(scheme)
-        cat_info = self.validate_cat_headers(cat_headers)
-        self.validate_cat_token(token, cat_headers)
+        reset_token = request_time.set(time.time())
+        try:
+            scheme, token, cat_headers, encoded_claims = self.parse_request(request)
+            self.validate_auth_scheme(scheme)
+            cat_info = self.validate_cat_headers(cat_headers)
+            self.validate_cat_token(token, cat_headers, cat_info, encoded_claims=encoded_claims)
+            self.validate_nonce_replay(cat_info)
+
+            claims = CATClaims.from_cat_info(cat_info)
+            if cat_service_settings.LAZY_USER:
+                fetch_user = partial(self.fetch_lazy_user, cat_info, failure_keys)
+                return LazyCATUser(fetch_user, identity=claims.identity), claims
+
+            return self.fetch_user(cat_info), claims
+
+        except AuthenticationFailed as error:
+            self.record_failure(failure_keys, error)
+            raise
+
+        finally:
+            request_time.reset(reset_token)
+
+    def get_authenticated(self, request: Request) -> tuple[User, CATClaims] | None:
+        """
+        Get the user and claims if the request was already authenticated by `CATAuthenticationMiddleware`
+        with the same header validators, so that the CAT is not verified again, e.g., its nonce used twice.
+        """
+        authenticated = getattr(request, AUTHENTICATED_ATTRIBUTE, None)
+        if authenticated is None:
+            return None
+
+        header_validators, user, claims = authenticated
+        if header_validators is not self.header_validators:
+            return None
+        return user, claims
+
+    def parse_request(self, request: Request) -> tuple[str, str, dict[HeaderKey, HeaderValue], bytes | None]:
+        """Get the auth scheme, the CAT, the CAT headers and the `CAT-Claims` JSON, if any, from the request."""
+        try:
+            scheme, token = parse_authorization_header(request.META.get("HTTP_AUTHORIZATION", ""))
+            cat_headers, encoded_claims = get_cat_headers_and_claims(request.META, self.get_header_schema())
+        except CATVerificationError as error:
+            raise to_authentication_failed(error) from error
+        return scheme, token, cat_headers, encoded_claims
+
+    def get_failure_keys(self, request: Request) -> list[str]:
+        """
+        Get the keys to count failed authentications for, or an empty list if failures are not limited.
+
+        Keys are read from the request as sent, so that requests with malformed headers are limited too.
+        Identities are taken from the unverified `CAT-Identity` header, so limiting by identity lets
+        anyone get a user denied by sending invalid CATs with their identity.
+        """
+        if get_failure_limiter() is None:
+            return []
+
+        keys: list[str] = []
+        for name in cat_service_settings.FAILURE_LIMIT_BY:
+            if name == "identity":
+                identity = request.META.get(IDENTITY_META_KEY)
+                if identity is not None:
+                    keys.append(f"identity:{identity}")
+            elif name == "address":
+                address = request.META.get("REMOTE_ADDR")
+                if address:
+                    keys.append(f"address:{address}")
+        return keys
+
+    def validate_failure_limit(self, failure_keys: list[str]) -> None:
+        if failure_keys and get_failure_limiter().is_blocked(failure_keys):
+            count_failure(error_codes.TOO_MANY_FAILED_ATTEMPTS)
+            msg = __("Too many failed authentication attempts. Try again later.")
+            raise AuthenticationFailed(msg, code=error_codes.TOO_MANY_FAILED_ATTEMPTS) from None
+
+    def record_failure(self, failure_keys: list[str], error: AuthenticationFailed) -> None:
+        count_failure(error.get_codes())
+        if failure_keys:
+            get_failure_limiter().record_failure(failure_keys)
+
+    def fetch_lazy_user(self, cat_info: dict[HeaderKey, Any], failure_keys: list[str]) -> User:
+        """Fetch the user for a `LazyCATUser`, counting a missing user as a failed authentication."""
+        try:
+            return self.fetch_user(cat_info)
+        except AuthenticationFailed as error:
+            self.record_failure(failure_keys, error)
+            raise
 
+    def fetch_user(self, cat_info: dict[HeaderKey, Any]) -> User:
         try:
-            user = self.get_user(cat_info)
-        except Exception as error:  # pragma: no cover
+            return self.get_user(cat_info)
+        except Exception as error:
             msg = __("User does not exist.")
             raise AuthenticationFailed(msg, code=error_codes.USER_DOES_NOT_EXIST) from error
 
-        return user, None
-
     def validate_auth_scheme(self, scheme: str) -> None:
-        if scheme.casefold() != self.auth_scheme.casefold():
-            msg = __("Invalid auth scheme: '%(scheme)s'. Accepted: '%(accepted_scheme)s'.")
-            msg %= {"scheme": scheme, "accepted_scheme": self.auth_scheme}
-            raise AuthenticationFailed(msg, code=error_codes.INVALID_AUTH_SCHEME) from None
+        try:
+            core.validate_auth_scheme(scheme, self.auth_scheme)
+        except CATVerificationError as error:
+            raise to_authentication_failed(error) from error
 
     def validate_cat_headers(self, cat_headers: dict[HeaderKey, HeaderValue]) -> dict[HeaderKey, Any]:
-        data: dict[HeaderKey, Any] = {}
-        required_headers = get_required_cat_headers()
-        valid_headers = get_valid_cat_headers()
+        try:
+            return core.validate_cat_headers(cat_headers, self.get_header_schema())
+        except CATVerificationError as error:
+            raise to_authentication_failed(error) from error
+
+    def validate_cat_token(
+        self,
+        token: str,
+        cat_headers: dict[HeaderKey, HeaderValue],
+        cat_info: dict[HeaderKey, Any] | None = None,
+        *,
+        encoded_claims: bytes | None = None,
+    ) -> None:
+        try:
+            core.validate_cat_token(
+                token,
+                cat_headers,
+                cat_info,
+                schema=self.get_header_schema(),
+                encoded_claims=encoded_claims,
+            )
+        except CATVerificationError as error:
+            raise to_authentication_failed(error) from error
+
+    def validate_nonce_replay(self, cat_info: dict[HeaderKey, Any]) -> None:
+        try:
+            core.validate_nonce_replay(cat_info)
+        except CATVerificationError as error:
+            raise to_authentication_failed(error) from error
 
-        for header_key, header_value in cat_headers.items():
-            if header_key not in valid_headers:
-                msg = __("Unrecognized CAT header: '%(header)s'.")
-                msg %= {"header": header_key}
-                raise AuthenticationFailed(msg, code=error_codes.UNRECOGNIZED_CAT_HEADER) from None
+    def get_user(self, cat_info: dict[HeaderKey, Any]) -> User:
+        return get_user_by_identity(cat_info.get(known_headers.IDENTITY))
 
-            validator = self.header_validators.get(header_key)
-            if validator is None:
-                msg = __("Missing validation function for header: '%(header)s'.") % {"header": header_key}
-                raise AuthenticationFailed(msg, code=error_codes.MISSING_VALIDATION_FUNCTION) from None
+    def authenticate_header(self, request: Request) -> str:
+        return self.auth_scheme
 
-            data[header_key] = validator(header_value)
-            required_headers.discard(header_key)
+    def get_header_schema(self) -> CATHeaderSchema:
+        return get_cat_header_schema(self.header_validators)
 
-        if required_headers:
-            msg = __("Missing required headers: %(required_headers)s.") % {
-                "required_headers": as_human_readable_list(required_headers),
-            }
-            raise AuthenticationFailed(msg, code=error_codes.MISSING_REQUIRED_HEADERS) from None
 
-        return data
+class AsyncCATAuthentication(CATAuthentication):
+    """
+    CAT authentication for async views, e.g., ones from `adrf`.
 
-    def validate_cat_token(self, token: str, cat_headers: dict[HeaderKey, HeaderValue]) -> None:
+    Keys are fetched from the CA with an async HTTP client and the user is fetched
+    with an async database query, so authentication doesn't need to run in a thread under ASGI.
+    The user is always fetched during authentication, so the `LAZY_USER` setting is not used.
+    """
+
+    async def authenticate(self, request: Request) -> tuple[User, CATClaims] | None:  # type: ignore[override]
+        authenticated = self.get_authenticated(request)
+        if authenticated is not None:
+            return authenticated
+
+        failure_keys = self.get_failure_keys(request)
+        await self.avalidate_failure_limit(failure_keys)
+
+        reset_token = request_time.set(time.time())
         try:
-            cat = create_cat(**{from_cat_header_name(key): value for key, value in cat_headers.items()})
-        except Exception as error:  # pragma: no cover
-            raise AuthenticationFailed(str(error), code=error_codes.SERVICE_SETUP_ERROR) from error
+            scheme, token, cat_headers, encoded_claims = self.parse_request(request)
+            self.validate_auth_scheme(scheme)
+            cat_info = self.validate_cat_headers(cat_headers)
+            await self.avalidate_cat_token(token, cat_headers, cat_info, encoded_claims=encoded_claims)
+            self.validate_nonce_replay(cat_info)
+            return await self.afetch_user(cat_info), CATClaims.from_cat_info(cat_info)
+
+        except AuthenticationFailed as error:
+            await self.arecord_failure(failure_keys, error)
+            raise
+
+        finally:
+            request_time.reset(reset_token)
+
+    async def avalidate_failure_limit(self, failure_keys: list[str]) -> None:
+        if failure_keys and await get_failure_limiter().ais_blocked(failure_keys):
+            count_failure(error_codes.TOO_MANY_FAILED_ATTEMPTS)
+            msg = __("Too many failed authentication attempts. Try again later.")
+            raise AuthenticationFailed(msg, code=error_codes.TOO_MANY_FAILED_ATTEMPTS) from None
+
+    async def arecord_failure(self, failure_keys: list[str], error: AuthenticationFailed) -> None:
+        count_failure(error.get_codes())
+        if failure_keys:
+            await get_failure_limiter().arecord_failure(failure_keys)
+
+    async def afetch_user(self, cat_info: dict[HeaderKey, Any]) -> User:
+        try:
+            return await self.aget_user(cat_info)
+        except Exception as error:
+            msg = __("User does not exist.")
+            raise AuthenticationFailed(msg, code=error_codes.USER_DOES_NOT_EXIST) from error
 
-        if token != cat:
-            msg = __("Invalid CAT.")
-            raise AuthenticationFailed(msg, code=error_codes.INVALID_CAT) from None
+    async def avalidate_cat_token(
+        self,
+        token: str,
+        cat_headers: dict[HeaderKey, HeaderValue],
+        cat_info: dict[HeaderKey, Any] | None = None,
+        *,
+        encoded_claims: bytes | None = None,
+    ) -> None:
+        try:
+            await core.avalidate_cat_token(
+                token,
+                cat_headers,
+                cat_info,
+                schema=self.get_header_schema(),
+                encoded_claims=encoded_claims,
+            )
+        except CATVerificationError as error:
+            raise to_authentication_failed(error) from error
 
-    def get_user(self, cat_info: dict[HeaderKey, Any]) -> User:
-        return User.objects.get(pk=cat_info.get(known_headers.IDENTITY))
+    async def aget_user(self, cat_info: dict[HeaderKey, Any]) -> User:
+        return await aget_user_by_identity(cat_info.get(known_headers.IDENTITY))
 
-    def authenticate_header(self, request: Request) -> str:
-        return self.auth_scheme
 
+class LazyCATUser(SimpleLazyObject):
+    """
+    User authenticated with a CAT, fetched from the database when its attributes are first accessed.
+    The validated identity of the user is available in `identity` without fetching the user.
+
+    :raises AuthenticationFailed: User does not exist when it's fetched.
+    """
+
+    # A user with a valid CAT is always authenticated.
+    is_authenticated: bool = True
+    is_anonymous: bool = False
+
+    def __init__(self, func: Callable[[], User], *, identity: Any) -> None:
+        self.__dict__["identity"] = identity
+        super().__init__(func)
 
-def get_cat_headers(request: Request) -> dict[HeaderKey, HeaderValue]:
+    def __bool__(self) -> bool:
+        return True
+
+    def __copy__(self) -> LazyCATUser | User:
+        if self._wrapped is empty:
+            return type(self)(self._setupfunc, identity=self.identity)
+        return copy.copy(self._wrapped)
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> LazyCATUser | User:
+        if self._wrapped is empty:
+            result = type(self)(self._setupfunc, identity=self.identity)
+            memo[id(self)] = result
+            return result
+        return copy.deepcopy(self._wrapped, memo)
+
+
+def get_cat_headers(request: Request, schema: CATHeaderSchema | None = None) -> dict[HeaderKey, HeaderValue]:
     """
     Return additional headers sent for CAT authentication.
 
+    If unrecognized CAT headers should be rejected, all CAT headers in `request.META` are returned
+    so that they can be validated. Otherwise, only the valid CAT headers are looked up.
+
     :raises AuthenticationFailed: Invalid header found.
     """
-    headers: dict[HeaderKey, HeaderValue] = {}
-    for header, value in request.META.items():
-        if not header.startswith("HTTP_CAT_"):
-            continue
-
-        header_key = to_cat_header_name(header.removeprefix("HTTP_CAT_"))
-
-        if isinstance(value, bytes):
-            try:
-                value = value.decode()  # noqa: PLW2901
-            except UnicodeError as error:
-                msg = __("Invalid CAT header '%(header)s'. Should not contain non-ASCII characters.")
-                msg %= {"header": header_key}
-                raise AuthenticationFailed(msg, code=error_codes.INVALID_CAT_HEADER) from error
-
-        headers[header_key] = value
-    return headers
+    try:
+        return get_cat_headers_from_meta(request.META, schema)
+    except CATVerificationError as error:
+        raise to_authentication_failed(error) from error
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from cat_common import error_codes
+from cat_service.core import CATVerification, verify
+from cat_service.settings import cat_service_settings
+from cat_service.user_cache import get_users_by_identities
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from cat_common.typing import Any, Callable, HeaderKey, Iterable
+
+
+__all__ = [
+    "verify_cats",
+]
+
+
+def verify_cats(
+    items: Iterable[tuple[str, Mapping[str, str]]],
+    *,
+    header_validators: Mapping[HeaderKey, Callable[[str], Any]] | None = None,
+    fetch_users: bool = True,
+    max_workers: int | None = None,
+) -> list[CATVerification]:
+    """
+    Verify many CATs at once with `cat_service.core.verify`, e.g., in an API gateway,
+    without needing a DRF request for each one.
+
+    Users for all valid CATs are fetched by their primary keys with a single query,
+    so overriding `get_user` in an authentication class doesn't affect them.
+    Failed verifications are not counted by the failure limiter set by the `FAILURE_LIMITER` setting,
+    since the clients that sent the CATs are not known here. Callers should limit them themselves.
+
+    :param items: CATs to verify with their CAT headers, e.g., `("<cat>", {"CAT-Identity": "1", ...})`.
+                  CATs should not contain the auth scheme. Header names are case-insensitive.
+    :param header_validators: Validators for the CAT headers. Same as `CATAuthentication` by default.
+                              Must raise `CATVerificationError` for invalid values, see `verify`.
+    :param fetch_users: Whether to fetch users for valid CATs.
+    :param max_workers: If given, verify the CATs in a thread pool with this many threads.
+    :return: Results for the CATs in the same order as they were given.
+    """
+    auth_scheme = cat_service_settings.AUTH_SCHEME
+
+    def verify_item(item: tuple[str, Mapping[str, str]]) -> CATVerification:
+        token, headers = item
+        return verify(f"{auth_scheme} {token}", headers, header_validators=header_validators, auth_scheme=auth_scheme)
+
+    if max_workers is not None and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(verify_item, items))
+    else:
+        results = [verify_item(item) for item in items]
+
+    if not fetch_users:
+        return results
+
+    users = get_users_by_identities(result.claims.identity for result in results if result.is_valid)
+
+    for i, result in enumerate(results):
+        if not result.is_valid:
+            continue
+
+        user = users.get(result.claims.identity)
+        if user is None:
+            results[i] = CATVerification(code=error_codes.USER_DOES_NOT_EXIST, message="User does not exist.")
+        else:
+            results[i] = result._replace(user=user)
+
+    return results
@@ -0,0 +1,488 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import time
+from hmac import compare_digest
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+from django.utils.translation import gettext_noop
+
+from cat_common import error_codes, known_headers
+from cat_common.typing import NamedTuple
+from cat_common.utils import parse_authorization_header
+from cat_service.cryptography import (
+    add_verified_cat,
+    aget_cat_verification_key,
+    derive_cat_creation_key,
+    get_cat_verification_key,
+    get_verified_cat_cache_key,
+    is_verified_cat,
+)
+from cat_service.encoding import encode_cat_claims
+from cat_service.exceptions import CATVerificationError
+from cat_service.nonces import get_nonce_expiry, get_nonce_store, to_epoch
+from cat_service.schema import get_cat_header_schema
+from cat_service.settings import cat_service_settings
+from cat_service.utils import as_human_readable_list, from_cat_header_name, to_cat_header_name, to_meta_key
+from cat_service.validation import (
+    get_request_time,
+    request_time,
+    validate_identity,
+    validate_nonce,
+    validate_service_name,
+    validate_timestamp,
+    validate_valid_until,
+)
+
+if TYPE_CHECKING:
+    import datetime
+    from collections.abc import Mapping
+
+    from cat_common.typing import Any, Callable, HeaderKey, HeaderValue
+    from cat_service.schema import CATHeaderSchema
+
+
+CLAIMS_META_KEY = to_meta_key(known_headers.CLAIMS)
+
+DEFAULT_HEADER_VALIDATORS: dict[HeaderKey, Callable[[str], Any]] = {
+    known_headers.IDENTITY: validate_identity,
+    known_headers.SERVICE_NAME: validate_service_name,
+    known_headers.TIMESTAMP: validate_timestamp,
+    known_headers.VALID_UNTIL: validate_valid_until,
+    known_headers.NONCE: validate_nonce,
+}
+
+
+__all__ = [
+    "DEFAULT_HEADER_VALIDATORS",
+    "CATClaims",
+    "CATVerification",
+    "avalidate_cat_token",
+    "averify",
+    "compare_cat",
+    "decode_cat_claims_header",
+    "get_cat_claims",
+    "get_cat_headers_and_claims",
+    "get_cat_headers_from_claims",
+    "get_cat_headers_from_meta",
+    "validate_auth_scheme",
+    "validate_cat_headers",
+    "validate_cat_token",
+    "validate_nonce_replay",
+    "verify",
+]
+
+
+class CATClaims(NamedTuple):
+    """
+    Claims of a request authenticated with a CAT, as converted by the header validators.
+    Available in `request.auth`, so that CAT headers never need to be read or parsed again.
+    """
+
+    identity: Any
+    """Identity of the authenticated user, from the `CAT-Identity` header."""
+    service_name: str
+    """Name of the service the request was made for, from the `CAT-Service-Name` header."""
+    timestamp: datetime.datetime | float | None = None
+    """Time the request was sent, from the `CAT-Timestamp` header. Unix timestamps are given in seconds."""
+    valid_until: datetime.datetime | float | None = None
+    """Time until the request is valid, from the `CAT-Valid-Until` header. Unix timestamps are given in seconds."""
+    nonce: Any = None
+    """Nonce of the request, from the `CAT-Nonce` header."""
+    extra: Mapping[HeaderKey, Any] = MappingProxyType({})
+    """Values of any additional CAT headers by their Header-Case names (e.g., CAT-Request-Id)."""
+
+    @classmethod
+    def from_cat_info(cls, cat_info: dict[HeaderKey, Any]) -> CATClaims:
+        cat_info = cat_info.copy()
+        return cls(
+            identity=cat_info.pop(known_headers.IDENTITY, None),
+            service_name=cat_info.pop(known_headers.SERVICE_NAME, None),
+            timestamp=cat_info.pop(known_headers.TIMESTAMP, None),
+            valid_until=cat_info.pop(known_headers.VALID_UNTIL, None),
+            nonce=cat_info.pop(known_headers.NONCE, None),
+            extra=MappingProxyType(cat_info),
+        )
+
+
+class CATVerification(NamedTuple):
+    claims: CATClaims | None = None
+    """Validated claims, if the CAT is valid."""
+    code: str | None = None
+    """Error code, if the CAT is not valid."""
+    message: str | None = None
+    """Error message, if the CAT is not valid. Not translated."""
+    user: Any = None
+    """User the CAT was created for, if the CAT is valid and the user was fetched, e.g., by `verify_cats`."""
+
+    @classmethod
+    def from_error(cls, error: CATVerificationError) -> CATVerification:
+        return cls(code=error.code, message=str(error))
+
+    @property
+    def is_valid(self) -> bool:
+        return self.code is None
+
+
+def verify(  # noqa: PLR0913
+    authorization: str | bytes,
+    headers: Mapping[str, str | bytes],
+    now: float | None = None,
+    *,
+    header_validators: Mapping[HeaderKey, Callable[[str], Any]] | None = None,
+    auth_scheme: str | None = None,
+    verification_key: str | None = None,
+) -> CATVerification:
+    """
+    Verify a CAT without a DRF request, e.g., in plain Django views, consumers or workers.
+
+    :param authorization: Value of the 'Authorization' header, e.g., "CAT <cat>".
+    :param headers: CAT headers sent with the CAT, e.g., `{"CAT-Identity": "1", ...}`. Names are case-insensitive.
+    :param now: Time of the request as a Unix timestamp. Current time by default.
+    :param header_validators: Validators for the CAT headers. Same as `CATAuthentication` by default.
+                              Must raise `CATVerificationError` for invalid values. Other errors, including DRF's
+                              `AuthenticationFailed`, are not converted to results, and are raised as they are.
+    :param auth_scheme: Accepted auth scheme. Set by the `AUTH_SCHEME` setting by default.
+    :param verification_key: CAT verification key. Fetched from the CA when needed by default.
+    :return: Validated claims, or the error code and message if the CAT is not valid.
+    """
+    schema = get_cat_header_schema(DEFAULT_HEADER_VALIDATORS if header_validators is None else header_validators)
+    meta = {to_meta_key(name): value for name, value in headers.items()}
+
+    reset_token = request_time.set(time.time() if now is None else now)
+    try:
+        scheme, token = parse_authorization_header(authorization)
+        validate_auth_scheme(scheme, cat_service_settings.AUTH_SCHEME if auth_scheme is None else auth_scheme)
+        cat_headers, encoded_claims = get_cat_headers_and_claims(meta, schema)
+        cat_info = validate_cat_headers(cat_headers, schema)
+        validate_cat_token(
+            token,
+            cat_headers,
+            cat_info,
+            schema=schema,
+            encoded_claims=encoded_claims,
+            verification_key=verification_key,
+        )
+        validate_nonce_replay(cat_info)
+    except CATVerificationError as error:
+        return CATVerification.from_error(error)
+    finally:
+        request_time.reset(reset_token)
+
+    return CATVerification(claims=CATClaims.from_cat_info(cat_info))
+
+
+async def averify(
+    authorization: str | bytes,
+    headers: Mapping[str, str | bytes],
+    now: float | None = None,
+    *,
+    header_validators: Mapping[HeaderKey, Callable[[str], Any]] | None = None,
+    auth_scheme: str | None = None,
+) -> CATVerification:
+    """
+    Verify a CAT without a DRF request, fetching the verification key from the CA
+    with an async HTTP client before verifying the CAT. See `verify`.
+    """
+    try:
+        verification_key = await aget_verification_key()
+    except CATVerificationError as error:  # pragma: no cover
+        return CATVerification.from_error(error)
+
+    return verify(
+        authorization,
+        headers,
+        now,
+        header_validators=header_validators,
+        auth_scheme=auth_scheme,
+        verification_key=verification_key,
+    )
+
+
+def validate_auth_scheme(scheme: str, auth_scheme: str) -> None:
+    if scheme.casefold() != auth_scheme.casefold():
+        msg = gettext_noop("Invalid auth scheme: '%(scheme)s'. Accepted: '%(accepted_scheme)s'.")
+        params = {"scheme": scheme, "accepted_scheme": auth_scheme}
+        raise CATVerificationError(msg, code=error_codes.INVALID_AUTH_SCHEME, params=params)
+
+
+def get_cat_headers_and_claims(
+    meta: Mapping[str, Any],
+    schema: CATHeaderSchema | None = None,
+) -> tuple[dict[HeaderKey, HeaderValue], bytes | None]:
+    """
+    Return additional headers sent for CAT authentication from the given `request.META` style dict.
+    If the claims were sent in the `CAT-Claims` header, return the headers for them along with
+    the JSON the CAT was created for. Otherwise, the JSON is `None`.
+
+    :raises CATVerificationError: Invalid header found.
+    """
+    if schema is None:
+        schema = get_cat_header_schema(DEFAULT_HEADER_VALIDATORS)
+
+    value = meta.get(CLAIMS_META_KEY) if cat_service_settings.CLAIMS_HEADER else None
+    if value is None:
+        return get_cat_headers_from_meta(meta, schema), None
+
+    if any(meta_key in meta for meta_key in schema.meta_keys):
+        msg = gettext_noop(
+            "CAT claims must be sent either in the 'CAT-Claims' header or in separate CAT headers, not both."
+        )
+        raise CATVerificationError(msg, code=error_codes.INVALID_CAT_HEADER)
+
+    encoded_claims = decode_cat_claims_header(value)
+    return get_cat_headers_from_claims(encoded_claims, schema), encoded_claims
+
+
+def decode_cat_claims_header(value: str | bytes) -> bytes:
+    """
+    Decode the base64url-encoded `CAT-Claims` header to the JSON the CAT was created for.
+
+    :raises CATVerificationError: Header is not valid base64url.
+    """
+    try:
+        value = value.encode() if isinstance(value, str) else value
+        return base64.b64decode(value + b"=" * (-len(value) % 4), altchars=b"-_", validate=True)
+    except (binascii.Error, UnicodeError, ValueError) as error:
+        msg = gettext_noop("Invalid 'CAT-Claims' header. Must be base64url-encoded JSON.")
+        raise CATVerificationError(msg, code=error_codes.INVALID_CAT_HEADER) from error
+
+
+def get_cat_headers_from_claims(encoded_claims: bytes, schema: CATHeaderSchema) -> dict[HeaderKey, HeaderValue]:
+    """
+    Return the CAT headers for the claims in the given `CAT-Claims` JSON, so that they can be validated
+    with the same validators as separate CAT headers.
+
+    :raises CATVerificationError: Claims are not a JSON object with string values.
+    """
+    try:
+        claims = json.loads(encoded_claims)
+    except ValueError as error:
+        msg = gettext_noop("Invalid 'CAT-Claims' header. Must be base64url-encoded JSON.")
+        raise CATVerificationError(msg, code=error_codes.INVALID_CAT_HEADER) from error
+
+    if claims.__class__ is not dict:
+        msg = gettext_noop("Invalid 'CAT-Claims' header. Claims must be a JSON object.")
+        raise CATVerificationError(msg, code=error_codes.INVALID_CAT_HEADER)
+
+    reject_unrecognized = cat_service_settings.REJECT_UNRECOGNIZED_CAT_HEADERS
+
+    headers: dict[HeaderKey, HeaderValue] = {}
+    for name, value in claims.items():
+        if value.__class__ is not str:
+            msg = gettext_noop("Invalid 'CAT-Claims' header. Value for claim '%(name)s' must be a string.")
+            raise CATVerificationError(msg, code=error_codes.INVALID_CAT_HEADER, params={"name": name})
+
+        header_key = schema.header_keys.get(name)
+        if header_key is None:
+            # Unrecognized claims are still part of the signed JSON, so they can be safely ignored.
+            if not reject_unrecognized:
+                continue
+            header_key = to_cat_header_name(name)
+
+        headers[header_key] = value
+    return headers
+
+
+def get_cat_headers_from_meta(
+    meta: Mapping[str, Any],
+    schema: CATHeaderSchema | None = None,
+) -> dict[HeaderKey, HeaderValue]:
+    """
+    Return additional headers sent for CAT authentication from the given `request.META` style dict.
+
+    :raises CATVerificationError: Invalid header found.
+    """
+    if schema is None:
+        schema = get_cat_header_schema(DEFAULT_HEADER_VALIDATORS)
+
+    if cat_service_settings.REJECT_UNRECOGNIZED_CAT_HEADERS:
+        items = (
+            (schema.meta_keys.get(header) or to_cat_header_name(header.removeprefix("HTTP_CAT_")), value)
+            for header, value in meta.items()
+            if header.startswith("HTTP_CAT_")
+        )
+    else:
+        items = ((header_key, meta[header]) for header, header_key in schema.meta_keys.items() if header in meta)
+
+    headers: dict[HeaderKey, HeaderValue] = {}
+    for header_key, value in items:
+        if isinstance(value, bytes):
+            try:
+                value = value.decode()  # noqa: PLW2901
+            except UnicodeError as error:
+                msg = gettext_noop("Invalid CAT header '%(header)s'. Should not contain non-ASCII characters.")
+                params = {"header": header_key}
+                raise CATVerificationError(msg, code=error_codes.INVALID_CAT_HEADER, params=params) from error
+
+        headers[header_key] = value
+    return headers
+
+
+def validate_cat_headers(cat_headers: dict[HeaderKey, HeaderValue], schema: CATHeaderSchema) -> dict[HeaderKey, Any]:
+    """
+    Convert the CAT headers with the validators in the given schema.
+
+    :raises CATVerificationError: A header is not valid, or required headers are missing.
+    """
+    data: dict[HeaderKey, Any] = {}
+
+    for header_key, header_value in cat_headers.items():
+        validator = schema.validators.get(header_key)
+        if validator is None:
+            if header_key not in schema.valid_headers:
+                msg = gettext_noop("Unrecognized CAT header: '%(header)s'.")
+                params = {"header": header_key}
+                raise CATVerificationError(msg, code=error_codes.UNRECOGNIZED_CAT_HEADER, params=params)
+
+            msg = gettext_noop("Missing validation function for header: '%(header)s'.")
+            params = {"header": header_key}
+            raise CATVerificationError(msg, code=error_codes.MISSING_VALIDATION_FUNCTION, params=params)
+
+        data[header_key] = validator(header_value)
+
+    if not data.keys() >= schema.required_headers:
+        msg = gettext_noop("Missing required headers: %(required_headers)s.")
+        params = {
+            "required_headers": as_human_readable_list(
+                header for header in schema.required_headers if header not in data
+            ),
+        }
+        raise CATVerificationError(msg, code=error_codes.MISSING_REQUIRED_HEADERS, params=params)
+
+    return data
+
+
+def validate_cat_token(  # noqa: PLR0913
+    token: str,
+    cat_headers: dict[HeaderKey, HeaderValue],
+    cat_info: dict[HeaderKey, Any] | None = None,
+    *,
+    schema: CATHeaderSchema,
+    encoded_claims: bytes | None = None,
+    verification_key: str | None = None,
+) -> None:
+    """
+    Check that the CAT was created for the given CAT headers.
+
+    :raises CATVerificationError: CAT is not valid, or it cannot be created for comparison.
+    """
+    # Identical CATs and headers that have already been verified are not verified again.
+    # Headers, including `CAT-Valid-Until`, are still validated and nonces checked for each request.
+    cache_key = get_verified_cat_cache_key(token, cat_headers)
+    if cache_key is not None and is_verified_cat(cache_key):
+        return
+
+    try:
+        if verification_key is None:
+            verification_key = get_cat_verification_key()
+        cat = create_cat_mac_for_headers(
+            cat_headers,
+            schema=schema,
+            encoded_claims=encoded_claims,
+            verification_key=verification_key,
+        )
+    except Exception as error:  # pragma: no cover
+        raise CATVerificationError(str(error), code=error_codes.SERVICE_SETUP_ERROR) from error
+
+    compare_cat(token, cat)
+
+    if cache_key is not None:
+        add_verified_cat(cache_key, valid_until=get_valid_until(cat_info), verification_key=verification_key)
+
+
+async def avalidate_cat_token(
+    token: str,
+    cat_headers: dict[HeaderKey, HeaderValue],
+    cat_info: dict[HeaderKey, Any] | None = None,
+    *,
+    schema: CATHeaderSchema,
+    encoded_claims: bytes | None = None,
+) -> None:
+    """See `validate_cat_token`. Verification key is fetched from the CA with an async HTTP client."""
+    validate_cat_token(
+        token,
+        cat_headers,
+        cat_info,
+        schema=schema,
+        encoded_claims=encoded_claims,
+        verification_key=await aget_verification_key(),
+    )
+
+
+async def aget_verification_key() -> str:
+    """
+    Get the CAT verification key with an async HTTP client.
+
+    :raises CATVerificationError: Key cannot be fetched from the CA.
+    """
+    try:
+        return await aget_cat_verification_key()
+    except Exception as error:  # pragma: no cover
+        raise CATVerificationError(str(error), code=error_codes.SERVICE_SETUP_ERROR) from error
+
+
+def create_cat_mac_for_headers(
+    cat_headers: dict[HeaderKey, HeaderValue],
+    *,
+    schema: CATHeaderSchema,
+    encoded_claims: bytes | None,
+    verification_key: str,
+) -> bytes:
+    """Create the CAT for the given CAT headers, or for the `CAT-Claims` JSON as it was received."""
+    identity = cat_headers[known_headers.IDENTITY]
+    if encoded_claims is None:
+        encoded_claims = encode_cat_claims(get_cat_claims(cat_headers, schema))
+    return derive_cat_creation_key(identity=identity, verification_key=verification_key).mac(encoded_claims)
+
+
+def get_cat_claims(cat_headers: dict[HeaderKey, HeaderValue], schema: CATHeaderSchema) -> dict[str, HeaderValue]:
+    claim_names = schema.claim_names
+    return {claim_names.get(key) or from_cat_header_name(key): value for key, value in cat_headers.items()}
+
+
+def compare_cat(token: str, cat: bytes) -> None:
+    if not compare_digest(token.encode(), cat):
+        msg = gettext_noop("Invalid CAT.")
+        raise CATVerificationError(msg, code=error_codes.INVALID_CAT)
+
+
+def validate_nonce_replay(cat_info: dict[HeaderKey, Any]) -> None:
+    """
+    Check that the CAT's nonce has not been used during the nonce replay window, and mark it as used.
+
+    :raises CATVerificationError: Nonce has already been used, or it cannot be checked.
+    """
+    nonce_store = get_nonce_store()
+    nonce = cat_info.get(known_headers.NONCE)
+    if nonce_store is None or nonce is None:
+        return
+
+    now = get_request_time()
+    expires_at = get_nonce_expiry(
+        timestamp=cat_info.get(known_headers.TIMESTAMP),
+        valid_until=cat_info.get(known_headers.VALID_UNTIL),
+        window=cat_service_settings.NONCE_REPLAY_WINDOW.total_seconds(),
+    )
+    if expires_at is None:
+        msg = gettext_noop("CAT with a 'CAT-Nonce' must also have a 'CAT-Timestamp' or 'CAT-Valid-Until' header.")
+        raise CATVerificationError(msg, code=error_codes.NONCE_OUTSIDE_WINDOW)
+
+    # Nonce store's window includes the `LEEWAY` setting, so CATs from clients with clocks running ahead are accepted.
+    if not now < expires_at <= now + nonce_store.window:
+        msg = gettext_noop("CAT is not valid during the nonce replay window, cannot check 'CAT-Nonce'.")
+        raise CATVerificationError(msg, code=error_codes.NONCE_OUTSIDE_WINDOW)
+
+    if not nonce_store.add(cat_info[known_headers.IDENTITY], nonce, expires_at=expires_at, now=now):
+        msg = gettext_noop("'CAT-Nonce' has already been used.")
+        raise CATVerificationError(msg, code=error_codes.NONCE_ALREADY_USED)
+
+
+def get_valid_until(cat_info: dict[HeaderKey, Any] | None) -> float | None:
+    if cat_info is None:
+        return None
+    valid_until = cat_info.get(known_headers.VALID_UNTIL)
+    return None if valid_until is None else to_epoch(valid_until)
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from functools import cache
+from typing import TYPE_CHECKING
+
+from django.core.cache import caches
+from django.test.signals import setting_changed
+
+from cat_service.settings import SETTING_NAME, cat_service_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+    from cat_common.typing import Any, Callable, ClassVar
+
+
+__all__ = [
+    "SharedCredentialStore",
+    "get_shared_credential_store",
+]
+
+
+# Is the shared credential lock held in the current thread or task?
+_lock_held: ContextVar[bool] = ContextVar("cat_shared_credentials_lock_held", default=False)
+
+
+class SharedCredentialStore:
+    """
+    Share credentials fetched from the CA between processes using a Django cache,
+    so that only one process needs to fetch them from the CA.
+
+    Credentials are kept in a single versioned record, which is always replaced as a whole.
+    Credentials are fetched from the CA only while holding a lock in the cache, and other processes
+    wait for the result instead of fetching the credentials themselves.
+
+    Note that the service's private key is shared as well, so the cache should only be accessible by the service.
+    """
+
+    version: ClassVar[int] = 1
+    """Version of the record format. Records in other formats are ignored."""
+    key: ClassVar[str] = "cat_shared_credentials"
+    lock_key: ClassVar[str] = "cat_shared_credentials:lock"
+    poll_interval: ClassVar[float] = 0.05
+
+    def __init__(self, *, alias: str, lock_timeout: float) -> None:
+        """
+        Create a new shared credential store.
+
+        :param alias: Alias of the Django cache to use.
+        :param lock_timeout: How long to wait for another process to fetch credentials in seconds.
+        """
+        self.cache = caches[alias]
+        self.lock_timeout = lock_timeout
+        # Latest generation of each credential that this process has used.
+        self._generations: dict[str, int] = {}
+
+    def fetch(self, name: str, fetch: Callable[[], Any], *, is_usable: Callable[[Any], bool] | None = None) -> Any:
+        """
+        Get a credential that another process has fetched after this process last got it,
+        or fetch it and share it with other processes.
+
+        :param name: Name of the credential.
+        :param fetch: Function that fetches the credential from the CA.
+        :param is_usable: Function that checks if a shared credential can be used.
+        """
+        # Credentials needed while fetching another credential are fetched under the same lock.
+        if _lock_held.get():
+            return self._get_or_fetch(self.cache.get(self.key), name, fetch, is_usable)
+
+        value = self._get_newer(self.cache.get(self.key), name, is_usable)
+        if value is not None:
+            return value
+
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            if self.cache.add(self.lock_key, os.getpid(), timeout=self.lock_timeout):
+                token = _lock_held.set(True)
+                try:
+                    return self._get_or_fetch(self.cache.get(self.key), name, fetch, is_usable)
+                finally:
+                    _lock_held.reset(token)
+                    self.cache.delete(self.lock_key)
+
+            time.sleep(self.poll_interval)
+            value = self._get_newer(self.cache.get(self.key), name, is_usable)
+            if value is not None:
+                return value
+
+        # Process holding the lock is taking too long.
+        return fetch()
+
+    async def afetch(
+        self,
+        name: str,
+        fetch: Callable[[], Awaitable[Any]],
+        *,
+        is_usable: Callable[[Any], bool] | None = None,
+    ) -> Any:
+        """
+        Get a credential that another process has fetched after this process last got it,
+        or fetch it and share it with other processes, without blocking the event loop.
+
+        :param name: Name of the credential.
+        :param fetch: Async function that fetches the credential from the CA.
+        :param is_usable: Function that checks if a shared credential can be used.
+        """
+        if _lock_held.get():
+            return await self._aget_or_fetch(await self.cache.aget(self.key), name, fetch, is_usable)
+
+        value = self._get_newer(await self.cache.aget(self.key), name, is_usable)
+        if value is not None:
+            return value
+
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            if await self.cache.aadd(self.lock_key, os.getpid(), timeout=self.lock_timeout):
+                token = _lock_held.set(True)
+                try:
+                    return await self._aget_or_fetch(await self.cache.aget(self.key), name, fetch, is_usable)
+                finally:
+                    _lock_held.reset(token)
+                    await self.cache.adelete(self.lock_key)
+
+            await asyncio.sleep(self.poll_interval)
+            value = self._get_newer(await self.cache.aget(self.key), name, is_usable)
+            if value is not None:
+                return value
+
+        return await fetch()
+
+    def _get_newer(self, record: dict[str, Any] | None, name: str, is_usable: Callable[[Any], bool] | None) -> Any:
+        if record is None or record.get("version") != self.version:
+            return None
+
+        entry: tuple[int, Any] | None = record["credentials"].get(name)
+        if entry is None:
+            return None
+
+        generation, value = entry
+        if generation <= self._generations.get(name, 0):
+            return None
+        if is_usable is not None and not is_usable(value):
+            return None
+
+        self._generations[name] = generation
+        return value
+
+    def _get_or_fetch(
+        self,
+        record: dict[str, Any] | None,
+        name: str,
+        fetch: Callable[[], Any],
+        is_usable: Callable[[Any], bool] | None,
+    ) -> Any:
+        value = self._get_newer(record, name, is_usable)
+        if value is not None:
+            return value
+
+        value = fetch()
+        # Record might have been updated while fetching, e.g., with credentials needed for the fetch.
+        record = self.cache.get(self.key)
+        self.cache.set(self.key, self._new_record(record, name, value), timeout=None)
+        return value
+
+    async def _aget_or_fetch(
+        self,
+        record: dict[str, Any] | None,
+        name: str,
+        fetch: Callable[[], Awaitable[Any]],
+        is_usable: Callable[[Any], bool] | None,
+    ) -> Any:
+        value = self._get_newer(record, name, is_usable)
+        if value is not None:
+            return value
+
+        value = await fetch()
+        record = await self.cache.aget(self.key)
+        await self.cache.aset(self.key, self._new_record(record, name, value), timeout=None)
+        return value
+
+    def _new_record(self, record: dict[str, Any] | None, name: str, value: Any) -> dict[str, Any]:
+        if record is None or record.get("version") != self.version:
+            record = {"version": self.version, "generation": 0, "credentials": {}}
+
+        generation = record["generation"] + 1
+        self._generations[name] = generation
+        return {
+            "version": self.version,
+            "generation": generation,
+            "credentials": {**record["credentials"], name: (generation, value)},
+        }
+
+
+@cache
+def get_shared_credential_store() -> SharedCredentialStore | None:
+    """Get the store for sharing credentials between processes, or `None` if credentials are not shared."""
+    if not cat_service_settings.SHARED_CREDENTIALS_CACHE_ALIAS:
+        return None
+
+    return SharedCredentialStore(
+        alias=cat_service_settings.SHARED_CREDENTIALS_CACHE_ALIAS,
+        lock_timeout=cat_service_settings.SHARED_CREDENTIALS_LOCK_TIMEOUT.total_seconds(),
+    )
+
+
+def reset_shared_credential_store(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_shared_credential_store.cache_clear()
+
+
+setting_changed.connect(reset_shared_credential_store)
@@ -1,56 +1,297 @@
 from __future__ import annotations
 
+import base64
 import datetime
-import json
+import hashlib
+import os
+from functools import cache, partial
+from typing import TYPE_CHECKING
 
 import httpx
 from cryptography import x509
 from cryptography.hazmat._oid import NameOID
 from cryptography.hazmat.primitives.asymmetric import ed25519
+from django.core.exceptions import ImproperlyConfigured
+from django.test.signals import setting_changed
 
-from cat_common.cryptography import deserialize_certificate, hmac, serialize_certificate, serialize_csr
-from cat_service.settings import cat_service_settings
-from cat_service.validation import validate_certificate
+from cat_common import known_headers
+from cat_common.cache import LRUCache
+from cat_common.concurrency import SingleFlight
+from cat_common.cryptography import (
+    KeyedMAC,
+    decode_key,
+    deserialize_certificate,
+    deserialize_private_key,
+    drop_keyed_mac,
+    encode_key,
+    get_keyed_mac,
+    get_mac_backend_name,
+    new_keyed_mac,
+    serialize_certificate,
+    serialize_csr,
+    serialize_private_key,
+)
+from cat_service.credentials import get_shared_credential_store
+from cat_service.encoding import encode_cat_claims
+from cat_service.exceptions import CAUnavailableError
+from cat_service.http import get_async_http_client, get_http_client
+from cat_service.renewal import CertificateRenewer
+from cat_service.resilience import acall_ca, call_ca, get_ca_circuit_breaker
+from cat_service.settings import SETTING_NAME, cat_service_settings
+from cat_service.validation import get_request_time, validate_certificate
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any, HeaderKey, HeaderValue
 
 __all__ = [
+    "acreate_cat",
+    "acreate_cat_mac",
+    "acreate_encoded_cat_mac",
+    "aget_cat_creation_key",
     "create_cat",
+    "create_cat_claims_headers",
     "create_cat_header",
+    "create_cat_mac",
     "create_csr",
+    "create_encoded_cat_mac",
     "get_cat_creation_key",
+    "get_certificate_renewer",
+    "get_creation_key_cache",
+    "get_verified_cat_cache",
+    "warm_up",
 ]
 
 
+# Coalesces concurrent refreshes of the verification key and the service certificate.
+refresh_flight = SingleFlight()
+
+
 def get_cat_verification_key(*, force_refresh: bool = False) -> str:
-    """Get the verification key for a given service entity."""
+    """
+    Get the verification key for a given service entity.
+
+    While the verification key is being refreshed, or if refreshing it fails because the CA is unavailable,
+    the current verification key is used for the time set by the `CA_STALE_IF_ERROR` setting.
+    """
+    verification_key = get_stale_verification_key()
+    if verification_key and (not force_refresh or refresh_flight.in_flight("verification_key")):
+        return verification_key
+
+    try:
+        # Concurrent callers wait for a single request to the CA.
+        return refresh_flight.do("verification_key", partial(fetch_cat_verification_key, force_refresh=force_refresh))
+    except (httpx.HTTPError, CAUnavailableError):
+        verification_key = get_stale_verification_key()
+        if verification_key and is_ca_unavailable():
+            return verification_key
+        raise
+
+
+async def aget_cat_verification_key(*, force_refresh: bool = False) -> str:
+    """Get the verification key for a given service entity without blocking the event loop."""
+    verification_key = get_stale_verification_key()
+    if verification_key and (not force_refresh or refresh_flight.in_flight("verification_key")):
+        return verification_key
+
+    try:
+        return await refresh_flight.ado(
+            "verification_key",
+            partial(afetch_cat_verification_key, force_refresh=force_refresh),
+        )
+    except (httpx.HTTPError, CAUnavailableError):
+        verification_key = get_stale_verification_key()
+        if verification_key and is_ca_unavailable():
+            return verification_key
+        raise
+
+
+def fetch_cat_verification_key(*, force_refresh: bool) -> str:
+    # Verification key might have been fetched while waiting for a previous request.
+    if not force_refresh and cat_service_settings.VERIFICATION_KEY != "":
+        return cat_service_settings.VERIFICATION_KEY
+
+    store = get_shared_credential_store()
+    if store is None:
+        return set_verification_key(request_cat_verification_key())
+    return set_verification_key(store.fetch("verification_key", request_cat_verification_key))
+
+
+async def afetch_cat_verification_key(*, force_refresh: bool) -> str:
     if not force_refresh and cat_service_settings.VERIFICATION_KEY != "":
         return cat_service_settings.VERIFICATION_KEY
 
+    store = get_shared_credential_store()
+    if store is None:
+        return set_verification_key(await arequest_cat_verification_key())
+    return set_verification_key(await store.afetch("verification_key", arequest_cat_verification_key))
+
+
+def request_cat_verification_key() -> str:
+    url, data = get_verification_key_request()
+    certificate = get_certificate()
+    headers = {"Authorization": f"Certificate {serialize_certificate(certificate)}"}
+    response = call_ca(partial(get_http_client().post, url, json=data, follow_redirects=True, headers=headers))
+    return get_verification_key_from_response(response.json())
+
+
+async def arequest_cat_verification_key() -> str:
+    url, data = get_verification_key_request()
+    certificate = await aget_certificate()
+    headers = {"Authorization": f"Certificate {serialize_certificate(certificate)}"}
+    client = get_async_http_client()
+    response = await acall_ca(partial(client.post, url, json=data, follow_redirects=True, headers=headers))
+    return get_verification_key_from_response(response.json())
+
+
+def get_verification_key_from_response(data: dict[str, Any]) -> str:
+    # CAs that don't include the MAC backend in their response only support HMAC.
+    mac_backend = data.get("mac_backend")
+    if mac_backend is not None and mac_backend != get_mac_backend_name():
+        msg = f"CA uses the MAC backend {mac_backend!r}, but this service uses {get_mac_backend_name()!r}."
+        raise ImproperlyConfigured(msg)
+    return data["verification_key"]
+
+
+def get_verification_key_request() -> tuple[str, dict[str, str]]:
     url = cat_service_settings.VERIFICATION_KEY_URL
     data = {
         "type": cat_service_settings.SERVICE_TYPE,
         "name": cat_service_settings.SERVICE_NAME,
     }
-    certificate = get_certificate()
-    headers = {"Authorization": f"Certificate {serialize_certificate(certificate)}"}
-    response = httpx.post(url, json=data, follow_redirects=True, headers=headers)
-    response.raise_for_status()
+    return url, data
 
-    response_data = response.json()
-    cat_service_settings.VERIFICATION_KEY = response_data["verification_key"]
+
+def get_stale_verification_key() -> str:
+    """Get the current verification key, or an empty string if it doesn't exist or can no longer be used."""
+    verification_key = cat_service_settings.VERIFICATION_KEY
+    if verification_key == "":
+        return ""
+
+    # Verification key can be used during a CA outage only for a limited time.
+    if get_ca_circuit_breaker().failing_for > cat_service_settings.CA_STALE_IF_ERROR.total_seconds():
+        return ""
+    return verification_key
+
+
+def set_verification_key(verification_key: str) -> str:
+    if verification_key != cat_service_settings.VERIFICATION_KEY:
+        get_creation_key_cache().clear()
+        get_verified_cat_cache().clear()
+        if cat_service_settings.VERIFICATION_KEY:
+            drop_keyed_mac(decode_key(cat_service_settings.VERIFICATION_KEY))
+
+    cat_service_settings.VERIFICATION_KEY = verification_key
     return cat_service_settings.VERIFICATION_KEY
 
 
 def get_cat_creation_key(*, identity: str) -> str:
     verification_key = get_cat_verification_key()
-    return hmac(msg=identity, key=verification_key)
+    return encode_key(derive_cat_creation_key(identity=identity, verification_key=verification_key).key)
+
+
+async def aget_cat_creation_key(*, identity: str) -> str:
+    verification_key = await aget_cat_verification_key()
+    return encode_key(derive_cat_creation_key(identity=identity, verification_key=verification_key).key)
+
+
+def derive_cat_creation_key(*, identity: str, verification_key: str) -> KeyedMAC:
+    creation_key_cache = get_creation_key_cache()
+    cached: tuple[str, KeyedMAC] | None = creation_key_cache.get(identity)
+    # Creation keys are cached with the verification key they were created with,
+    # so that a key created during a verification key refresh is never used afterward.
+    if cached is not None and cached[0] == verification_key:
+        return cached[1]
+
+    creation_key = get_keyed_mac(decode_key(verification_key)).derive_key(identity)
+    keyed_mac = new_keyed_mac(creation_key)
+    creation_key_cache.set(identity, (verification_key, keyed_mac))
+    return keyed_mac
+
+
+@cache
+def get_creation_key_cache() -> LRUCache:
+    """Get the cache for CAT creation keys by identity. Cache is cleared when the verification key changes."""
+    return LRUCache(
+        maxsize=cat_service_settings.CREATION_KEY_CACHE_SIZE,
+        ttl=cat_service_settings.CREATION_KEY_CACHE_TTL.total_seconds(),
+    )
+
+
+@cache
+def get_verified_cat_cache() -> LRUCache:
+    """Get the cache for verified CATs. Cache is cleared when the verification key changes."""
+    return LRUCache(
+        maxsize=cat_service_settings.VERIFIED_CAT_CACHE_SIZE,
+        ttl=cat_service_settings.VERIFIED_CAT_CACHE_TTL.total_seconds(),
+    )
+
+
+def get_verified_cat_cache_key(token: str, cat_headers: dict[HeaderKey, HeaderValue]) -> tuple[str, bytes] | None:
+    """Get the key for a CAT and its headers in the verified CAT cache, or `None` if the cache is disabled."""
+    if cat_service_settings.VERIFIED_CAT_CACHE_SIZE <= 0:
+        return None
+
+    headers_digest = hashlib.blake2b(repr(sorted(cat_headers.items())).encode(), digest_size=16).digest()
+    return token, headers_digest
+
+
+def is_verified_cat(key: tuple[str, bytes]) -> bool:
+    """Has the CAT for the given cache key been verified with the verification key that is currently in use?"""
+    verification_key: str | None = get_verified_cat_cache().get(key)
+    return verification_key is not None and verification_key == get_stale_verification_key()
+
+
+def add_verified_cat(key: tuple[str, bytes], *, valid_until: float | None, verification_key: str) -> None:
+    """
+    Cache a verified CAT with the verification key that was used to verify it.
+
+    :param key: Cache key from `get_verified_cat_cache_key`.
+    :param valid_until: Unix timestamp after which the CAT is no longer valid, if it has one.
+    :param verification_key: Verification key the CAT was verified with.
+    """
+    ttl = None
+    if valid_until is not None:
+        ttl = valid_until - get_request_time()
+        if ttl <= 0:
+            return
+
+    get_verified_cat_cache().set(key, verification_key, ttl=ttl)
 
 
 def create_cat(*, identity: str, service_name: str, **kwargs: str) -> str:
-    creation_key = get_cat_creation_key(identity=identity)
+    return create_cat_mac(identity=identity, service_name=service_name, **kwargs).decode()
+
+
+async def acreate_cat(*, identity: str, service_name: str, **kwargs: str) -> str:
+    return (await acreate_cat_mac(identity=identity, service_name=service_name, **kwargs)).decode()
+
+
+def create_cat_mac(*, identity: str, service_name: str, **kwargs: str) -> bytes:
+    """Create a CAT as ASCII bytes, so that it can be compared to a CAT in a request without decoding it."""
+    verification_key = get_cat_verification_key()
+    creation_key = derive_cat_creation_key(identity=identity, verification_key=verification_key)
     kwargs["identity"] = identity
     kwargs["service_name"] = service_name
-    cat_info = json.dumps(kwargs, sort_keys=True, default=str)
-    return hmac(msg=cat_info, key=creation_key)
+    return creation_key.mac(encode_cat_claims(kwargs))
+
+
+async def acreate_cat_mac(*, identity: str, service_name: str, **kwargs: str) -> bytes:
+    verification_key = await aget_cat_verification_key()
+    creation_key = derive_cat_creation_key(identity=identity, verification_key=verification_key)
+    kwargs["identity"] = identity
+    kwargs["service_name"] = service_name
+    return creation_key.mac(encode_cat_claims(kwargs))
+
+
+def create_encoded_cat_mac(*, identity: str, claims: bytes) -> bytes:
+    """Create a CAT as ASCII bytes for claims that have already been encoded, e.g., from the `CAT-Claims` header."""
+    verification_key = get_cat_verification_key()
+    return derive_cat_creation_key(identity=identity, verification_key=verification_key).mac(claims)
+
+
+async def acreate_encoded_cat_mac(*, identity: str, claims: bytes) -> bytes:
+    verification_key = await aget_cat_verification_key()
+    return derive_cat_creation_key(identity=identity, verification_key=verification_key).mac(claims)
 
 
 def create_cat_header(*, identity: str, service_name: str, **kwargs: str) -> str:
@@ -58,29 +299,193 @@ def create_cat_header(*, identity: str, service_name: str, **kwargs: str) -> str
     return f"{cat_service_settings.AUTH_SCHEME} {cat}"
 
 
+def create_cat_claims_headers(*, identity: str, service_name: str, **kwargs: str) -> dict[str, str]:
+    """
+    Create the `Authorization` and `CAT-Claims` headers for sending all CAT claims in a single header.
+    Services must have the `CLAIMS_HEADER` setting enabled to accept them.
+    """
+    kwargs["identity"] = identity
+    kwargs["service_name"] = service_name
+    claims = encode_cat_claims(kwargs)
+    cat = create_encoded_cat_mac(identity=identity, claims=claims).decode()
+    return {
+        "Authorization": f"{cat_service_settings.AUTH_SCHEME} {cat}",
+        known_headers.CLAIMS: base64.urlsafe_b64encode(claims).rstrip(b"=").decode(),
+    }
+
+
 def get_certificate(*, force_refresh: bool = False) -> x509.Certificate:
+    """
+    Get the service certificate.
+
+    While the certificate is being refreshed, or if refreshing it fails because the CA is unavailable,
+    the current certificate is used for the time set by the `CA_STALE_IF_ERROR` setting after it expires.
+    """
+    if not force_refresh and has_valid_certificate():
+        return cat_service_settings.SERVICE_CERTIFICATE  # pragma: no cover
+
+    certificate = get_stale_certificate()
+    if certificate is not None and refresh_flight.in_flight("certificate"):
+        return certificate
+
+    try:
+        # Concurrent callers wait for a single request to the CA.
+        return refresh_flight.do("certificate", partial(fetch_certificate, force_refresh=force_refresh))
+    except (httpx.HTTPError, CAUnavailableError):
+        if certificate is not None and is_ca_unavailable():
+            return certificate
+        raise
+
+
+async def aget_certificate(*, force_refresh: bool = False) -> x509.Certificate:
+    if not force_refresh and has_valid_certificate():
+        return cat_service_settings.SERVICE_CERTIFICATE  # pragma: no cover
+
+    certificate = get_stale_certificate()
+    if certificate is not None and refresh_flight.in_flight("certificate"):
+        return certificate
+
+    try:
+        return await refresh_flight.ado("certificate", partial(afetch_certificate, force_refresh=force_refresh))
+    except (httpx.HTTPError, CAUnavailableError):
+        if certificate is not None and is_ca_unavailable():
+            return certificate
+        raise
+
+
+def fetch_certificate(*, force_refresh: bool) -> x509.Certificate:
+    # Certificate might have been fetched while waiting for a previous request.
+    if not force_refresh and has_valid_certificate():
+        return cat_service_settings.SERVICE_CERTIFICATE  # pragma: no cover
+
+    store = get_shared_credential_store()
+    if store is None:
+        return set_certificate(request_certificate())
+    credentials = store.fetch("certificate", request_shared_certificate, is_usable=is_usable_shared_certificate)
+    return set_shared_certificate(credentials)
+
+
+async def afetch_certificate(*, force_refresh: bool) -> x509.Certificate:
+    if not force_refresh and has_valid_certificate():
+        return cat_service_settings.SERVICE_CERTIFICATE  # pragma: no cover
+
+    store = get_shared_credential_store()
+    if store is None:
+        return set_certificate(await arequest_certificate())
+    credentials = await store.afetch(
+        "certificate",
+        arequest_shared_certificate,
+        is_usable=is_usable_shared_certificate,
+    )
+    return set_shared_certificate(credentials)
+
+
+def request_certificate() -> x509.Certificate:
+    url, data = get_certificate_request()
+    response = call_ca(partial(get_http_client().post, url, json=data, follow_redirects=True))
+    return get_certificate_from_response(response)
+
+
+async def arequest_certificate() -> x509.Certificate:
+    url, data = get_certificate_request()
+    response = await acall_ca(partial(get_async_http_client().post, url, json=data, follow_redirects=True))
+    return get_certificate_from_response(response)
+
+
+def request_shared_certificate() -> tuple[str, str]:
+    certificate = request_certificate()
+    return serialize_certificate(certificate), serialize_private_key(cat_service_settings.SERVICE_PRIVATE_KEY)
+
+
+async def arequest_shared_certificate() -> tuple[str, str]:
+    certificate = await arequest_certificate()
+    return serialize_certificate(certificate), serialize_private_key(cat_service_settings.SERVICE_PRIVATE_KEY)
+
+
+def is_usable_shared_certificate(credentials: tuple[str, str]) -> bool:
+    certificate = deserialize_certificate(credentials[0])
+    return certificate.not_valid_after_utc > datetime.datetime.now(tz=datetime.timezone.utc)
+
+
+def set_shared_certificate(credentials: tuple[str, str]) -> x509.Certificate:
+    certificate = deserialize_certificate(credentials[0])
+    private_key = cat_service_settings.SERVICE_PRIVATE_KEY
+
+    # Certificate was created for the private key of the process that fetched it.
+    cat_service_settings.SERVICE_PRIVATE_KEY = deserialize_private_key(credentials[1])
+    try:
+        validate_certificate(certificate)
+    except Exception:
+        cat_service_settings.SERVICE_PRIVATE_KEY = private_key
+        raise
+
+    return set_certificate(certificate)
+
+
+def has_valid_certificate() -> bool:
     now = datetime.datetime.now(tz=datetime.timezone.utc)
-    if (
-        not force_refresh
-        and cat_service_settings.SERVICE_CERTIFICATE is not None
+    return (
+        cat_service_settings.SERVICE_CERTIFICATE is not None
         and cat_service_settings.SERVICE_CERTIFICATE.not_valid_after_utc > now
-    ):
-        return cat_service_settings.SERVICE_CERTIFICATE  # pragma: no cover
+    )
+
 
+def get_stale_certificate() -> x509.Certificate | None:
+    """Get the current service certificate, or `None` if it doesn't exist or can no longer be used."""
+    certificate = cat_service_settings.SERVICE_CERTIFICATE
+    if certificate is None:
+        return None
+
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    if certificate.not_valid_after_utc + cat_service_settings.CA_STALE_IF_ERROR <= now:
+        return None
+    return certificate
+
+
+def is_ca_unavailable() -> bool:
+    """Have requests to the CA failed because the CA is unavailable?"""
+    return get_ca_circuit_breaker().failing_for > 0
+
+
+def get_certificate_request() -> tuple[str, dict[str, str]]:
     csr = create_csr()
     url = cat_service_settings.CERTIFICATE_URL
     data = {"csr": serialize_csr(csr)}
+    return url, data
 
-    response = httpx.post(url, json=data, follow_redirects=True)
-    response.raise_for_status()
 
+def get_certificate_from_response(response: httpx.Response) -> x509.Certificate:
     response_data = response.json()
     certificate = deserialize_certificate(response_data["certificate"])
     validate_certificate(certificate)
+    return certificate
+
+
+def set_certificate(certificate: x509.Certificate) -> x509.Certificate:
     cat_service_settings.SERVICE_CERTIFICATE = certificate
+
+    if cat_service_settings.CERTIFICATE_RENEWAL:
+        get_certificate_renewer().start()
+
     return cat_service_settings.SERVICE_CERTIFICATE
 
 
+def renew_certificate() -> x509.Certificate:
+    return refresh_flight.do("certificate", partial(fetch_certificate, force_refresh=True))
+
+
+@cache
+def get_certificate_renewer() -> CertificateRenewer:
+    """Get the renewer that renews the service certificate in the background before it expires."""
+    return CertificateRenewer(
+        get_certificate=lambda: cat_service_settings.SERVICE_CERTIFICATE,
+        renew=renew_certificate,
+        fraction=cat_service_settings.CERTIFICATE_RENEWAL_FRACTION,
+        jitter=cat_service_settings.CERTIFICATE_RENEWAL_JITTER,
+        retry_interval=cat_service_settings.CERTIFICATE_RENEWAL_RETRY_INTERVAL.total_seconds(),
+    )
+
+
 def create_csr() -> x509.CertificateSigningRequest:
     subject: list[x509.NameAttribute] = [x509.NameAttribute(NameOID.COMMON_NAME, cat_service_settings.SERVICE_NAME)]
     if cat_service_settings.SERVICE_ORGANIZATION:  # pragma: no cover
@@ -95,3 +500,37 @@ def create_csr() -> x509.CertificateSigningRequest:
         .subject_name(x509.Name(subject))
         .sign(cat_service_settings.SERVICE_PRIVATE_KEY, None)
     )
+
+
+def warm_up() -> None:
+    """
+    Fetch and validate the service certificate and verification key from the CA,
+    so that they don't need to be fetched during the first authenticated requests.
+    The certificate is fetched even if the verification key is set by the `VERIFICATION_KEY` setting,
+    since it's still needed for creating CATs.
+    """
+    get_certificate()
+    get_cat_verification_key()
+
+
+def reset_after_fork() -> None:
+    # Threads don't survive a fork, so calls in flight in the parent process never finish in the forked process,
+    # and the renewal thread is restarted there.
+    refresh_flight.reset()
+    if get_certificate_renewer.cache_info().currsize and cat_service_settings.SERVICE_CERTIFICATE is not None:
+        get_certificate_renewer().start()
+
+
+def reset_caches(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_creation_key_cache.cache_clear()
+        get_verified_cat_cache.cache_clear()
+        if get_certificate_renewer.cache_info().currsize:
+            get_certificate_renewer().stop()
+        get_certificate_renewer.cache_clear()
+
+
+setting_changed.connect(reset_caches)
+
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    os.register_at_fork(after_in_child=reset_after_fork)
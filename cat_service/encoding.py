@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+from functools import cache
+from json.encoder import encode_basestring_ascii
+from typing import TYPE_CHECKING
+
+from django.test.signals import setting_changed
+
+from cat_service.settings import SETTING_NAME
+from cat_service.utils import from_cat_header_name, get_valid_cat_headers
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any
+
+
+__all__ = [
+    "encode_cat_claims",
+]
+
+
+def encode_cat_claims(claims: dict[str, Any]) -> bytes:
+    """
+    Encode the given CAT claims to the canonical form that is signed to create a CAT.
+
+    Output is the same as `json.dumps(claims, sort_keys=True, default=str).encode()`,
+    but claims for valid CAT headers with string values are encoded without sorting or a JSON encoder pass.
+    """
+    parts: list[str] = []
+    for name, prefix in get_claim_prefixes():
+        value = claims.get(name)
+        if value is None:
+            continue
+        if value.__class__ is not str:
+            return _encode_json(claims)
+        parts.append(prefix + encode_basestring_ascii(value))
+
+    # Some claims were not for valid CAT headers.
+    if len(parts) != len(claims):
+        return _encode_json(claims)
+
+    return ("{" + ", ".join(parts) + "}").encode()
+
+
+@cache
+def get_claim_prefixes() -> tuple[tuple[str, str], ...]:
+    """Claim names for valid CAT headers in sorted order, with their encoded key prefixes (e.g., '"nonce": ')."""
+    names = sorted(from_cat_header_name(header) for header in get_valid_cat_headers())
+    return tuple((name, f"{encode_basestring_ascii(name)}: ") for name in names)
+
+
+def _encode_json(claims: dict[str, Any]) -> bytes:
+    return json.dumps(claims, sort_keys=True, default=str).encode()
+
+
+def reset_claim_prefixes(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_claim_prefixes.cache_clear()
+
+
+setting_changed.connect(reset_claim_prefixes)
@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from cat_common.exceptions import CATVerificationError
+
+__all__ = [
+    "CATVerificationError",
+    "CAUnavailableError",
+]
+
+
+class CAUnavailableError(Exception):
+    """Requests to the CA are failing fast, since the CA has been unavailable."""
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from functools import cache
+from typing import TYPE_CHECKING
+
+from django.core.cache import caches
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from cat_common.cache import LRUCache
+from cat_service.settings import SETTING_NAME, cat_service_settings
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any
+
+
+__all__ = [
+    "BaseFailureLimiter",
+    "DjangoFailureLimiter",
+    "LocalFailureLimiter",
+    "count_failure",
+    "get_failure_counts",
+    "get_failure_limiter",
+    "reset_failure_counts",
+]
+
+
+class BaseFailureLimiter(ABC):
+    """
+    Base class for limiters for failed CAT authentications.
+
+    Failures are counted per key, e.g., per identity or client address, over a sliding time window.
+    When a key has failed authentication `limit` times during the window, it's denied
+    for `block_time` seconds, so that its requests can be rejected before any other work is done.
+    """
+
+    def __init__(self, *, limit: int, window: float, block_time: float) -> None:
+        """
+        Create a new failure limiter.
+
+        :param limit: How many failed authentications are allowed per key during the time window.
+        :param window: Length of the sliding time window in seconds.
+        :param block_time: How long keys that exceed the limit are denied in seconds.
+        """
+        self.limit = limit
+        self.window = window
+        self.block_time = block_time
+
+    @abstractmethod
+    def is_blocked(self, keys: list[str]) -> bool:
+        """Is any of the given keys currently denied?"""
+
+    @abstractmethod
+    def record_failure(self, keys: list[str]) -> None:
+        """Record a failed authentication for the given keys, and deny the ones that exceed the limit."""
+
+    async def ais_blocked(self, keys: list[str]) -> bool:
+        return self.is_blocked(keys)
+
+    async def arecord_failure(self, keys: list[str]) -> None:
+        self.record_failure(keys)
+
+    def get_count(self, *, current: int, previous: int, now: float) -> float:
+        """
+        Estimate the number of failures during the sliding window ending `now`
+        from the counts of the current and previous fixed windows.
+        """
+        elapsed = (now % self.window) / self.window
+        return previous * (1 - elapsed) + current
+
+
+class LocalFailureLimiter(BaseFailureLimiter):
+    """
+    Count failed authentications in process memory.
+
+    The number of tracked keys is bounded by the `FAILURE_LIMITER_SIZE` setting,
+    and least recently failed keys are forgotten first.
+    """
+
+    def __init__(self, *, limit: int, window: float, block_time: float) -> None:
+        super().__init__(limit=limit, window=window, block_time=block_time)
+        # Key -> [window number, failures in the window, failures in the previous window, denied until]
+        self.cache = LRUCache(maxsize=cat_service_settings.FAILURE_LIMITER_SIZE, ttl=2 * window + block_time)
+        self._lock = threading.Lock()
+
+    def is_blocked(self, keys: list[str]) -> bool:
+        now = time.time()
+        for key in keys:
+            state: list[Any] | None = self.cache.get(key)
+            if state is not None and state[3] > now:
+                return True
+        return False
+
+    def record_failure(self, keys: list[str]) -> None:
+        now = time.time()
+        current_window = int(now // self.window)
+        with self._lock:
+            for key in keys:
+                state: list[Any] | None = self.cache.get(key)
+                if state is None:
+                    state = [current_window, 0, 0, 0.0]
+                    self.cache.set(key, state)
+                elif state[0] != current_window:
+                    state[2] = state[1] if state[0] == current_window - 1 else 0
+                    state[1] = 0
+                    state[0] = current_window
+
+                state[1] += 1
+                if self.get_count(current=state[1], previous=state[2], now=now) >= self.limit:
+                    state[3] = now + self.block_time
+                    # Keep denied keys in the cache for the whole block time.
+                    self.cache.set(key, state)
+
+
+class DjangoFailureLimiter(BaseFailureLimiter):
+    """
+    Count failed authentications in the Django cache set by the `FAILURE_LIMITER_CACHE_ALIAS` setting,
+    so that the limits are shared between processes.
+    """
+
+    key_prefix: str = "cat_failures:"
+
+    def __init__(self, *, limit: int, window: float, block_time: float) -> None:
+        super().__init__(limit=limit, window=window, block_time=block_time)
+        self.cache = caches[cat_service_settings.FAILURE_LIMITER_CACHE_ALIAS]
+
+    def is_blocked(self, keys: list[str]) -> bool:
+        return bool(self.cache.get_many([self.get_blocked_key(key) for key in keys]))
+
+    def record_failure(self, keys: list[str]) -> None:
+        now = time.time()
+        current_window = int(now // self.window)
+        for key in keys:
+            current_key = self.get_window_key(key, current_window)
+            self.cache.add(current_key, 0, timeout=2 * self.window)
+            current = self.cache.incr(current_key)
+            previous = self.cache.get(self.get_window_key(key, current_window - 1), 0)
+            if self.get_count(current=current, previous=previous, now=now) >= self.limit:
+                self.cache.set(self.get_blocked_key(key), now + self.block_time, timeout=self.block_time)
+
+    async def ais_blocked(self, keys: list[str]) -> bool:
+        return bool(await self.cache.aget_many([self.get_blocked_key(key) for key in keys]))
+
+    async def arecord_failure(self, keys: list[str]) -> None:
+        now = time.time()
+        current_window = int(now // self.window)
+        for key in keys:
+            current_key = self.get_window_key(key, current_window)
+            await self.cache.aadd(current_key, 0, timeout=2 * self.window)
+            current = await self.cache.aincr(current_key)
+            previous = await self.cache.aget(self.get_window_key(key, current_window - 1), 0)
+            if self.get_count(current=current, previous=previous, now=now) >= self.limit:
+                await self.cache.aset(self.get_blocked_key(key), now + self.block_time, timeout=self.block_time)
+
+    def get_window_key(self, key: str, window: int) -> str:
+        return f"{self.key_prefix}{self.hash_key(key)}:{window}"
+
+    def get_blocked_key(self, key: str) -> str:
+        return f"{self.key_prefix}{self.hash_key(key)}:blocked"
+
+    def hash_key(self, key: str) -> str:
+        # Keys can contain header values, which are not always valid cache keys.
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+@cache
+def get_failure_limiter() -> BaseFailureLimiter | None:
+    """Get the limiter set by the `FAILURE_LIMITER` setting, or `None` if failed authentications are not limited."""
+    if not cat_service_settings.FAILURE_LIMITER:
+        return None
+
+    return import_string(cat_service_settings.FAILURE_LIMITER)(
+        limit=cat_service_settings.FAILURE_LIMIT,
+        window=cat_service_settings.FAILURE_WINDOW.total_seconds(),
+        block_time=cat_service_settings.FAILURE_BLOCK_TIME.total_seconds(),
+    )
+
+
+_failure_counts: Counter[str] = Counter()
+_failure_counts_lock = threading.Lock()
+
+
+def count_failure(code: str) -> None:
+    """Count a failed authentication by its error code."""
+    with _failure_counts_lock:
+        _failure_counts[code] += 1
+
+
+def get_failure_counts() -> dict[str, int]:
+    """Get the number of failed authentications in this process by error code."""
+    with _failure_counts_lock:
+        return dict(_failure_counts)
+
+
+def reset_failure_counts() -> None:
+    with _failure_counts_lock:
+        _failure_counts.clear()
+
+
+def reset_failure_limiter(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_failure_limiter.cache_clear()
+
+
+setting_changed.connect(reset_failure_limiter)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+from functools import cache
+from typing import TYPE_CHECKING
+
+import httpx
+from django.test.signals import setting_changed
+
+from cat_service.settings import SETTING_NAME, cat_service_settings
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any
+
+
+__all__ = [
+    "HTTPClientPool",
+    "aclose_http_clients",
+    "get_async_http_client",
+    "get_http_client",
+    "get_http_client_pool",
+]
+
+
+class HTTPClientPool:
+    """
+    Lazily created HTTP clients for requests made to the CA, reused so that connections are kept alive.
+
+    A sync client is shared by all threads in the process, and an async client is created for each event loop.
+    If the process has forked since a client was created, a new client is created for the child process,
+    since connections opened by the parent process cannot be shared with it.
+    """
+
+    def __init__(self, **options: Any) -> None:
+        """
+        Create a new client pool.
+
+        :param options: Options for creating the `httpx` clients.
+        """
+        self.options = options
+        self._client: httpx.Client | None = None
+        self._async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def get(self) -> httpx.Client:
+        client = self._client
+        if client is not None and self._pid == os.getpid():
+            return client
+
+        with self._lock:
+            self._check_fork()
+            if self._client is None:
+                self._client = httpx.Client(**self.options)
+            return self._client
+
+    def get_async(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            self._check_fork()
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = httpx.AsyncClient(**self.options)
+            return client
+
+    def _check_fork(self) -> None:
+        pid = os.getpid()
+        if self._pid != pid:
+            # Don't close clients from the parent process, since that would close its connections as well.
+            self._client = None
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._pid = pid
+
+    def close(self) -> None:
+        """
+        Close the sync client and forget the async clients.
+
+        Async clients can only be closed in their own event loop, so they are not closed here.
+        Use `aclose` in each event loop to close them.
+        """
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._async_clients = weakref.WeakKeyDictionary()
+
+    async def aclose(self) -> None:
+        """Close the async client of the running event loop."""
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            self._check_fork()
+            client = self._async_clients.pop(loop, None)
+
+        if client is not None:
+            await client.aclose()
+
+
+@cache
+def get_http_client_pool() -> HTTPClientPool:
+    """Get the HTTP client pool for requests made to the CA, configured by the `HTTP_*` settings."""
+    limits = httpx.Limits(
+        max_connections=cat_service_settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=cat_service_settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=cat_service_settings.HTTP_KEEPALIVE_EXPIRY.total_seconds(),
+    )
+    timeout = httpx.Timeout(cat_service_settings.HTTP_TIMEOUT.total_seconds())
+    return HTTPClientPool(limits=limits, timeout=timeout, http2=cat_service_settings.HTTP2)
+
+
+def get_http_client() -> httpx.Client:
+    """Get the HTTP client for requests made to the CA."""
+    return get_http_client_pool().get()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Get the async HTTP client for requests made to the CA from the running event loop."""
+    return get_http_client_pool().get_async()
+
+
+def close_http_clients() -> None:
+    if get_http_client_pool.cache_info().currsize:
+        get_http_client_pool().close()
+
+
+async def aclose_http_clients() -> None:
+    """
+    Close the async HTTP client of the running event loop,
+    e.g. when an ASGI server shuts down, before the event loop is closed.
+    """
+    if get_http_client_pool.cache_info().currsize:
+        await get_http_client_pool().aclose()
+
+
+def reset_http_clients(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        close_http_clients()
+        get_http_client_pool.cache_clear()
+
+
+atexit.register(close_http_clients)
+setting_changed.connect(reset_http_clients)
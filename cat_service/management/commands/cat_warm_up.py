@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cat_service.cryptography import warm_up
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any
+
+
+__all__ = [
+    "Command",
+]
+
+
+class Command(BaseCommand):
+    help = "Fetch and validate the service certificate and verification key from the CA."
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            warm_up()
+        except Exception as error:
+            msg = f"Failed to fetch credentials from the CA: {error}"
+            raise CommandError(msg) from error
+
+        self.stdout.write(self.style.SUCCESS("Service certificate and verification key are ready."))
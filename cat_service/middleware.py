@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from cat_service.authentication import AUTHENTICATED_ATTRIBUTE, AsyncCATAuthentication, CATAuthentication
+from cat_service.settings import cat_service_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+    from django.http import HttpRequest, HttpResponse
+
+    from cat_common.typing import Any, Callable
+
+
+__all__ = [
+    "CATAuthenticationMiddleware",
+]
+
+
+class CATAuthenticationMiddleware:
+    """
+    Authenticate requests to the URL path prefixes set by the `MIDDLEWARE_PATHS` setting
+    before they reach the view, and reject requests with invalid CATs with a minimal 401 response.
+
+    Authenticated user and claims are stored in the request, and `CATAuthentication` returns them
+    without verifying the CAT again, as long as it uses the same header validators as `authentication_class`.
+    Under ASGI, requests are authenticated with `async_authentication_class`.
+    """
+
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    authentication_class: type[CATAuthentication] = CATAuthentication
+    async_authentication_class: type[AsyncCATAuthentication] = AsyncCATAuthentication
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse | Awaitable[HttpResponse]:
+        if self.is_async:
+            return self.__acall__(request)
+
+        if not self.should_authenticate(request):
+            return self.get_response(request)
+
+        authentication = self.authentication_class()
+        try:
+            user, claims = authentication.authenticate(request)
+        except AuthenticationFailed as error:
+            return self.get_error_response(request, authentication, error)
+
+        setattr(request, AUTHENTICATED_ATTRIBUTE, (authentication.header_validators, user, claims))
+        return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if not self.should_authenticate(request):
+            return await self.get_response(request)
+
+        authentication = self.async_authentication_class()
+        try:
+            user, claims = await authentication.authenticate(request)
+        except AuthenticationFailed as error:
+            return self.get_error_response(request, authentication, error)
+
+        setattr(request, AUTHENTICATED_ATTRIBUTE, (authentication.header_validators, user, claims))
+        return await self.get_response(request)
+
+    def should_authenticate(self, request: HttpRequest) -> bool:
+        paths = cat_service_settings.MIDDLEWARE_PATHS
+        return bool(paths) and request.path_info.startswith(tuple(paths))
+
+    def get_error_response(
+        self,
+        request: HttpRequest,
+        authentication: CATAuthentication,
+        error: AuthenticationFailed,
+    ) -> HttpResponse:
+        response = JsonResponse({"detail": error.detail}, status=error.status_code)
+        response["WWW-Authenticate"] = authentication.authenticate_header(request)
+        return response
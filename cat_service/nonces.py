@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import datetime
+import math
+import threading
+from functools import cache
+from typing import TYPE_CHECKING
+
+from django.test.signals import setting_changed
+
+from cat_common.typing import NamedTuple
+from cat_service.settings import SETTING_NAME, cat_service_settings
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any
+
+
+__all__ = [
+    "NonceReplayStore",
+    "NonceStoreStats",
+    "get_nonce_expiry",
+    "get_nonce_store",
+]
+
+
+class NonceStoreStats(NamedTuple):
+    size: int
+    """Number of nonces currently remembered."""
+    evictions: int
+    """How many nonces have been forgotten after they expired."""
+
+
+class NonceReplayStore:
+    """
+    Thread-safe store for remembering which nonces have been used by which identities.
+
+    Nonces are kept in a timing wheel: a fixed number of time buckets, each holding the nonces
+    that expire during that bucket's time slice. Expired nonces are dropped a whole bucket at a time,
+    so memory use is bounded by the number of nonces used during the time window.
+    """
+
+    def __init__(self, *, window: float, buckets: int) -> None:
+        """
+        Create a new nonce store.
+
+        :param window: For how long nonces can be remembered at most, in seconds.
+        :param buckets: How many time buckets to split the time window into.
+        """
+        self.window = window
+        self.buckets = buckets
+        self.resolution = window / buckets
+        # Nonces expiring at the end of the window from partway into the current time slice need one more bucket.
+        self._slots = buckets + 1
+        self._epochs: list[int] = [-1] * self._slots
+        self._nonces: list[set[tuple[Any, str]]] = [set() for _ in range(self._slots)]
+        # (Identity, nonce) -> epoch of the bucket the nonce is in, so that lookups don't need to scan the buckets.
+        self._index: dict[tuple[Any, str], int] = {}
+        self._swept: int = -1
+        self._evictions: int = 0
+        self._lock = threading.Lock()
+
+    def add(self, identity: Any, nonce: str, *, expires_at: float, now: float) -> bool:
+        """
+        Remember a nonce used by the given identity until it expires.
+        Expiry is limited to the end of the time window starting from `now`.
+
+        :param identity: Identity that used the nonce.
+        :param nonce: The nonce.
+        :param expires_at: Timestamp when the nonce no longer needs to be remembered.
+        :param now: Current timestamp.
+        :return: `False` if the nonce has already been used by the identity, `True` otherwise.
+        """
+        # Bucket for epoch `n` holds nonces expiring during `((n - 1) * resolution, n * resolution]`,
+        # so it has expired once `now // resolution` reaches `n`.
+        current = int(now // self.resolution)
+        epoch = min(max(math.ceil(expires_at / self.resolution), current + 1), current + self._slots)
+        index = epoch % self._slots
+        key = (identity, nonce)
+
+        with self._lock:
+            # Expired buckets only need to be looked for once per time slice.
+            if current > self._swept:
+                for i in range(self._slots):
+                    if self._epochs[i] <= current:
+                        self._drop(i)
+                self._swept = current
+
+            used_until = self._index.get(key)
+            if used_until is not None and used_until > current:
+                return False
+
+            if self._epochs[index] != epoch:
+                self._drop(index)
+                self._epochs[index] = epoch
+
+            self._nonces[index].add(key)
+            self._index[key] = epoch
+            return True
+
+    def _drop(self, index: int) -> None:
+        nonces = self._nonces[index]
+        if nonces:
+            self._evictions += len(nonces)
+            epoch = self._epochs[index]
+            for key in nonces:
+                if self._index.get(key) == epoch:
+                    del self._index[key]
+            self._nonces[index] = set()
+
+    def clear(self) -> None:
+        with self._lock:
+            for i in range(self._slots):
+                self._epochs[i] = -1
+                self._nonces[i] = set()
+            self._index.clear()
+            self._swept = -1
+
+    @property
+    def stats(self) -> NonceStoreStats:
+        with self._lock:
+            return NonceStoreStats(size=len(self._index), evictions=self._evictions)
+
+
+@cache
+def get_nonce_store() -> NonceReplayStore | None:
+    """Get the nonce store for replay protection, or `None` if replay protection is not enabled."""
+    if not cat_service_settings.NONCE_REPLAY_PROTECTION:
+        return None
+
+    # CATs from clients with clocks running ahead can be valid for up to `LEEWAY` longer.
+    return NonceReplayStore(
+        window=(cat_service_settings.NONCE_REPLAY_WINDOW + cat_service_settings.LEEWAY).total_seconds(),
+        buckets=cat_service_settings.NONCE_REPLAY_BUCKETS,
+    )
+
+
+def get_nonce_expiry(
+    *,
+    timestamp: datetime.datetime | float | None,
+    valid_until: datetime.datetime | float | None,
+    window: float,
+) -> float | None:
+    """
+    Get the timestamp after which a nonce used with a CAT no longer needs to be remembered.
+
+    A nonce needs to be remembered until the CAT is no longer valid. If the CAT doesn't have
+    a `CAT-Valid-Until` header, it's considered valid for the nonce window from its `CAT-Timestamp`.
+    If it has neither, the CAT never expires, so its nonce can't be remembered for long enough and `None` is returned.
+    """
+    if valid_until is not None:
+        return to_epoch(valid_until)
+    if timestamp is not None:
+        return to_epoch(timestamp) + window
+    return None
+
+
+def to_epoch(value: datetime.datetime | float) -> float:
+    if not isinstance(value, datetime.datetime):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def reset_nonce_store(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_nonce_store.cache_clear()
+
+
+setting_changed.connect(reset_nonce_store)
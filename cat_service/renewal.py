@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from cryptography import x509
+
+    from cat_common.typing import Any, Callable
+
+
+__all__ = [
+    "CertificateRenewer",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+class CertificateRenewer:
+    """
+    Renew a certificate in a background thread before it expires.
+
+    The certificate is renewed after a fraction of its validity period has passed, with some random jitter
+    so that processes started at the same time don't all renew at once. The current certificate should
+    be used until the renewal has succeeded, so request threads are never blocked by the renewal.
+    """
+
+    def __init__(
+        self,
+        *,
+        get_certificate: Callable[[], x509.Certificate | None],
+        renew: Callable[[], Any],
+        fraction: float,
+        jitter: float,
+        retry_interval: float,
+    ) -> None:
+        """
+        Create a new certificate renewer.
+
+        :param get_certificate: Function that returns the current certificate, if one exists.
+        :param renew: Function that renews the certificate.
+        :param fraction: Fraction of the certificate's validity period after which it's renewed.
+        :param jitter: Maximum random variation to the renewal time as a fraction of the validity period.
+        :param retry_interval: How long to wait in seconds before trying again if renewal fails.
+        """
+        self.get_certificate = get_certificate
+        self.renew = renew
+        self.fraction = fraction
+        self.jitter = jitter
+        self.retry_interval = retry_interval
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._renewal_times: dict[int, float] = {}
+
+    def start(self) -> None:
+        """Start the renewal thread, or wake it up to reschedule the renewal if it's already running."""
+        with self._lock:
+            # Threads don't survive a fork, so a new one is started in the child process.
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                self._wake.set()
+                return
+
+            self._stop.clear()
+            self._wake.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="cat-certificate-renewal", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stop the renewal thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            self._stop.set()
+            self._wake.set()
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def get_renewal_time(self, certificate: x509.Certificate) -> float:
+        """Get the timestamp when the given certificate should be renewed."""
+        serial = certificate.serial_number
+        renewal_time = self._renewal_times.get(serial)
+        if renewal_time is None:
+            # Only the renewal time of the current certificate needs to be remembered.
+            self._renewal_times.clear()
+            start = certificate.not_valid_before_utc.timestamp()
+            end = certificate.not_valid_after_utc.timestamp()
+            fraction = self.fraction + random.uniform(-self.jitter, self.jitter)  # noqa: S311
+            renewal_time = self._renewal_times[serial] = start + (end - start) * min(max(fraction, 0), 1)
+        return renewal_time
+
+    def _run(self) -> None:
+        # Serial number of the certificate that renewal was last attempted for.
+        attempted: int | None = None
+
+        while not self._stop.is_set():
+            certificate = self.get_certificate()
+            if certificate is None:
+                timeout = None
+            elif certificate.serial_number == attempted:
+                timeout = self.retry_interval
+            else:
+                timeout = max(self.get_renewal_time(certificate) - time.time(), 0)
+
+            # Woken up when the certificate changes or the renewer is stopped.
+            if self._wake.wait(timeout):
+                self._wake.clear()
+                continue
+
+            attempted = certificate.serial_number
+            try:
+                self.renew()
+            except Exception:
+                logger.exception("Failed to renew the certificate.")
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from functools import cache
+from typing import TYPE_CHECKING
+
+import httpx
+from django.test.signals import setting_changed
+
+from cat_service.exceptions import CAUnavailableError
+from cat_service.settings import SETTING_NAME, cat_service_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+    from cat_common.typing import Any, Callable
+
+
+__all__ = [
+    "CircuitBreaker",
+    "acall_ca",
+    "call_ca",
+    "get_ca_circuit_breaker",
+]
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for failing fast when calls to a service keep failing.
+
+    After `threshold` consecutive failures, the circuit opens and calls should not be made until `timeout`
+    has passed. After that, a single call is let through for each `timeout` until one of them succeeds.
+    If `threshold` is zero or less, the circuit never opens.
+    """
+
+    def __init__(self, *, threshold: int, timeout: float) -> None:
+        """
+        Create a new circuit breaker.
+
+        :param threshold: How many consecutive failures open the circuit.
+        :param timeout: How long the circuit stays open in seconds before a call is let through.
+        """
+        self.threshold = threshold
+        self.timeout = timeout
+        self._failures: int = 0
+        self._opened_at: float | None = None
+        self._failing_since: float | None = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Should a call be made?"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            now = time.monotonic()
+            if now - self._opened_at < self.timeout:
+                return False
+
+            # Let a single call through to check if the service is available again.
+            self._opened_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._failing_since = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._failures += 1
+            if self._failing_since is None:
+                self._failing_since = now
+            if 0 < self.threshold <= self._failures:
+                self._opened_at = now
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    @property
+    def failing_for(self) -> float:
+        """For how many seconds calls have been failing consecutively."""
+        with self._lock:
+            return 0 if self._failing_since is None else time.monotonic() - self._failing_since
+
+
+@cache
+def get_ca_circuit_breaker() -> CircuitBreaker:
+    """Get the circuit breaker for requests made to the CA."""
+    return CircuitBreaker(
+        threshold=cat_service_settings.CA_CIRCUIT_BREAKER_THRESHOLD,
+        timeout=cat_service_settings.CA_CIRCUIT_BREAKER_TIMEOUT.total_seconds(),
+    )
+
+
+def call_ca(request: Callable[[], httpx.Response]) -> httpx.Response:
+    """
+    Make a request to the CA. Retry with a jittered exponential backoff if the CA is unavailable.
+
+    :param request: Function that makes the request.
+    :raises CAUnavailableError: Requests to the CA are failing fast, since the CA has been unavailable.
+    :raises httpx.HTTPError: Request failed.
+    """
+    breaker = get_ca_circuit_breaker()
+    attempts = max(cat_service_settings.CA_REQUEST_ATTEMPTS, 1)
+
+    for attempt in range(attempts):
+        check_circuit_breaker(breaker)
+        try:
+            response = request()
+            response.raise_for_status()
+        except httpx.HTTPError as error:
+            if not is_unavailable(error):
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= attempts:
+                raise
+            time.sleep(get_backoff(attempt))
+        else:
+            breaker.record_success()
+            return response
+
+    raise AssertionError  # pragma: no cover
+
+
+async def acall_ca(request: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    """
+    Make a request to the CA without blocking the event loop. Retry with a jittered exponential backoff
+    if the CA is unavailable.
+
+    :param request: Async function that makes the request.
+    :raises CAUnavailableError: Requests to the CA are failing fast, since the CA has been unavailable.
+    :raises httpx.HTTPError: Request failed.
+    """
+    breaker = get_ca_circuit_breaker()
+    attempts = max(cat_service_settings.CA_REQUEST_ATTEMPTS, 1)
+
+    for attempt in range(attempts):
+        check_circuit_breaker(breaker)
+        try:
+            response = await request()
+            response.raise_for_status()
+        except httpx.HTTPError as error:
+            if not is_unavailable(error):
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= attempts:
+                raise
+            await asyncio.sleep(get_backoff(attempt))
+        else:
+            breaker.record_success()
+            return response
+
+    raise AssertionError  # pragma: no cover
+
+
+def check_circuit_breaker(breaker: CircuitBreaker) -> None:
+    if not breaker.allow():
+        msg = "CA is unavailable. Requests to the CA are failing fast."
+        raise CAUnavailableError(msg)
+
+
+def is_unavailable(error: httpx.HTTPError) -> bool:
+    """Is the given error caused by the CA being unavailable, rather than the request being invalid?"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code >= 500 or status_code == 429  # noqa: PLR2004
+    return isinstance(error, httpx.TransportError)
+
+
+def get_backoff(attempt: int) -> float:
+    """Get the delay before the next attempt with "full jitter"."""
+    base = cat_service_settings.CA_RETRY_BACKOFF.total_seconds()
+    cap = cat_service_settings.CA_RETRY_MAX_BACKOFF.total_seconds()
+    return random.uniform(0, min(cap, base * 2**attempt))  # noqa: S311
+
+
+def reset_ca_circuit_breaker(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_ca_circuit_breaker.cache_clear()
+
+
+setting_changed.connect(reset_ca_circuit_breaker)
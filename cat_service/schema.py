@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+from django.test.signals import setting_changed
+
+from cat_common.cache import LRUCache
+from cat_service.settings import SETTING_NAME
+from cat_service.utils import from_cat_header_name, get_required_cat_headers, get_valid_cat_headers, to_meta_key
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from cat_common.typing import Any, Callable, HeaderKey
+
+
+__all__ = [
+    "CATHeaderSchema",
+    "get_cat_header_schema",
+]
+
+
+class CATHeaderSchema:
+    """
+    Lookup tables for the configured CAT headers.
+
+    Built once for a set of header validators, and rebuilt only when the CAT settings change,
+    so that handling a request only requires dictionary lookups.
+    """
+
+    __slots__ = (
+        "claim_names",
+        "header_keys",
+        "header_validators",
+        "meta_keys",
+        "required_headers",
+        "valid_headers",
+        "validators",
+    )
+
+    def __init__(self, header_validators: Mapping[HeaderKey, Callable[[str], Any]]) -> None:
+        self.header_validators = header_validators
+        """The header validators this schema was built from."""
+
+        self.valid_headers: frozenset[HeaderKey] = frozenset(get_valid_cat_headers())
+        """Valid CAT headers in Header-Case with 'CAT' prefixed (e.g., CAT-Service-Name)."""
+
+        self.required_headers: frozenset[HeaderKey] = frozenset(get_required_cat_headers())
+        """Required CAT headers in Header-Case with 'CAT' prefixed (e.g., CAT-Service-Name)."""
+
+        self.meta_keys: Mapping[str, HeaderKey] = MappingProxyType(
+            {to_meta_key(header): header for header in self.valid_headers},
+        )
+        """Valid CAT headers by their `request.META` keys (e.g., HTTP_CAT_SERVICE_NAME -> CAT-Service-Name)."""
+
+        self.claim_names: Mapping[HeaderKey, str] = MappingProxyType(
+            {header: from_cat_header_name(header) for header in self.valid_headers},
+        )
+        """CAT claim names by valid CAT headers (e.g., CAT-Service-Name -> service_name)."""
+
+        self.header_keys: Mapping[str, HeaderKey] = MappingProxyType(
+            {claim_name: header for header, claim_name in self.claim_names.items()},
+        )
+        """Valid CAT headers by their CAT claim names (e.g., service_name -> CAT-Service-Name)."""
+
+        self.validators: Mapping[HeaderKey, Callable[[str], Any]] = MappingProxyType(
+            {header: header_validators[header] for header in self.valid_headers if header in header_validators},
+        )
+        """Validation functions for valid CAT headers."""
+
+
+# Schemas by the ids of their header validators. Bounded, so that header validators
+# created per call, e.g., for `core.verify`, don't accumulate schemas.
+_schemas = LRUCache(maxsize=128)
+
+
+def get_cat_header_schema(header_validators: Mapping[HeaderKey, Callable[[str], Any]]) -> CATHeaderSchema:
+    """Get the header schema for the given header validators. Schema is built on first use."""
+    schema = _schemas.get(id(header_validators))
+    if schema is None or schema.header_validators is not header_validators:
+        schema = CATHeaderSchema(header_validators)
+        _schemas.set(id(header_validators), schema)
+    return schema
+
+
+def clear_cat_header_schemas(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        _schemas.clear()
+
+
+setting_changed.connect(clear_cat_header_schemas)
@@ -65,6 +65,94 @@ class DefaultSettings(NamedTuple):
     """The service certificate."""
     SERVICE_PRIVATE_KEY: ed25519.Ed25519PrivateKey | None = None
     """The service private key."""
+    REJECT_UNRECOGNIZED_CAT_HEADERS: bool = True
+    """Reject requests with unrecognized CAT headers. If disabled, only the valid CAT headers are read."""
+    CREATION_KEY_CACHE_SIZE: int = 1024
+    """How many CAT creation keys to cache per process for the most recent identities. Set to 0 to disable."""
+    CREATION_KEY_CACHE_TTL: datetime.timedelta = datetime.timedelta(minutes=10)
+    """How long CAT creation keys are cached for."""
+    USER_CACHE: str = ""
+    """Import path to the cache to use for authenticated users, e.g., `cat_service.user_cache.LocalUserCache`."""
+    USER_CACHE_SIZE: int = 1024
+    """How many users to cache per process when using the `LocalUserCache`."""
+    USER_CACHE_TTL: datetime.timedelta = datetime.timedelta(minutes=5)
+    """How long users are cached for."""
+    USER_CACHE_ALIAS: str = "default"
+    """Alias of the Django cache to use when using the `DjangoUserCache`."""
+    LAZY_USER: bool = False
+    """Authenticate with a lazy user, which is fetched from the database only when its attributes are accessed."""
+    NONCE_REPLAY_PROTECTION: bool = False
+    """Reject requests that reuse a `CAT-Nonce` that has already been used by the same identity."""
+    NONCE_REPLAY_WINDOW: datetime.timedelta = datetime.timedelta(minutes=5)
+    """How long CATs with nonces can be valid for at most. Nonces are remembered for this plus `LEEWAY` at most."""
+    NONCE_REPLAY_BUCKETS: int = 60
+    """How many time buckets the nonce replay window is split into."""
+    HTTP_TIMEOUT: datetime.timedelta = datetime.timedelta(seconds=10)
+    """Timeout for requests made to the CA."""
+    HTTP_MAX_CONNECTIONS: int = 10
+    """Maximum number of connections to keep open to the CA per process."""
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 5
+    """Maximum number of idle connections to keep alive to the CA per process."""
+    HTTP_KEEPALIVE_EXPIRY: datetime.timedelta = datetime.timedelta(seconds=60)
+    """How long idle connections to the CA are kept alive for."""
+    HTTP2: bool = False
+    """Use HTTP/2 for requests made to the CA. Requires `httpx[http2]` to be installed."""
+    CERTIFICATE_RENEWAL: bool = False
+    """Renew the service certificate in a background thread before it expires."""
+    CERTIFICATE_RENEWAL_FRACTION: float = 0.75
+    """Fraction of the service certificate's validity period after which it's renewed in the background."""
+    CERTIFICATE_RENEWAL_JITTER: float = 0.05
+    """Maximum random variation to the renewal time as a fraction of the service certificate's validity period."""
+    CERTIFICATE_RENEWAL_RETRY_INTERVAL: datetime.timedelta = datetime.timedelta(minutes=1)
+    """How long to wait before trying again if renewing the service certificate in the background fails."""
+    CA_REQUEST_ATTEMPTS: int = 3
+    """How many times a request to the CA is attempted if the CA is unavailable."""
+    CA_RETRY_BACKOFF: datetime.timedelta = datetime.timedelta(milliseconds=100)
+    """Base delay before retrying a request to the CA. Doubled on each attempt and randomized with full jitter."""
+    CA_RETRY_MAX_BACKOFF: datetime.timedelta = datetime.timedelta(seconds=2)
+    """Maximum delay before retrying a request to the CA."""
+    CA_CIRCUIT_BREAKER_THRESHOLD: int = 5
+    """After how many consecutive failed requests to the CA further requests fail fast. Set to 0 to disable."""
+    CA_CIRCUIT_BREAKER_TIMEOUT: datetime.timedelta = datetime.timedelta(seconds=30)
+    """How long requests to the CA fail fast before a request is tried again."""
+    CA_STALE_IF_ERROR: datetime.timedelta = datetime.timedelta(minutes=10)
+    """How long the last known verification key and service certificate can be used if the CA is unavailable."""
+    SHARED_CREDENTIALS_CACHE_ALIAS: str = ""
+    """Alias of the Django cache for sharing the verification key and service certificate between processes."""
+    SHARED_CREDENTIALS_LOCK_TIMEOUT: datetime.timedelta = datetime.timedelta(seconds=30)
+    """How long processes wait for another process to fetch the shared credentials from the CA."""
+    WARM_UP_ON_STARTUP: bool = False
+    """Fetch the service certificate and verification key when the app is loaded, e.g., before workers are forked."""
+    TIMESTAMP_FORMAT: str = "iso"
+    """Format of `CAT-Timestamp` and `CAT-Valid-Until`: `iso`, `epoch` or `epoch_ms`. ISO 8601 is always accepted."""
+    CAT_ENCODING: str = "hex"
+    """Encoding of CATs and CAT keys: `hex` or `base64url`. Must be the same in the CA and all services."""
+    VERIFIED_CAT_CACHE_SIZE: int = 0
+    """How many verified CATs to cache per process, so that repeated requests are not verified again. 0 disables."""
+    VERIFIED_CAT_CACHE_TTL: datetime.timedelta = datetime.timedelta(minutes=1)
+    """How long verified CATs are cached for at most. CATs are never cached past their `CAT-Valid-Until`."""
+    KEYED_MAC_CACHE_SIZE: int = 128
+    """How many keys to keep prepared HMAC states for per process, e.g., for the root and verification keys."""
+    FAILURE_LIMITER: str = ""
+    """Import path to the limiter for failed authentications, e.g., `cat_service.failures.LocalFailureLimiter`."""
+    FAILURE_LIMIT_BY: tuple[str, ...] = ("address",)
+    """Count failures per client `address` and/or `identity`. Anyone can send an identity, and so get it denied."""
+    FAILURE_LIMIT: int = 20
+    """How many failed authentications are allowed per identity or address during the failure window."""
+    FAILURE_WINDOW: datetime.timedelta = datetime.timedelta(minutes=1)
+    """Length of the sliding time window in which failed authentications are counted."""
+    FAILURE_BLOCK_TIME: datetime.timedelta = datetime.timedelta(minutes=5)
+    """How long identities or addresses that exceed the failure limit are denied."""
+    FAILURE_LIMITER_SIZE: int = 10_000
+    """How many identities and addresses to track per process when using the `LocalFailureLimiter`."""
+    FAILURE_LIMITER_CACHE_ALIAS: str = "default"
+    """Alias of the Django cache to use when using the `DjangoFailureLimiter`."""
+    MAC_BACKEND: str = "hmac"
+    """MAC for deriving keys and creating CATs: `hmac` (with `PSEUDO_RANDOM_FUNCTION`), `blake2b` or `blake2s`."""
+    CLAIMS_HEADER: bool = False
+    """Accept all CAT claims in a single `CAT-Claims` header as the base64url-encoded JSON that the CAT signs."""
+    MIDDLEWARE_PATHS: tuple[str, ...] = ()
+    """URL path prefixes on which `CATAuthenticationMiddleware` authenticates requests before they reach views."""
 
 
 DEFAULTS = DefaultSettings()._asdict()
@@ -79,7 +167,19 @@ def validate_value(value: str) -> None:
     return validate_value
 
 
+def validate_choice(name: str, choices: tuple[str, ...]) -> Callable[[Any], None]:
+    def validate_value(value: str) -> None:
+        if value not in choices:
+            msg = f"`{SETTING_NAME}['{name}']` must be one of {', '.join(map(repr, choices))}, not {value!r}."
+            raise ImproperlyConfigured(msg)
+
+    return validate_value
+
+
 validators: dict[str, Callable[[Any], None]] = {
+    "TIMESTAMP_FORMAT": validate_choice("TIMESTAMP_FORMAT", ("iso", "epoch", "epoch_ms")),
+    "CAT_ENCODING": validate_choice("CAT_ENCODING", ("hex", "base64url")),
+    "MAC_BACKEND": validate_choice("MAC_BACKEND", ("hmac", "blake2b", "blake2s")),
     "SERVICE_NAME": validate_required("SERVICE_NAME"),
     "SERVICE_TYPE": validate_required("SERVICE_TYPE"),
     "VERIFICATION_KEY_URL": validate_required("VERIFICATION_KEY_URL"),
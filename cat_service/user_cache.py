@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import copy
+from abc import ABC, abstractmethod
+from functools import cache
+from typing import TYPE_CHECKING
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from cat_common.cache import LRUCache
+from cat_service.settings import SETTING_NAME, cat_service_settings
+
+if TYPE_CHECKING:
+    from cat_common.typing import Any, Iterable
+
+User = get_user_model()
+
+
+__all__ = [
+    "BaseUserCache",
+    "DjangoUserCache",
+    "LocalUserCache",
+    "aget_user_by_identity",
+    "get_user_by_identity",
+    "get_user_cache",
+    "get_users_by_identities",
+]
+
+
+class BaseUserCache(ABC):
+    """Base class for caches for users authenticated with a CAT."""
+
+    @abstractmethod
+    def get(self, key: str) -> User | None:
+        """Get a cached user, or `None` if the user is not in the cache."""
+
+    @abstractmethod
+    def set(self, key: str, user: User) -> None:
+        """Cache a user."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a user from the cache."""
+
+    async def aget(self, key: str) -> User | None:
+        return self.get(key)
+
+    async def aset(self, key: str, user: User) -> None:
+        self.set(key, user)
+
+
+class LocalUserCache(BaseUserCache):
+    """
+    Cache users in process memory.
+
+    Users are removed from the cache when they are saved or deleted in this process.
+    Changes made in other processes are seen after the `USER_CACHE_TTL` has passed.
+    """
+
+    def __init__(self) -> None:
+        self.cache = LRUCache(
+            maxsize=cat_service_settings.USER_CACHE_SIZE,
+            ttl=cat_service_settings.USER_CACHE_TTL.total_seconds(),
+        )
+
+    def get(self, key: str) -> User | None:
+        user: User | None = self.cache.get(key)
+        # Return a copy so that changes made to the user during a request don't leak to other requests.
+        return None if user is None else copy.copy(user)
+
+    def set(self, key: str, user: User) -> None:
+        self.cache.set(key, copy.copy(user))
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class DjangoUserCache(BaseUserCache):
+    """Cache users in the Django cache set by the `USER_CACHE_ALIAS` setting."""
+
+    key_prefix: str = "cat_user:"
+
+    def __init__(self) -> None:
+        self.cache = caches[cat_service_settings.USER_CACHE_ALIAS]
+        self.timeout = cat_service_settings.USER_CACHE_TTL.total_seconds()
+
+    def get(self, key: str) -> User | None:
+        return self.cache.get(f"{self.key_prefix}{key}")
+
+    def set(self, key: str, user: User) -> None:
+        self.cache.set(f"{self.key_prefix}{key}", user, timeout=self.timeout)
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(f"{self.key_prefix}{key}")
+
+    async def aget(self, key: str) -> User | None:
+        return await self.cache.aget(f"{self.key_prefix}{key}")
+
+    async def aset(self, key: str, user: User) -> None:
+        await self.cache.aset(f"{self.key_prefix}{key}", user, timeout=self.timeout)
+
+
+@cache
+def get_user_cache() -> BaseUserCache | None:
+    """Get the user cache set by the `USER_CACHE` setting, or `None` if users should not be cached."""
+    if not cat_service_settings.USER_CACHE:
+        return None
+    return import_string(cat_service_settings.USER_CACHE)()
+
+
+def get_user_cache_key(identity: Any) -> str | None:
+    """Get the cache key for a user with the given identity (primary key), or `None` if it's not valid."""
+    try:
+        return str(User._meta.pk.to_python(identity))
+    except ValidationError:
+        return None
+
+
+def get_user_by_identity(identity: Any) -> User:
+    """
+    Get the user with the given identity (primary key), using the user cache if it has been set.
+
+    :raises User.DoesNotExist: User does not exist.
+    """
+    user_cache = get_user_cache()
+    if user_cache is None:
+        return User.objects.get(pk=identity)
+
+    key = get_user_cache_key(identity)
+    if key is None:
+        return User.objects.get(pk=identity)
+
+    user = user_cache.get(key)
+    if user is None:
+        user = User.objects.get(pk=identity)
+        user_cache.set(key, user)
+    return user
+
+
+async def aget_user_by_identity(identity: Any) -> User:
+    """
+    Get the user with the given identity (primary key) without blocking the event loop,
+    using the user cache if it has been set.
+
+    :raises User.DoesNotExist: User does not exist.
+    """
+    user_cache = get_user_cache()
+    if user_cache is None:
+        return await User.objects.aget(pk=identity)
+
+    key = get_user_cache_key(identity)
+    if key is None:
+        return await User.objects.aget(pk=identity)
+
+    user = await user_cache.aget(key)
+    if user is None:
+        user = await User.objects.aget(pk=identity)
+        await user_cache.aset(key, user)
+    return user
+
+
+def get_users_by_identities(identities: Iterable[Any]) -> dict[Any, User]:
+    """
+    Get the users with the given identities (primary keys) with a single query,
+    using the user cache if it has been set. Users that don't exist are not included.
+    """
+    # Primary key value to identity
+    pks: dict[Any, Any] = {}
+    for identity in identities:
+        try:
+            pks[User._meta.pk.to_python(identity)] = identity
+        except ValidationError:
+            continue
+
+    users: dict[Any, User] = {}
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        for pk in list(pks):
+            user = user_cache.get(str(pk))
+            if user is not None:
+                users[pks.pop(pk)] = user
+
+    if pks:
+        for pk, user in User.objects.in_bulk(list(pks)).items():
+            users[pks[pk]] = user
+            if user_cache is not None:
+                user_cache.set(str(pk), user)
+
+    return users
+
+
+def invalidate_cached_user(**kwargs: Any) -> None:
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        user_cache.delete(str(kwargs["instance"].pk))
+
+
+def reset_user_cache(**kwargs: Any) -> None:
+    if kwargs["setting"] == SETTING_NAME:
+        get_user_cache.cache_clear()
+
+
+post_save.connect(invalidate_cached_user, sender=User, dispatch_uid="cat_invalidate_cached_user_on_save")
+post_delete.connect(invalidate_cached_user, sender=User, dispatch_uid="cat_invalidate_cached_user_on_delete")
+setting_changed.connect(reset_user_cache)
@@ -16,6 +16,7 @@
     "header_case_to_snake_case",
     "snake_case_to_header_case",
     "to_cat_header_name",
+    "to_meta_key",
 ]
 
 
@@ -39,6 +40,16 @@ def from_cat_header_name(name: str) -> str:
     return header_case_to_snake_case(name[4:])
 
 
+def to_meta_key(name: str) -> str:
+    """
+    Convert a Header-Case string to the key used for it in `request.META`.
+
+    >>> to_meta_key("CAT-Snake-Case")
+    'HTTP_CAT_SNAKE_CASE'
+    """
+    return f"HTTP_{name.upper().replace('-', '_')}"
+
+
 def snake_case_to_header_case(string: str) -> str:
     """
     Convert a snake_case string to a Header-Case string.
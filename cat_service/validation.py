@@ -1,15 +1,17 @@
 from __future__ import annotations
 
 import datetime
+import time
+from contextvars import ContextVar
 from typing import TYPE_CHECKING, Any
 
-from django.utils.translation import gettext_lazy as __
-from rest_framework.exceptions import AuthenticationFailed
+from django.utils.translation import gettext_noop
 
 from cat_common import error_codes
 from cat_common.settings import cat_common_settings
 from cat_common.utils import get_common_name
 from cat_common.validation import validate_basic_constraints, validate_key_usage, validate_valid_period
+from cat_service.exceptions import CATVerificationError
 from cat_service.settings import cat_service_settings
 
 if TYPE_CHECKING:
@@ -19,6 +21,9 @@
 
 
 __all__ = [
+    "get_request_time",
+    "parse_timestamp",
+    "request_time",
     "validate_certificate",
     "validate_identity",
     "validate_issuer",
@@ -31,69 +36,103 @@
 ]
 
 
+# Time when authentication of the current request started, so that the clock is read only once per request.
+request_time: ContextVar[float | None] = ContextVar("cat_request_time", default=None)
+
+
 def validate_identity(identity: str) -> Any:
     try:
         return cat_common_settings.IDENTITY_CONVERTER(identity.strip())
     except Exception as error:
-        msg = __("Invalid identity value: '%(identity)s'. Could not convert to required type.")
-        msg %= {"identity": identity}
-        raise AuthenticationFailed(msg, code=error_codes.INVALID_IDENTITY) from error
+        msg = gettext_noop("Invalid identity value: '%(identity)s'. Could not convert to required type.")
+        params = {"identity": identity}
+        raise CATVerificationError(msg, code=error_codes.INVALID_IDENTITY, params=params) from error
 
 
 def validate_service_name(service_name: str) -> str:
     if service_name.casefold() != cat_service_settings.SERVICE_TYPE.casefold():
-        msg = __("Request not for this service.")
-        raise AuthenticationFailed(msg, code=error_codes.WRONG_SERVICE) from None
+        msg = gettext_noop("Request not for this service.")
+        raise CATVerificationError(msg, code=error_codes.WRONG_SERVICE)
     return service_name
 
 
-def validate_timestamp(timestamp: str) -> datetime.datetime:
-    try:
-        return datetime.datetime.fromisoformat(timestamp)
-    except (TypeError, ValueError) as error:
-        msg = __("Invalid 'CAT-Timestamp' header. Must be in ISO 8601 format.")
-        raise AuthenticationFailed(msg, code=error_codes.INVALID_TIMESTAMP) from error
+def validate_timestamp(timestamp: str) -> datetime.datetime | float:
+    value = parse_timestamp(timestamp)
+    if value is None:
+        if cat_service_settings.TIMESTAMP_FORMAT == "iso":
+            msg = gettext_noop("Invalid 'CAT-Timestamp' header. Must be in ISO 8601 format.")
+        else:
+            msg = gettext_noop("Invalid 'CAT-Timestamp' header. Must be a Unix timestamp or in ISO 8601 format.")
+        raise CATVerificationError(msg, code=error_codes.INVALID_TIMESTAMP)
+    return value
+
+
+def validate_valid_until(timestamp: str) -> datetime.datetime | float:
+    valid_until = parse_timestamp(timestamp)
+    if valid_until is None:
+        if cat_service_settings.TIMESTAMP_FORMAT == "iso":
+            msg = gettext_noop("Invalid 'CAT-Valid-Until' header. Must be in ISO 8601 format.")
+        else:
+            msg = gettext_noop("Invalid 'CAT-Valid-Until' header. Must be a Unix timestamp or in ISO 8601 format.")
+        raise CATVerificationError(msg, code=error_codes.INVALID_VALID_UNTIL)
+
+    if isinstance(valid_until, datetime.datetime):
+        if valid_until.tzinfo is None:
+            valid_until = valid_until.replace(tzinfo=datetime.timezone.utc)
+        expires_at = valid_until.timestamp()
+    else:
+        expires_at = valid_until
+
+    if expires_at < get_request_time():
+        msg = gettext_noop("'CAT-Valid-Until' header indicates that the request is no longer valid.")
+        raise CATVerificationError(msg, code=error_codes.CAT_EXPIRED)
+
+    return valid_until
 
 
-def validate_valid_until(timestamp: str) -> datetime.datetime:
-    try:
-        valid_until = datetime.datetime.fromisoformat(timestamp)
-    except (TypeError, ValueError) as error:
-        msg = __("Invalid 'CAT-Valid-Until' header. Must be in ISO 8601 format.")
-        raise AuthenticationFailed(msg, code=error_codes.INVALID_VALID_UNTIL) from error
+def parse_timestamp(timestamp: str) -> datetime.datetime | float | None:
+    """
+    Parse a timestamp in the format set by the `TIMESTAMP_FORMAT` setting.
+    Unix timestamps are returned as seconds. Falls back to ISO 8601, and returns `None` if parsing fails.
+    """
+    timestamp_format = cat_service_settings.TIMESTAMP_FORMAT
+    if timestamp_format != "iso" and timestamp.isascii() and timestamp.isdigit():
+        return int(timestamp) if timestamp_format == "epoch" else int(timestamp) / 1000
 
-    if valid_until.tzinfo is None:
-        valid_until.replace(tzinfo=datetime.timezone.utc)
+    try:
+        return datetime.datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
 
-    if valid_until.astimezone(tz=datetime.timezone.utc) < datetime.datetime.now(tz=datetime.timezone.utc):
-        msg = __("'CAT-Valid-Until' header indicates that the request is no longer valid.")
-        raise AuthenticationFailed(msg, code=error_codes.CAT_EXPIRED) from None
 
-    return valid_until
+def get_request_time() -> float:
+    """Get the time when authentication of the current request started, or the current time outside of one."""
+    now = request_time.get()
+    return time.time() if now is None else now
 
 
 def validate_nonce(nonce: str) -> Any:
-    # A hook for validate a nonce. A service may consider caching nonce's and checking that
-    # a nonce has not been used before to prevent replay attacks.
+    # A hook for validate a nonce. Nonces are checked for reuse after the CAT has been validated
+    # if the `NONCE_REPLAY_PROTECTION` setting is enabled.
     return nonce
 
 
 def validate_issuer(certificate: x509.Certificate) -> None:
     if get_common_name(certificate.issuer) != cat_common_settings.CA_NAME:  # pragma: no cover
-        msg = "Certificate was not signed by the expected issuer."
-        raise AuthenticationFailed(msg, code=error_codes.WRONG_ISSUER)
+        msg = gettext_noop("Certificate was not signed by the expected issuer.")
+        raise CATVerificationError(msg, code=error_codes.WRONG_ISSUER)
 
 
 def validate_subject(certificate: x509.Certificate) -> None:
     if get_common_name(certificate.subject) != cat_service_settings.SERVICE_NAME:  # pragma: no cover
-        msg = "Certificate was not signed for the expected subject."
-        raise AuthenticationFailed(msg, code=error_codes.WRONG_SUBJECT)
+        msg = gettext_noop("Certificate was not signed for the expected subject.")
+        raise CATVerificationError(msg, code=error_codes.WRONG_SUBJECT)
 
 
 def validate_public_key(certificate: x509.Certificate) -> None:
     if certificate.public_key() != cat_service_settings.SERVICE_PRIVATE_KEY.public_key():  # pragma: no cover
-        msg = "Certificate does not contain the expected public key."
-        raise AuthenticationFailed(msg, code=error_codes.WRONG_PUBLIC_KEY)
+        msg = gettext_noop("Certificate does not contain the expected public key.")
+        raise CATVerificationError(msg, code=error_codes.WRONG_PUBLIC_KEY)
 
 
 def validate_certificate(certificate: x509.Certificate) -> None:
@@ -10,3 +10,17 @@ class ExampleView(APIView):
 
     def get(self, request: Request) -> Response:
         return Response({"foo": "bar"})
+
+
+class ExampleUserView(APIView):
+    authentication_classes = [CATAuthentication]
+
+    def get(self, request: Request) -> Response:
+        return Response({"username": request.user.username})
+
+
+class ExampleClaimsView(APIView):
+    authentication_classes = [CATAuthentication]
+
+    def get(self, request: Request) -> Response:
+        return Response({"claims": request.auth._asdict()})
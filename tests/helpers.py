@@ -2,6 +2,7 @@
 from functools import partial
 from unittest.mock import patch
 
+from asgiref.sync import sync_to_async
 from django.test.client import Client
 from httpx import HTTPStatusError
 from rest_framework.response import Response
@@ -9,22 +10,36 @@
 
 @contextmanager
 def use_test_client_for_http(client: Client):
-    def post(url, json, follow_redirects, **kwargs):
-        if "headers" in kwargs and "Authorization" in kwargs["headers"]:
-            kwargs["HTTP_AUTHORIZATION"] = kwargs["headers"]["Authorization"]
-        response = client.post(url, data=json, follow=follow_redirects, **kwargs)
-        response.raise_for_status = partial(raise_for_status, response)
-        return response
-
-    def raise_for_status(self: Response) -> Response:
-        if not (200 <= self.status_code <= 299):
-            try:
-                error = self.json()["detail"]  # type: ignore[union-attr]
-            except Exception:
-                error = self.rendered_content
-
-            raise HTTPStatusError(error, request=self._request, response=self)
-        return self
-
-    with patch("cat_service.cryptography.httpx.post", side_effect=post) as mock:
+    def post(self, url, json, follow_redirects, **kwargs):
+        return post_with_test_client(client, url, json, follow_redirects, **kwargs)
+
+    with patch("cat_service.http.httpx.Client.post", side_effect=post, autospec=True) as mock:
+        yield mock
+
+
+@contextmanager
+def use_test_client_for_async_http(client: Client):
+    async def post(self, url, json, follow_redirects, **kwargs):
+        return await sync_to_async(post_with_test_client)(client, url, json, follow_redirects, **kwargs)
+
+    with patch("cat_service.http.httpx.AsyncClient.post", side_effect=post, autospec=True) as mock:
         yield mock
+
+
+def post_with_test_client(client: Client, url, json, follow_redirects, **kwargs):
+    if "headers" in kwargs and "Authorization" in kwargs["headers"]:
+        kwargs["HTTP_AUTHORIZATION"] = kwargs["headers"]["Authorization"]
+    response = client.post(url, data=json, follow=follow_redirects, **kwargs)
+    response.raise_for_status = partial(raise_for_status, response)
+    return response
+
+
+def raise_for_status(self: Response) -> Response:
+    if not (200 <= self.status_code <= 299):
+        try:
+            error = self.json()["detail"]  # type: ignore[union-attr]
+        except Exception:
+            error = self.rendered_content
+
+        raise HTTPStatusError(error, request=self._request, response=self)
+    return self
@@ -20,6 +20,7 @@
     "django.contrib.staticfiles",
     "rest_framework",
     "cat_ca",
+    "cat_service",
     "tests.example",
 ]
 
@@ -1,8 +1,10 @@
 from django.urls import include, path
 
-from tests.example.views import ExampleView
+from tests.example.views import ExampleClaimsView, ExampleUserView, ExampleView
 
 urlpatterns = [
     path("cat/", include("cat_ca.urls")),
     path("example/", ExampleView.as_view(), name="example"),
+    path("example/user/", ExampleUserView.as_view(), name="example_user"),
+    path("example/claims/", ExampleClaimsView.as_view(), name="example_claims"),
 ]
@@ -0,0 +1,88 @@
+import re
+
+import pytest
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.test.client import Client
+from rest_framework.reverse import reverse
+
+from cat_ca.cryptography import create_cat_verification_key, get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common.settings import cat_common_settings
+from cat_service.http import get_http_client_pool
+from cat_service.settings import cat_service_settings
+from tests.factories import ServiceEntityFactory
+from tests.helpers import use_test_client_for_http
+
+pytestmark = [
+    pytest.mark.django_db,
+]
+
+
+@pytest.fixture
+def service_settings(settings):
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+    return service_entity
+
+
+def test_app_ready__warm_up(client: Client, settings, service_settings):
+    settings.CAT_SETTINGS = {**settings.CAT_SETTINGS, "WARM_UP_ON_STARTUP": True}
+    http_client = get_http_client_pool().get()
+
+    with use_test_client_for_http(client) as post:
+        apps.get_app_config("cat_service").ready()
+
+    assert post.call_count == 2
+    assert cat_service_settings.SERVICE_CERTIFICATE is not None
+    assert cat_service_settings.VERIFICATION_KEY == create_cat_verification_key(service=service_settings.type.name)
+    # Connections to the CA are closed before workers are forked.
+    assert http_client.is_closed
+
+
+def test_app_ready__no_warm_up(client: Client, service_settings):
+    with use_test_client_for_http(client) as post:
+        apps.get_app_config("cat_service").ready()
+
+    assert post.call_count == 0
+    assert cat_service_settings.VERIFICATION_KEY == ""
+
+
+def test_warm_up_command(client: Client, service_settings, capsys):
+    with use_test_client_for_http(client):
+        call_command("cat_warm_up")
+
+    assert capsys.readouterr().out == "Service certificate and verification key are ready.\n"
+    assert cat_service_settings.VERIFICATION_KEY == create_cat_verification_key(service=service_settings.type.name)
+
+
+def test_warm_up_command__verification_key_set(client: Client, settings, service_settings, capsys):
+    verification_key = create_cat_verification_key(service=service_settings.type.name)
+    settings.CAT_SETTINGS = {**settings.CAT_SETTINGS, "VERIFICATION_KEY": verification_key}
+
+    with use_test_client_for_http(client) as post:
+        call_command("cat_warm_up")
+
+    # Certificate is still fetched, since it's needed for creating CATs.
+    assert post.call_count == 1
+    assert capsys.readouterr().out == "Service certificate and verification key are ready.\n"
+    assert cat_service_settings.SERVICE_CERTIFICATE is not None
+
+
+def test_warm_up_command__failed(client: Client, settings, service_settings):
+    settings.CAT_SETTINGS = {**settings.CAT_SETTINGS, "CA_CERTIFICATE": None}
+
+    msg = "Failed to fetch credentials from the CA: "
+    with pytest.raises(CommandError, match=re.escape(msg)), use_test_client_for_http(client):
+        call_command("cat_warm_up")
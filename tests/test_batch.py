@@ -0,0 +1,124 @@
+import pytest
+from django.test.client import Client
+from rest_framework.reverse import reverse
+
+from cat_ca.cryptography import get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common import error_codes
+from cat_common.settings import cat_common_settings
+from cat_service.batch import verify_cats
+from cat_service.core import CATClaims, CATVerification
+from cat_service.cryptography import create_cat
+from cat_service.failures import get_failure_limiter
+from tests.factories import ServiceEntityFactory, UserFactory
+from tests.helpers import use_test_client_for_http
+
+pytestmark = [
+    pytest.mark.django_db,
+]
+
+
+@pytest.mark.parametrize("max_workers", [None, 4])
+def test_verify_cats(client: Client, settings, django_assert_num_queries, max_workers):
+    user_1 = UserFactory.create()
+    user_2 = UserFactory.create()
+    deleted_user = UserFactory.create()
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    service_name = service_entity.type.name
+    items = []
+    for user in [user_1, user_2, user_1, deleted_user]:
+        identity = str(user.pk)
+        with use_test_client_for_http(client):
+            cat = create_cat(identity=identity, service_name=service_name)
+        items.append((cat, {"CAT-Identity": identity, "cat-service-name": service_name}))
+
+    items.append(("foo", {"CAT-Identity": str(user_2.pk), "CAT-Service-Name": service_name}))
+    items.append(("foo", {"CAT-Service-Name": service_name}))
+    deleted_user.delete()
+
+    with django_assert_num_queries(1):
+        results = verify_cats(items, max_workers=max_workers)
+
+    assert results == [
+        CATVerification(claims=CATClaims(identity=str(user_1.pk), service_name=service_name), user=user_1),
+        CATVerification(claims=CATClaims(identity=str(user_2.pk), service_name=service_name), user=user_2),
+        CATVerification(claims=CATClaims(identity=str(user_1.pk), service_name=service_name), user=user_1),
+        CATVerification(code=error_codes.USER_DOES_NOT_EXIST, message="User does not exist."),
+        CATVerification(code=error_codes.INVALID_CAT, message="Invalid CAT."),
+        CATVerification(
+            code=error_codes.MISSING_REQUIRED_HEADERS,
+            message="Missing required headers: 'CAT-Identity'.",
+        ),
+    ]
+    assert [result.is_valid for result in results] == [True, True, True, False, False, False]
+
+
+def test_verify_cats__without_users(client: Client, settings, django_assert_num_queries):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat(identity=identity, service_name=service_entity.type.name)
+
+    items = [(cat, {"CAT-Identity": identity, "CAT-Service-Name": service_entity.type.name})]
+
+    with django_assert_num_queries(0):
+        results = verify_cats(items, fetch_users=False)
+
+    assert results == [CATVerification(claims=CATClaims(identity=identity, service_name=service_entity.type.name))]
+
+
+def test_verify_cats__failures_not_limited(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "FAILURE_LIMITER": "cat_service.failures.LocalFailureLimiter",
+        "FAILURE_LIMIT_BY": ("identity",),
+        "FAILURE_LIMIT": 2,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    headers = {"CAT-Identity": identity, "CAT-Service-Name": service_entity.type.name}
+    with use_test_client_for_http(client):
+        cat = create_cat(identity=identity, service_name=service_entity.type.name)
+        results = verify_cats([("foo", headers)] * 3 + [(cat, headers)], fetch_users=False)
+
+    assert [result.is_valid for result in results] == [False, False, False, True]
+    # Failures in a batch are not counted for the identity, since its clients are not known.
+    assert get_failure_limiter().is_blocked([f"identity:{identity}"]) is False
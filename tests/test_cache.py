@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import pytest
+
+from cat_common.cache import CacheStats, LRUCache
+from cat_service.user_cache import BaseUserCache
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") == 2
+    assert cache.get("c") is None
+    assert cache.stats == CacheStats(hits=2, misses=1, evictions=0, expirations=0, size=2)
+
+
+def test_lru_cache__evict_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_lru_cache__expire():
+    cache = LRUCache(maxsize=2, ttl=10)
+
+    with patch("cat_common.cache.time.monotonic", return_value=0):
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=5)
+
+    with patch("cat_common.cache.time.monotonic", return_value=6):
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+    with patch("cat_common.cache.time.monotonic", return_value=11):
+        assert cache.get("a") is None
+
+    assert cache.stats == CacheStats(hits=1, misses=2, evictions=0, expirations=2, size=0)
+
+
+def test_lru_cache__disabled():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_user_cache__abstract():
+    class IncompleteUserCache(BaseUserCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError, match="delete"):
+        IncompleteUserCache()
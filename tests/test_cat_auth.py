@@ -1,19 +1,37 @@
+import base64
 import datetime
+import json
 import re
 import secrets
+import time
+from unittest.mock import patch
 
 import pytest
+from asgiref.sync import async_to_sync
 from django.core.exceptions import ImproperlyConfigured
 from django.test.client import Client
 from httpx import HTTPStatusError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.reverse import reverse
 
 from cat_ca.cryptography import create_cat_creation_key, create_cat_verification_key, get_ca_certificate
 from cat_ca.settings import cat_ca_settings
+from cat_common.cryptography import decode_key, hmac, mac
 from cat_common.settings import cat_common_settings
-from cat_service.cryptography import create_cat_header, get_cat_verification_key
+from cat_service.authentication import AsyncCATAuthentication, CATClaims
+from cat_service.cryptography import (
+    acreate_cat,
+    create_cat_claims_headers,
+    create_cat_header,
+    get_cat_creation_key,
+    get_cat_verification_key,
+    get_creation_key_cache,
+    get_verified_cat_cache,
+)
+from cat_service.settings import cat_service_settings
 from tests.factories import ServiceEntityFactory, UserFactory
-from tests.helpers import use_test_client_for_http
+from tests.helpers import use_test_client_for_async_http, use_test_client_for_http
 
 pytestmark = [
     pytest.mark.django_db,
@@ -28,7 +46,7 @@ def test_cat__get_service_verification_key(client: Client, client_cert_header):
     url = reverse("cat_ca:cat_verification_key")
     response = client.post(url, data=data, HTTP_AUTHORIZATION=client_cert_header)
 
-    assert response.json() == {"verification_key": verification_key}
+    assert response.json() == {"verification_key": verification_key, "mac_backend": "hmac-sha256"}
 
 
 def test_cat__get_service_verification_key__service_entity_missing(client: Client, client_cert_header):
@@ -50,7 +68,7 @@ def test_cat__get_creation_key(client: Client):
     url = reverse("cat_ca:cat_creation_key")
     response = client.post(url, data=data)
 
-    assert response.json() == {"creation_key": creation_key}
+    assert response.json() == {"creation_key": creation_key, "mac_backend": "hmac-sha256"}
 
 
 def test_cat__get_creation_key__service_entity_type_missing(client: Client):
@@ -95,6 +113,273 @@ def test_cat__authenticate_user(client: Client, settings):
     assert response.json() == {"foo": "bar"}
 
 
+def test_cat__authenticate_user__base64url_encoding(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CAT_ENCODING": "base64url",
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    token = cat.removeprefix("CAT ")
+    assert re.fullmatch(r"[\w-]{43}", token)
+
+    # Clients can create the same CAT with the creation key from the CA.
+    creation_key = create_cat_creation_key(identity=identity, service=service_entity.type.name)
+    claims = json.dumps({"identity": identity, "service_name": service_entity.type.name}, sort_keys=True)
+    assert len(creation_key) == 43
+    assert mac(msg=claims, key=decode_key(creation_key)).decode() == token
+
+    url = reverse("example")
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+    )
+
+    assert response.json() == {"foo": "bar"}
+
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=f"CAT {'B' if token[0] == 'A' else 'A'}{token[1:]}",
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+    )
+
+    assert response.json() == {"detail": "Invalid CAT."}
+
+
+@pytest.mark.parametrize("mac_backend", ["blake2b", "blake2s"])
+def test_cat__authenticate_user__blake2_mac_backend(client: Client, settings, mac_backend):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "MAC_BACKEND": mac_backend,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    # Clients can create the same CAT with the creation key from the CA.
+    creation_key = create_cat_creation_key(identity=identity, service=service_entity.type.name)
+    claims = json.dumps({"identity": identity, "service_name": service_entity.type.name}, sort_keys=True)
+    assert cat == f"CAT {mac(msg=claims, key=decode_key(creation_key)).decode()}"
+
+    url = reverse("example")
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+    )
+
+    assert response.json() == {"foo": "bar"}
+
+
+def test_cat__authenticate_user__mac_backend_mismatch(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with (
+        use_test_client_for_http(client),
+        patch("cat_service.cryptography.get_mac_backend_name", return_value="blake2b"),
+        pytest.raises(ImproperlyConfigured, match=re.escape("CA uses the MAC backend 'hmac-sha256'")),
+    ):
+        get_cat_verification_key()
+
+
+def test_cat__authenticate_user__claims_header(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CLAIMS_HEADER": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    nonce = secrets.token_urlsafe()
+
+    with use_test_client_for_http(client):
+        headers = create_cat_claims_headers(identity=identity, service_name=service_entity.type.name, nonce=nonce)
+        # CAT is the same as with separate headers.
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name, nonce=nonce)
+
+    assert headers["Authorization"] == cat
+
+    url = reverse("example")
+    response = client.get(url, HTTP_AUTHORIZATION=cat, HTTP_CAT_CLAIMS=headers["CAT-Claims"])
+    assert response.json() == {"foo": "bar"}
+
+    # Claims are signed as they were received, not re-encoded.
+    claims = json.dumps({"service_name": service_entity.type.name, "identity": identity}, separators=(",", ":"))
+    with use_test_client_for_http(client):
+        creation_key = get_cat_creation_key(identity=identity)
+
+    token = mac(msg=claims, key=decode_key(creation_key)).decode()
+    encoded_claims = base64.urlsafe_b64encode(claims.encode()).rstrip(b"=").decode()
+
+    response = client.get(url, HTTP_AUTHORIZATION=f"CAT {token}", HTTP_CAT_CLAIMS=encoded_claims)
+    assert response.json() == {"foo": "bar"}
+
+    # Claims are validated like separate headers.
+    claims = json.dumps({"service_name": "foo", "identity": identity})
+    token = mac(msg=claims, key=decode_key(creation_key)).decode()
+    encoded_claims = base64.urlsafe_b64encode(claims.encode()).rstrip(b"=").decode()
+
+    response = client.get(url, HTTP_AUTHORIZATION=f"CAT {token}", HTTP_CAT_CLAIMS=encoded_claims)
+    assert response.json() == {"detail": "Request not for this service."}
+
+
+@pytest.mark.parametrize(
+    ("claims", "error"),
+    [
+        ("foo!", "Invalid 'CAT-Claims' header. Must be base64url-encoded JSON."),
+        ("Zm9v", "Invalid 'CAT-Claims' header. Must be base64url-encoded JSON."),
+        ("WzFd", "Invalid 'CAT-Claims' header. Claims must be a JSON object."),
+        ("eyJpZGVudGl0eSI6IDF9", "Invalid 'CAT-Claims' header. Value for claim 'identity' must be a string."),
+        ("eyJpZGVudGl0eSI6ICIxIn0", "Missing required headers: 'CAT-Service-Name'."),
+    ],
+)
+def test_cat__authenticate_user__claims_header__invalid(client: Client, settings, claims, error):
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "SERVICE_TYPE": "foo",
+        "SERVICE_NAME": "bar",
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CLAIMS_HEADER": True,
+    }
+
+    response = client.get(reverse("example"), HTTP_AUTHORIZATION="CAT foo", HTTP_CAT_CLAIMS=claims)
+    assert response.json() == {"detail": error}
+
+
+def test_cat__authenticate_user__claims_header__with_separate_headers(client: Client, settings):
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "SERVICE_TYPE": "foo",
+        "SERVICE_NAME": "bar",
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CLAIMS_HEADER": True,
+    }
+
+    response = client.get(reverse("example"), HTTP_AUTHORIZATION="CAT foo", HTTP_CAT_CLAIMS="e30", HTTP_CAT_IDENTITY="1")
+    assert response.json() == {
+        "detail": "CAT claims must be sent either in the 'CAT-Claims' header or in separate CAT headers, not both.",
+    }
+
+
+def test_cat__authenticate_user__claims(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    timestamp = "2024-01-01T00:00:00+00:00"
+    valid_until = "2100-01-01T00:00:00+00:00"
+    nonce = secrets.token_urlsafe()
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(
+            identity=identity,
+            service_name=service_entity.type.name,
+            timestamp=timestamp,
+            valid_until=valid_until,
+            nonce=nonce,
+        )
+
+    response = client.get(
+        reverse("example_claims"),
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_TIMESTAMP=timestamp,
+        HTTP_CAT_VALID_UNTIL=valid_until,
+        HTTP_CAT_NONCE=nonce,
+    )
+
+    assert response.json() == {
+        "claims": {
+            "identity": identity,
+            "service_name": service_entity.type.name,
+            "timestamp": "2024-01-01T00:00:00Z",
+            "valid_until": "2100-01-01T00:00:00Z",
+            "nonce": nonce,
+            "extra": {},
+        },
+    }
+
+
+def test_cat_claims__from_cat_info():
+    cat_info = {"CAT-Identity": 1, "CAT-Service-Name": "foo", "CAT-Nonce": "bar", "CAT-Request-Id": "baz"}
+
+    claims = CATClaims.from_cat_info(cat_info)
+
+    assert claims == CATClaims(identity=1, service_name="foo", nonce="bar", extra={"CAT-Request-Id": "baz"})
+    assert "CAT-Request-Id" in cat_info
+    with pytest.raises(TypeError):
+        claims.extra["CAT-Request-Id"] = "qux"
+
+
 def test_cat__authenticate_user__cat_headers_in_bytes(client: Client, settings):
     user = UserFactory.create()
     identity = str(user.pk)
@@ -639,7 +924,14 @@ def test_cat__authenticate_user__expired_valid_until(client: Client, settings):
     assert response.json() == {"detail": "'CAT-Valid-Until' header indicates that the request is no longer valid."}
 
 
-def test_cat__authenticate_user__invalid_cat_header_chars(client: Client, settings):
+@pytest.mark.parametrize(
+    ("timestamp_format", "multiplier"),
+    [
+        ("epoch", 1),
+        ("epoch_ms", 1000),
+    ],
+)
+def test_cat__authenticate_user__epoch_timestamps(client: Client, settings, timestamp_format, multiplier):
     user = UserFactory.create()
     identity = str(user.pk)
     service_entity = ServiceEntityFactory.create()
@@ -652,26 +944,53 @@ def test_cat__authenticate_user__invalid_cat_header_chars(client: Client, settin
         "SERVICE_NAME": service_entity.name,
         "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
         "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "TIMESTAMP_FORMAT": timestamp_format,
         "CA_CERTIFICATE": certificate,
         "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
     }
 
-    with use_test_client_for_http(client):
-        get_cat_verification_key()
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    timestamp = str(int(now.timestamp() * multiplier))
+    valid_until = str(int((now + datetime.timedelta(minutes=5)).timestamp() * multiplier))
 
-    cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+    with use_test_client_for_http(client):
+        cat = create_cat_header(
+            identity=identity,
+            service_name=service_entity.type.name,
+            timestamp=timestamp,
+            valid_until=valid_until,
+        )
 
     url = reverse("example")
     response = client.get(
         url,
         HTTP_AUTHORIZATION=cat,
-        HTTP_CAT_IDENTITY=b"\xd3\x82\xe87<\xa4\x95\xd2\xe6Cu\xd3\xc8\xa0\xed\xfe",
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_TIMESTAMP=timestamp,
+        HTTP_CAT_VALID_UNTIL=valid_until,
     )
 
-    assert response.json() == {"detail": "Invalid CAT header 'CAT-Identity'. Should not contain non-ASCII characters."}
+    assert response.json() == {"foo": "bar"}
 
+    # ISO 8601 timestamps are still accepted.
+    valid_until = (now + datetime.timedelta(minutes=5)).isoformat()
 
-def test_cat__authenticate_user__unrecognized_cat_header(client: Client, settings):
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name, valid_until=valid_until)
+
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_VALID_UNTIL=valid_until,
+    )
+
+    assert response.json() == {"foo": "bar"}
+
+
+def test_cat__authenticate_user__epoch_timestamps__expired_valid_until(client: Client, settings):
     user = UserFactory.create()
     identity = str(user.pk)
     service_entity = ServiceEntityFactory.create()
@@ -684,6 +1003,7 @@ def test_cat__authenticate_user__unrecognized_cat_header(client: Client, setting
         "SERVICE_NAME": service_entity.name,
         "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
         "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "TIMESTAMP_FORMAT": "epoch",
         "CA_CERTIFICATE": certificate,
         "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
     }
@@ -691,19 +1011,31 @@ def test_cat__authenticate_user__unrecognized_cat_header(client: Client, setting
     with use_test_client_for_http(client):
         get_cat_verification_key()
 
-    cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
-
     url = reverse("example")
     response = client.get(
         url,
-        HTTP_AUTHORIZATION=cat,
-        HTTP_CAT_FOOD="foo",
+        HTTP_AUTHORIZATION="CAT foo",
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_VALID_UNTIL="1704067200",
     )
 
-    assert response.json() == {"detail": "Unrecognized CAT header: 'CAT-Food'."}
+    assert response.json() == {"detail": "'CAT-Valid-Until' header indicates that the request is no longer valid."}
+
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION="CAT foo",
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_VALID_UNTIL="foo",
+    )
 
+    assert response.json() == {
+        "detail": "Invalid 'CAT-Valid-Until' header. Must be a Unix timestamp or in ISO 8601 format.",
+    }
 
-def test_cat__authenticate_user__validator_not_found(client: Client, settings):
+
+def test_cat__authenticate_user__naive_valid_until(client: Client, settings):
     user = UserFactory.create()
     identity = str(user.pk)
     service_entity = ServiceEntityFactory.create()
@@ -716,21 +1048,556 @@ def test_cat__authenticate_user__validator_not_found(client: Client, settings):
         "SERVICE_NAME": service_entity.name,
         "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
         "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
-        "ADDITIONAL_VALID_CAT_HEADERS": ["CAT-Food"],
         "CA_CERTIFICATE": certificate,
         "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
     }
 
-    with use_test_client_for_http(client):
-        get_cat_verification_key()
+    # Timestamps without a timezone are in UTC.
+    now = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    valid_until = (now + datetime.timedelta(minutes=5)).isoformat()
 
-    cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name, valid_until=valid_until)
 
     url = reverse("example")
     response = client.get(
         url,
         HTTP_AUTHORIZATION=cat,
-        HTTP_CAT_FOOD="foo",
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_VALID_UNTIL=valid_until,
     )
 
-    assert response.json() == {"detail": "Missing validation function for header: 'CAT-Food'."}
+    assert response.json() == {"foo": "bar"}
+
+
+def test_cat__authenticate_user__invalid_cat_header_chars(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        get_cat_verification_key()
+
+    cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    url = reverse("example")
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY=b"\xd3\x82\xe87<\xa4\x95\xd2\xe6Cu\xd3\xc8\xa0\xed\xfe",
+    )
+
+    assert response.json() == {"detail": "Invalid CAT header 'CAT-Identity'. Should not contain non-ASCII characters."}
+
+
+def test_cat__authenticate_user__unrecognized_cat_header(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        get_cat_verification_key()
+
+    cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    url = reverse("example")
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_FOOD="foo",
+    )
+
+    assert response.json() == {"detail": "Unrecognized CAT header: 'CAT-Food'."}
+
+
+def test_cat__authenticate_user__validator_not_found(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "ADDITIONAL_VALID_CAT_HEADERS": ["CAT-Food"],
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        get_cat_verification_key()
+
+    cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    url = reverse("example")
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_FOOD="foo",
+    )
+
+    assert response.json() == {"detail": "Missing validation function for header: 'CAT-Food'."}
+
+
+def test_cat__authenticate_user__ignore_unrecognized_cat_header(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "REJECT_UNRECOGNIZED_CAT_HEADERS": False,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    url = reverse("example")
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY=identity.encode(),
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_FOOD="foo",
+    )
+
+    assert response.json() == {"foo": "bar"}
+
+
+def test_cat__creation_key_cache(client: Client, settings):
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        creation_key = get_cat_creation_key(identity="foo")
+
+    assert creation_key == create_cat_creation_key(identity="foo", service=service_entity.type.name)
+    assert get_cat_creation_key(identity="foo") == creation_key
+
+    stats = get_creation_key_cache().stats
+    assert stats.hits == 1
+    assert stats.misses == 1
+
+    # Creation key is not used from the cache if the verification key has changed.
+    cat_service_settings.VERIFICATION_KEY = "bar"
+    assert get_cat_creation_key(identity="foo") == hmac(msg="foo", key="bar")
+
+
+@pytest.mark.parametrize("user_cache", ["LocalUserCache", "DjangoUserCache"])
+def test_cat__authenticate_user__user_cache(client: Client, settings, django_assert_num_queries, user_cache):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "USER_CACHE": f"cat_service.user_cache.{user_cache}",
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    url = reverse("example")
+    headers = {
+        "HTTP_AUTHORIZATION": cat,
+        "HTTP_CAT_IDENTITY": identity,
+        "HTTP_CAT_SERVICE_NAME": service_entity.type.name,
+    }
+
+    with django_assert_num_queries(1):
+        response = client.get(url, **headers)
+    assert response.json() == {"foo": "bar"}
+
+    with django_assert_num_queries(0):
+        response = client.get(url, **headers)
+    assert response.json() == {"foo": "bar"}
+
+    # Saving the user removes it from the cache.
+    user.save()
+
+    with django_assert_num_queries(1):
+        response = client.get(url, **headers)
+    assert response.json() == {"foo": "bar"}
+
+
+def test_cat__authenticate_user__lazy_user(client: Client, settings, django_assert_num_queries):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "LAZY_USER": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    headers = {
+        "HTTP_AUTHORIZATION": cat,
+        "HTTP_CAT_IDENTITY": identity,
+        "HTTP_CAT_SERVICE_NAME": service_entity.type.name,
+    }
+
+    # User is not fetched if its attributes are not accessed.
+    with django_assert_num_queries(0):
+        response = client.get(reverse("example"), **headers)
+    assert response.json() == {"foo": "bar"}
+
+    with django_assert_num_queries(1):
+        response = client.get(reverse("example_user"), **headers)
+    assert response.json() == {"username": user.username}
+
+
+def test_cat__authenticate_user__lazy_user__user_does_not_exist(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "LAZY_USER": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    user.delete()
+
+    headers = {
+        "HTTP_AUTHORIZATION": cat,
+        "HTTP_CAT_IDENTITY": identity,
+        "HTTP_CAT_SERVICE_NAME": service_entity.type.name,
+    }
+
+    response = client.get(reverse("example"), **headers)
+    assert response.json() == {"foo": "bar"}
+
+    response = client.get(reverse("example_user"), **headers)
+    assert response.json() == {"detail": "User does not exist."}
+
+
+def test_cat__authenticate_user__nonce_replay(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "NONCE_REPLAY_PROTECTION": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    nonce = secrets.token_urlsafe()
+    timestamp = datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(
+            identity=identity,
+            service_name=service_entity.type.name,
+            timestamp=timestamp,
+            nonce=nonce,
+        )
+
+    headers = {
+        "HTTP_AUTHORIZATION": cat,
+        "HTTP_CAT_IDENTITY": identity,
+        "HTTP_CAT_SERVICE_NAME": service_entity.type.name,
+        "HTTP_CAT_TIMESTAMP": timestamp,
+        "HTTP_CAT_NONCE": nonce,
+    }
+
+    response = client.get(reverse("example"), **headers)
+    assert response.json() == {"foo": "bar"}
+
+    response = client.get(reverse("example"), **headers)
+    assert response.json() == {"detail": "'CAT-Nonce' has already been used."}
+
+
+def test_cat__authenticate_user__verified_cat_cache(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "VERIFIED_CAT_CACHE_SIZE": 10,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    valid_until = (datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(seconds=30)).isoformat()
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name, valid_until=valid_until)
+
+    headers = {
+        "HTTP_AUTHORIZATION": cat,
+        "HTTP_CAT_IDENTITY": identity,
+        "HTTP_CAT_SERVICE_NAME": service_entity.type.name,
+        "HTTP_CAT_VALID_UNTIL": valid_until,
+    }
+
+    response = client.get(reverse("example"), **headers)
+    assert response.json() == {"foo": "bar"}
+
+    verified_cat_cache = get_verified_cat_cache()
+    assert verified_cat_cache.stats.size == 1
+    # CAT is not cached past its 'CAT-Valid-Until'.
+    expires_at = next(iter(verified_cat_cache._data.values()))[0]
+    assert expires_at <= time.monotonic() + 30
+
+    with patch("cat_service.core.create_cat_mac_for_headers") as create_cat_mac:
+        response = client.get(reverse("example"), **headers)
+
+    assert response.json() == {"foo": "bar"}
+    create_cat_mac.assert_not_called()
+    assert verified_cat_cache.stats.hits == 1
+
+    # Same CAT with different headers is verified again.
+    response = client.get(reverse("example"), **headers, HTTP_CAT_NONCE="foo")
+    assert response.json() == {"detail": "Invalid CAT."}
+
+
+def test_cat__authenticate_user__verified_cat_cache__nonce_replay(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "NONCE_REPLAY_PROTECTION": True,
+        "VERIFIED_CAT_CACHE_SIZE": 10,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    nonce = secrets.token_urlsafe()
+    timestamp = datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(
+            identity=identity,
+            service_name=service_entity.type.name,
+            timestamp=timestamp,
+            nonce=nonce,
+        )
+
+    headers = {
+        "HTTP_AUTHORIZATION": cat,
+        "HTTP_CAT_IDENTITY": identity,
+        "HTTP_CAT_SERVICE_NAME": service_entity.type.name,
+        "HTTP_CAT_TIMESTAMP": timestamp,
+        "HTTP_CAT_NONCE": nonce,
+    }
+
+    response = client.get(reverse("example"), **headers)
+    assert response.json() == {"foo": "bar"}
+
+    # Nonce is checked even when the CAT is found from the cache.
+    response = client.get(reverse("example"), **headers)
+    assert response.json() == {"detail": "'CAT-Nonce' has already been used."}
+    assert get_verified_cat_cache().stats.hits == 1
+
+
+def test_cat__authenticate_user__nonce_replay__valid_until_outside_window(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "NONCE_REPLAY_PROTECTION": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    nonce = secrets.token_urlsafe()
+    valid_until = (datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(hours=1)).isoformat()
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(
+            identity=identity,
+            service_name=service_entity.type.name,
+            nonce=nonce,
+            valid_until=valid_until,
+        )
+
+    response = client.get(
+        reverse("example"),
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        HTTP_CAT_NONCE=nonce,
+        HTTP_CAT_VALID_UNTIL=valid_until,
+    )
+    assert response.json() == {"detail": "CAT is not valid during the nonce replay window, cannot check 'CAT-Nonce'."}
+
+
+def test_cat__authenticate_user__async(client: Client, settings, rf):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_async_http(client) as mock:
+        cat = async_to_sync(acreate_cat)(identity=identity, service_name=service_entity.type.name)
+
+    # Certificate and verification key were fetched from the CA.
+    assert mock.call_count == 2
+
+    request = Request(
+        rf.get(
+            reverse("example"),
+            HTTP_AUTHORIZATION=f"{cat_service_settings.AUTH_SCHEME} {cat}",
+            HTTP_CAT_IDENTITY=identity,
+            HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        ),
+    )
+
+    result = async_to_sync(AsyncCATAuthentication().authenticate)(request)
+    assert result == (user, CATClaims(identity=identity, service_name=service_entity.type.name))
+
+
+def test_cat__authenticate_user__async__user_does_not_exist(client: Client, settings, rf):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "USER_CACHE": "cat_service.user_cache.DjangoUserCache",
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    user.delete()
+
+    request = Request(
+        rf.get(
+            reverse("example"),
+            HTTP_AUTHORIZATION=cat,
+            HTTP_CAT_IDENTITY=identity,
+            HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+        ),
+    )
+
+    with pytest.raises(AuthenticationFailed, match=re.escape("User does not exist.")):
+        async_to_sync(AsyncCATAuthentication().authenticate)(request)
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import httpx
+from asgiref.sync import async_to_sync
+
+from cat_ca.cryptography import create_client_certificate, get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common.concurrency import SingleFlight
+from cat_common.cryptography import deserialize_csr, serialize_certificate
+from cat_common.settings import cat_common_settings
+from cat_service.cryptography import get_cat_verification_key, refresh_flight, reset_after_fork
+from cat_service.settings import cat_service_settings
+
+THREADS = 10
+
+
+def test_single_flight():
+    flight = SingleFlight()
+    calls = 0
+    barrier = threading.Barrier(THREADS)
+
+    def func():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.1)
+        return "foo"
+
+    def call():
+        barrier.wait()
+        return flight.do("key", func)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(lambda _: call(), range(THREADS)))
+
+    assert results == ["foo"] * THREADS
+    assert calls == 1
+
+    # A new call is made once the previous one has finished.
+    assert flight.do("key", func) == "foo"
+    assert calls == 2
+
+
+def test_single_flight__error_is_shared():
+    flight = SingleFlight()
+    barrier = threading.Barrier(THREADS)
+
+    def func():
+        time.sleep(0.1)
+        msg = "foo"
+        raise ValueError(msg)
+
+    def call():
+        barrier.wait()
+        try:
+            flight.do("key", func)
+        except ValueError as error:
+            return error
+        return None
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        errors = list(executor.map(lambda _: call(), range(THREADS)))
+
+    assert len({id(error) for error in errors}) == 1
+
+
+def test_single_flight__reset():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait(1)
+        return "foo"
+
+    thread = threading.Thread(target=flight.do, args=("key", blocked))
+    thread.start()
+    assert started.wait(1)
+    assert flight.in_flight("key") is True
+
+    # E.g. in a forked process, the call in flight would never finish, so new calls must not wait for it.
+    flight.reset()
+
+    assert flight.in_flight("key") is False
+    assert flight.do("key", lambda: "bar") == "bar"
+
+    release.set()
+    thread.join(1)
+    assert flight.in_flight("key") is False
+
+
+def test_single_flight__async():
+    flight = SingleFlight()
+    calls = 0
+
+    async def func():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "foo"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("key", func) for _ in range(THREADS)))
+
+    assert async_to_sync(main)() == ["foo"] * THREADS
+    assert calls == 1
+
+
+def test_single_flight__refresh_verification_key(settings):
+    get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": "foo",
+        "SERVICE_NAME": "bar",
+        "VERIFICATION_KEY_URL": "https://ca.example.com/verification-key",
+        "CERTIFICATE_URL": "https://ca.example.com/certificate",
+        "CA_CERTIFICATE": cat_ca_settings.CA_CERTIFICATE,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    urls: list[str] = []
+
+    def post(self, url, json, follow_redirects, **kwargs):
+        urls.append(url)
+        time.sleep(0.1)
+        if url == cat_service_settings.CERTIFICATE_URL:
+            certificate = create_client_certificate(deserialize_csr(json["csr"]))
+            data = {"certificate": serialize_certificate(certificate)}
+        else:
+            data = {"verification_key": "key"}
+        return httpx.Response(200, json=data, request=httpx.Request("POST", url))
+
+    barrier = threading.Barrier(THREADS)
+
+    def call():
+        barrier.wait()
+        return get_cat_verification_key()
+
+    with (
+        patch("cat_service.http.httpx.Client.post", side_effect=post, autospec=True),
+        ThreadPoolExecutor(max_workers=THREADS) as executor,
+    ):
+        keys = list(executor.map(lambda _: call(), range(THREADS)))
+
+    assert keys == ["key"] * THREADS
+    assert urls == [cat_service_settings.CERTIFICATE_URL, cat_service_settings.VERIFICATION_KEY_URL]
+
+
+def test_reset_after_fork():
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait(1)
+
+    thread = threading.Thread(target=refresh_flight.do, args=("verification_key", blocked))
+    thread.start()
+    assert started.wait(1)
+
+    try:
+        reset_after_fork()
+        assert refresh_flight.in_flight("verification_key") is False
+    finally:
+        release.set()
+        thread.join(1)
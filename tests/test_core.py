@@ -0,0 +1,211 @@
+import datetime
+import secrets
+import subprocess
+import sys
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test.client import Client
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.reverse import reverse
+
+from cat_ca.cryptography import get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common import error_codes, known_headers
+from cat_common.settings import cat_common_settings
+from cat_service.core import DEFAULT_HEADER_VALIDATORS, CATClaims, CATVerification, averify, verify
+from cat_service.cryptography import acreate_cat, create_cat_header, get_verified_cat_cache
+from cat_service.exceptions import CATVerificationError
+from cat_service.settings import cat_service_settings
+from tests.factories import ServiceEntityFactory
+from tests.helpers import use_test_client_for_async_http, use_test_client_for_http
+
+pytestmark = [
+    pytest.mark.django_db,
+]
+
+
+@pytest.fixture
+def service_name(settings) -> str:
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "NONCE_REPLAY_PROTECTION": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+    return service_entity.type.name
+
+
+def test_verify(client: Client, service_name):
+    with use_test_client_for_http(client):
+        authorization = create_cat_header(identity="1", service_name=service_name)
+        result = verify(authorization, {"cat-identity": "1", "CAT-Service-Name": service_name})
+
+    assert result == CATVerification(claims=CATClaims(identity="1", service_name=service_name))
+    assert result.is_valid is True
+
+
+def test_verify__bytes(client: Client, service_name):
+    with use_test_client_for_http(client):
+        authorization = create_cat_header(identity="1", service_name=service_name)
+        result = verify(authorization.encode(), {"CAT-Identity": b"1", "CAT-Service-Name": service_name.encode()})
+
+    assert result.is_valid is True
+
+
+def test_verify__invalid_cat(client: Client, service_name):
+    with use_test_client_for_http(client):
+        result = verify("CAT foo", {"CAT-Identity": "1", "CAT-Service-Name": service_name})
+
+    assert result == CATVerification(code=error_codes.INVALID_CAT, message="Invalid CAT.")
+    assert result.is_valid is False
+
+
+def test_verify__invalid_auth_scheme(service_name):
+    result = verify("Bearer foo", {"CAT-Identity": "1", "CAT-Service-Name": service_name})
+
+    assert result == CATVerification(
+        code=error_codes.INVALID_AUTH_SCHEME,
+        message="Invalid auth scheme: 'Bearer'. Accepted: 'CAT'.",
+    )
+
+
+def test_verify__invalid_header(service_name):
+    result = verify("CAT foo", {"CAT-Identity": "1", "CAT-Service-Name": "foo"})
+
+    assert result == CATVerification(code=error_codes.WRONG_SERVICE, message="Request not for this service.")
+
+
+def test_verify__custom_header_validator(service_name):
+    def validate_identity(value: str) -> int:
+        if not value.isdigit():
+            msg = "Identity must be a number."
+            raise CATVerificationError(msg, code="invalid_identity")
+        return int(value)
+
+    header_validators = {**DEFAULT_HEADER_VALIDATORS, known_headers.IDENTITY: validate_identity}
+    headers = {"CAT-Identity": "foo", "CAT-Service-Name": service_name}
+
+    result = verify("CAT foo", headers, header_validators=header_validators)
+
+    assert result == CATVerification(code="invalid_identity", message="Identity must be a number.")
+
+
+def test_verify__custom_header_validator__drf_error(service_name):
+    def validate_identity(value: str) -> int:
+        msg = "Identity must be a number."
+        raise AuthenticationFailed(msg)
+
+    header_validators = {**DEFAULT_HEADER_VALIDATORS, known_headers.IDENTITY: validate_identity}
+    headers = {"CAT-Identity": "foo", "CAT-Service-Name": service_name}
+
+    # Only `CATVerificationError` is converted to a result.
+    with pytest.raises(AuthenticationFailed):
+        verify("CAT foo", headers, header_validators=header_validators)
+
+
+def test_verify__verified_cat_cache__verification_key(client: Client, settings, service_name):
+    settings.CAT_SETTINGS = {**settings.CAT_SETTINGS, "VERIFIED_CAT_CACHE_SIZE": 10}
+    headers = {"CAT-Identity": "1", "CAT-Service-Name": service_name}
+
+    with use_test_client_for_http(client):
+        authorization = create_cat_header(identity="1", service_name=service_name)
+
+    verification_key = cat_service_settings.VERIFICATION_KEY
+    # E.g., the key is rotated after it was fetched for an async verification.
+    cat_service_settings.VERIFICATION_KEY = "rotated"
+
+    result = verify(authorization, headers, verification_key=verification_key)
+
+    assert result.is_valid is True
+    # CAT is cached with the key that verified it.
+    assert [value for _, value in get_verified_cat_cache()._data.values()] == [verification_key]
+
+
+def test_verify__now(client: Client, service_name):
+    valid_until = datetime.datetime.fromtimestamp(time.time() + 10, tz=datetime.timezone.utc).isoformat()
+    headers = {"CAT-Identity": "1", "CAT-Service-Name": service_name, "CAT-Valid-Until": valid_until}
+
+    with use_test_client_for_http(client):
+        authorization = create_cat_header(identity="1", service_name=service_name, valid_until=valid_until)
+        result = verify(authorization, headers, now=time.time() + 20)
+
+    assert result.code == error_codes.CAT_EXPIRED
+
+
+def test_verify__nonce_replay(client: Client, service_name):
+    nonce = secrets.token_urlsafe()
+    timestamp = datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
+    headers = {"CAT-Identity": "1", "CAT-Service-Name": service_name, "CAT-Timestamp": timestamp, "CAT-Nonce": nonce}
+
+    with use_test_client_for_http(client):
+        authorization = create_cat_header(identity="1", service_name=service_name, timestamp=timestamp, nonce=nonce)
+        first = verify(authorization, headers)
+        second = verify(authorization, headers)
+
+    assert first.is_valid is True
+    assert second == CATVerification(code=error_codes.NONCE_ALREADY_USED, message="'CAT-Nonce' has already been used.")
+
+
+def test_verify__nonce_clock_skew(client: Client, service_name):
+    now = time.time()
+    headers = {"CAT-Identity": "1", "CAT-Service-Name": service_name}
+
+    with use_test_client_for_http(client):
+        results = []
+        # Client's clock is ahead of the server's by less than, and by more than, the `LEEWAY` setting.
+        for skew in (0.5, 2):
+            nonce = secrets.token_urlsafe()
+            timestamp = datetime.datetime.fromtimestamp(now + skew, tz=datetime.timezone.utc).isoformat()
+            cat_headers = {**headers, "CAT-Timestamp": timestamp, "CAT-Nonce": nonce}
+            authorization = create_cat_header(identity="1", service_name=service_name, timestamp=timestamp, nonce=nonce)
+            results.append(verify(authorization, cat_headers, now=now))
+
+    assert results[0].is_valid is True
+    assert results[1].code == error_codes.NONCE_OUTSIDE_WINDOW
+
+
+def test_averify(client: Client, service_name):
+    headers = {"CAT-Identity": "1", "CAT-Service-Name": service_name}
+
+    with use_test_client_for_async_http(client):
+        cat = async_to_sync(acreate_cat)(identity="1", service_name=service_name)
+        result = async_to_sync(averify)(f"CAT {cat}", headers)
+
+    assert result == CATVerification(claims=CATClaims(identity="1", service_name=service_name))
+
+
+def test_verify__nonce_without_expiry(client: Client, service_name):
+    nonce = secrets.token_urlsafe()
+    headers = {"CAT-Identity": "1", "CAT-Service-Name": service_name, "CAT-Nonce": nonce}
+    now = time.time()
+
+    with use_test_client_for_http(client):
+        authorization = create_cat_header(identity="1", service_name=service_name, nonce=nonce)
+        first = verify(authorization, headers, now=now)
+        # The CAT never expires, so it could otherwise be replayed after its nonce is forgotten.
+        replayed = verify(authorization, headers, now=now + 2 * cat_service_settings.NONCE_REPLAY_WINDOW.total_seconds())
+
+    expected = CATVerification(
+        code=error_codes.NONCE_OUTSIDE_WINDOW,
+        message="CAT with a 'CAT-Nonce' must also have a 'CAT-Timestamp' or 'CAT-Valid-Until' header.",
+    )
+    assert first == expected
+    assert replayed == expected
+
+
+def test_core__no_drf():
+    # Core can be used without DRF, e.g., in services that don't use it otherwise.
+    code = "import sys, cat_service.core; sys.exit('rest_framework' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], check=False, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,115 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test.client import Client
+from rest_framework.reverse import reverse
+
+from cat_ca.cryptography import create_cat_verification_key, get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common.settings import cat_common_settings
+from cat_service.credentials import SharedCredentialStore, get_shared_credential_store
+from cat_service.cryptography import get_cat_verification_key
+from cat_service.settings import cat_service_settings
+from tests.factories import ServiceEntityFactory
+from tests.helpers import use_test_client_for_http
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    caches["default"].clear()
+
+
+def test_shared_credential_store():
+    store_1 = SharedCredentialStore(alias="default", lock_timeout=1)
+    store_2 = SharedCredentialStore(alias="default", lock_timeout=1)
+
+    assert store_1.fetch("foo", lambda: "bar") == "bar"
+    # Credential fetched by another process is used.
+    assert store_2.fetch("foo", lambda: "baz") == "bar"
+    # Credential is fetched if the shared one has already been used.
+    assert store_2.fetch("foo", lambda: "baz") == "baz"
+    assert store_1.fetch("foo", lambda: "qux") == "baz"
+
+
+def test_shared_credential_store__async():
+    store_1 = SharedCredentialStore(alias="default", lock_timeout=1)
+    store_2 = SharedCredentialStore(alias="default", lock_timeout=1)
+
+    async def fetch(value):
+        return value
+
+    assert async_to_sync(store_1.afetch)("foo", lambda: fetch("bar")) == "bar"
+    assert async_to_sync(store_2.afetch)("foo", lambda: fetch("baz")) == "bar"
+
+
+def test_shared_credential_store__not_usable():
+    store_1 = SharedCredentialStore(alias="default", lock_timeout=1)
+    store_2 = SharedCredentialStore(alias="default", lock_timeout=1)
+
+    store_1.fetch("foo", lambda: "bar")
+
+    assert store_2.fetch("foo", lambda: "baz", is_usable=lambda value: value != "bar") == "baz"
+
+
+def test_shared_credential_store__other_version():
+    store_1 = SharedCredentialStore(alias="default", lock_timeout=1)
+    store_2 = SharedCredentialStore(alias="default", lock_timeout=1)
+    store_2.version = 2
+
+    store_1.fetch("foo", lambda: "bar")
+
+    assert store_2.fetch("foo", lambda: "baz") == "baz"
+
+
+def test_shared_credential_store__lock_held_by_other_process():
+    store = SharedCredentialStore(alias="default", lock_timeout=0.1)
+    caches["default"].add(store.lock_key, 1)
+
+    assert store.fetch("foo", lambda: "bar") == "bar"
+
+
+@pytest.mark.django_db
+def test_shared_credential_store__verification_key(client: Client, settings):
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "SHARED_CREDENTIALS_CACHE_ALIAS": "default",
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client) as post:
+        verification_key = get_cat_verification_key()
+
+    assert verification_key == create_cat_verification_key(service=service_entity.type.name)
+    assert post.call_count == 2
+
+    service_certificate = cat_service_settings.SERVICE_CERTIFICATE
+    service_private_key = cat_service_settings.SERVICE_PRIVATE_KEY
+
+    # Simulate another process starting.
+    cat_service_settings.VERIFICATION_KEY = ""
+    cat_service_settings.SERVICE_CERTIFICATE = None
+    cat_service_settings.SERVICE_PRIVATE_KEY = None
+    get_shared_credential_store.cache_clear()
+
+    with use_test_client_for_http(client) as post:
+        assert get_cat_verification_key() == verification_key
+
+    assert post.call_count == 0
+    assert cat_service_settings.SERVICE_CERTIFICATE is None
+
+    # Certificate is shared as well, along with the private key it was created for.
+    with use_test_client_for_http(client) as post:
+        assert get_cat_verification_key(force_refresh=True) == verification_key
+
+    assert post.call_count == 1
+    assert cat_service_settings.SERVICE_CERTIFICATE == service_certificate
+    assert cat_service_settings.SERVICE_PRIVATE_KEY.private_bytes_raw() == service_private_key.private_bytes_raw()
@@ -0,0 +1,86 @@
+import hashlib
+import hmac
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from cat_common.cryptography import (
+    KeyedBLAKE2,
+    KeyedHMAC,
+    KeyedMAC,
+    drop_keyed_mac,
+    get_keyed_mac,
+    get_keyed_mac_cache,
+    get_mac_backend_name,
+    mac,
+)
+from cat_common.settings import cat_common_settings
+from cat_service.settings import cat_service_settings
+
+
+@pytest.mark.parametrize("key", [b"", b"foo", b"x" * 64, b"x" * 200])
+@pytest.mark.parametrize("digestmod", ["sha256", "sha512", "sha3_256", "blake2b"])
+def test_keyed_hmac(key, digestmod):
+    keyed_mac = KeyedHMAC(key, digestmod=digestmod)
+
+    assert keyed_mac.digest(b"foo") == hmac.digest(key, b"foo", digestmod)
+    # Prepared state is not changed by creating a MAC.
+    assert keyed_mac.digest("bar") == hmac.digest(key, b"bar", digestmod)
+
+
+def test_get_keyed_mac(settings):
+    settings.CAT_SETTINGS = {"CA_NAME": "ca"}
+
+    keyed_mac = get_keyed_mac(b"foo")
+    assert get_keyed_mac(b"foo") is keyed_mac
+    assert get_keyed_mac(b"bar") is not keyed_mac
+    assert keyed_mac.derive_key("bar") == hmac.digest(b"foo", b"bar", "sha256").hex().encode()
+
+    drop_keyed_mac(b"foo")
+    assert get_keyed_mac(b"foo") is not keyed_mac
+
+    settings.CAT_SETTINGS = {"CA_NAME": "ca", "KEYED_MAC_CACHE_SIZE": 0}
+    assert get_keyed_mac(b"foo") is not get_keyed_mac(b"foo")
+    assert len(get_keyed_mac_cache()) == 0
+
+
+@pytest.mark.parametrize("key", [b"", b"foo", b"x" * 64, b"x" * 200])
+@pytest.mark.parametrize("digestmod", ["blake2b", "blake2s"])
+def test_keyed_blake2(key, digestmod):
+    keyed_mac = KeyedBLAKE2(key, digestmod=digestmod)
+    blake2 = getattr(hashlib, digestmod)
+    if len(key) > blake2.MAX_KEY_SIZE:
+        key = blake2(key, digest_size=blake2.MAX_KEY_SIZE).digest()
+
+    assert keyed_mac.digest(b"foo") == blake2(b"foo", key=key, digest_size=32).digest()
+    assert keyed_mac.digest("bar") == blake2(b"bar", key=key, digest_size=32).digest()
+
+
+def test_mac_backend(settings):
+    settings.CAT_SETTINGS = {"CA_NAME": "ca", "MAC_BACKEND": "blake2s"}
+
+    assert get_mac_backend_name() == "blake2s"
+    assert isinstance(get_keyed_mac(b"foo"), KeyedBLAKE2)
+    assert mac(msg="bar", key=b"foo") == hashlib.blake2s(b"bar", key=b"foo", digest_size=32).hexdigest().encode()
+
+    settings.CAT_SETTINGS = {"CA_NAME": "ca", "MAC_BACKEND": "foo"}
+
+    with pytest.raises(ImproperlyConfigured, match="must be one of 'hmac', 'blake2b', 'blake2s', not 'foo'."):
+        mac(msg="bar", key=b"foo")
+
+
+@pytest.mark.parametrize(
+    ("name", "value"),
+    [("TIMESTAMP_FORMAT", "epochs"), ("CAT_ENCODING", "base64"), ("MAC_BACKEND", "blake3")],
+)
+@pytest.mark.parametrize("holder", [cat_common_settings, cat_service_settings], ids=["common", "service"])
+def test_settings__unknown_choice(settings, holder, name, value):
+    settings.CAT_SETTINGS = {"CA_NAME": "ca", name: value}
+
+    with pytest.raises(ImproperlyConfigured, match=f"must be one of .*, not '{value}'"):
+        getattr(holder, name)
+
+
+def test_keyed_mac__abstract():
+    with pytest.raises(TypeError, match="digest"):
+        KeyedMAC(b"foo")
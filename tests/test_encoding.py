@@ -0,0 +1,60 @@
+import datetime
+import json
+import random
+
+import pytest
+
+from cat_service.encoding import encode_cat_claims
+
+CLAIM_NAMES = ["identity", "service_name", "timestamp", "valid_until", "nonce", "food", "extra_claim"]
+
+
+def random_string(rng: random.Random) -> str:
+    alphabet = [
+        *"abcXYZ019 -_:+.",
+        '"',
+        "\\",
+        "/",
+        "\n",
+        "\t",
+        "\x00",
+        "\x7f",
+        "ä",
+        "€",
+        " ",
+        "\ud800",
+        "😀",
+    ]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+
+
+def random_value(rng: random.Random) -> object:
+    kind = rng.random()
+    if kind < 0.85:
+        return random_string(rng)
+    if kind < 0.90:
+        return rng.randint(-1000, 1000)
+    if kind < 0.95:
+        return None
+    return datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_encode_cat_claims__same_as_json(settings, seed):
+    settings.CAT_SETTINGS = {
+        "CA_NAME": "ca",
+        "ADDITIONAL_VALID_CAT_HEADERS": ["CAT-Food"],
+    }
+
+    rng = random.Random(seed)
+    for _ in range(200):
+        names = rng.sample(CLAIM_NAMES, k=rng.randint(0, len(CLAIM_NAMES)))
+        claims = {name: random_value(rng) for name in names}
+
+        assert encode_cat_claims(claims) == json.dumps(claims, sort_keys=True, default=str).encode()
+
+
+def test_encode_cat_claims():
+    claims = {"service_name": "foo", "identity": "1", "nonce": 'a"b'}
+
+    assert encode_cat_claims(claims) == b'{"identity": "1", "nonce": "a\\"b", "service_name": "foo"}'
@@ -0,0 +1,223 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test.client import Client
+from rest_framework.reverse import reverse
+
+from cat_ca.cryptography import get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common import error_codes
+from cat_common.settings import cat_common_settings
+from cat_service.cryptography import create_cat_header
+from cat_service.failures import (
+    BaseFailureLimiter,
+    DjangoFailureLimiter,
+    LocalFailureLimiter,
+    get_failure_counts,
+    reset_failure_counts,
+)
+from tests.factories import ServiceEntityFactory, UserFactory
+from tests.helpers import use_test_client_for_http
+
+
+@pytest.fixture(autouse=True)
+def clear_failures():
+    caches["default"].clear()
+    reset_failure_counts()
+
+
+@pytest.mark.parametrize("limiter_class", [LocalFailureLimiter, DjangoFailureLimiter])
+def test_failure_limiter(limiter_class):
+    limiter = limiter_class(limit=3, window=60, block_time=60)
+
+    for _ in range(2):
+        limiter.record_failure(["address:1.2.3.4", "identity:1"])
+        assert limiter.is_blocked(["address:1.2.3.4"]) is False
+
+    limiter.record_failure(["address:1.2.3.4"])
+
+    assert limiter.is_blocked(["address:1.2.3.4"]) is True
+    assert limiter.is_blocked(["identity:1"]) is False
+    assert limiter.is_blocked(["identity:1", "address:1.2.3.4"]) is True
+
+
+def test_failure_limiter__django__async():
+    limiter = DjangoFailureLimiter(limit=2, window=60, block_time=60)
+
+    async_to_sync(limiter.arecord_failure)(["identity:1"])
+    assert async_to_sync(limiter.ais_blocked)(["identity:1"]) is False
+
+    async_to_sync(limiter.arecord_failure)(["identity:1"])
+    assert async_to_sync(limiter.ais_blocked)(["identity:1"]) is True
+
+
+def test_failure_limiter__sliding_window():
+    limiter = LocalFailureLimiter(limit=10, window=60, block_time=60)
+
+    # Failures from the previous window are weighted by how much of it is still in the sliding window.
+    assert limiter.get_count(current=2, previous=10, now=60 * 100 + 15) == 2 + 10 * 0.75
+    assert limiter.get_count(current=2, previous=10, now=60 * 100 + 45) == 2 + 10 * 0.25
+
+
+@pytest.mark.django_db
+def test_cat__authenticate_user__failure_limiter(client: Client, settings, django_assert_num_queries):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "FAILURE_LIMITER": "cat_service.failures.LocalFailureLimiter",
+        "FAILURE_LIMIT_BY": ("identity",),
+        "FAILURE_LIMIT": 2,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    url = reverse("example")
+    headers = {"HTTP_CAT_IDENTITY": identity, "HTTP_CAT_SERVICE_NAME": service_entity.type.name}
+
+    for _ in range(2):
+        response = client.get(url, HTTP_AUTHORIZATION="CAT foo", **headers)
+        assert response.json() == {"detail": "Invalid CAT."}
+
+    # Identity is denied even with a valid CAT, and the request is rejected before fetching the user.
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_AUTHORIZATION=cat, **headers)
+
+    assert response.json() == {"detail": "Too many failed authentication attempts. Try again later."}
+
+    # Other identities are not affected.
+    response = client.get(
+        url,
+        HTTP_AUTHORIZATION="CAT foo",
+        HTTP_CAT_IDENTITY="0",
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+    )
+    assert response.json() == {"detail": "Invalid CAT."}
+
+    assert get_failure_counts() == {
+        error_codes.INVALID_CAT: 3,
+        error_codes.TOO_MANY_FAILED_ATTEMPTS: 1,
+    }
+
+
+def test_failure_limiter__abstract():
+    class IncompleteFailureLimiter(BaseFailureLimiter):
+        def is_blocked(self, keys: list[str]) -> bool:
+            return False
+
+    with pytest.raises(TypeError, match="record_failure"):
+        IncompleteFailureLimiter(limit=1, window=1, block_time=1)
+
+
+@pytest.mark.django_db
+def test_cat__authenticate_user__failure_limiter__identity_not_limited_by_default(client: Client, settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "FAILURE_LIMITER": "cat_service.failures.LocalFailureLimiter",
+        "FAILURE_LIMIT": 2,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_entity.type.name)
+
+    url = reverse("example")
+    headers = {"HTTP_CAT_IDENTITY": identity, "HTTP_CAT_SERVICE_NAME": service_entity.type.name}
+
+    # Someone else sends invalid CATs with the user's identity.
+    for _ in range(2):
+        response = client.get(url, HTTP_AUTHORIZATION="CAT foo", REMOTE_ADDR="10.0.0.1", **headers)
+        assert response.json() == {"detail": "Invalid CAT."}
+
+    response = client.get(url, HTTP_AUTHORIZATION="CAT foo", REMOTE_ADDR="10.0.0.1", **headers)
+    assert response.json() == {"detail": "Too many failed authentication attempts. Try again later."}
+
+    # The user is not denied.
+    response = client.get(url, HTTP_AUTHORIZATION=cat, **headers)
+    assert response.json() == {"foo": "bar"}
+
+
+@pytest.mark.django_db
+def test_cat__authenticate_user__failure_limiter__malformed_headers(client: Client, settings):
+    service_entity = ServiceEntityFactory.create()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "FAILURE_LIMITER": "cat_service.failures.LocalFailureLimiter",
+        "FAILURE_LIMIT": 2,
+    }
+
+    url = reverse("example")
+
+    response = client.get(url)
+    assert response.json() == {"detail": "Missing Authorization header."}
+
+    response = client.get(url, HTTP_AUTHORIZATION="foo")
+    assert response.json() == {"detail": "Invalid Authorization header. Must be of form: '<scheme> <token>'."}
+
+    response = client.get(url)
+    assert response.json() == {"detail": "Too many failed authentication attempts. Try again later."}
+
+    assert get_failure_counts() == {
+        error_codes.MISSING_AUTH_HEADER: 1,
+        error_codes.INVALID_AUTH_HEADER: 1,
+        error_codes.TOO_MANY_FAILED_ATTEMPTS: 1,
+    }
+
+
+@pytest.mark.django_db
+def test_cat__authenticate_user__failure_limiter__lazy_user_does_not_exist(client: Client, settings):
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "FAILURE_LIMITER": "cat_service.failures.LocalFailureLimiter",
+        "LAZY_USER": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity="0", service_name=service_entity.type.name)
+
+    response = client.get(
+        reverse("example_user"),
+        HTTP_AUTHORIZATION=cat,
+        HTTP_CAT_IDENTITY="0",
+        HTTP_CAT_SERVICE_NAME=service_entity.type.name,
+    )
+
+    assert response.json() == {"detail": "User does not exist."}
+    assert get_failure_counts() == {error_codes.USER_DOES_NOT_EXIST: 1}
@@ -0,0 +1,92 @@
+import datetime
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from cat_service.http import (
+    HTTPClientPool,
+    aclose_http_clients,
+    get_async_http_client,
+    get_http_client,
+    get_http_client_pool,
+)
+
+
+def test_http_client_pool__reuse_client():
+    pool = HTTPClientPool()
+    client = pool.get()
+
+    assert pool.get() is client
+
+    pool.close()
+    assert client.is_closed
+    assert pool.get() is not client
+
+
+def test_http_client_pool__new_client_after_fork():
+    pool = HTTPClientPool()
+    client = pool.get()
+
+    with patch("cat_service.http.os.getpid", return_value=-1):
+        forked_client = pool.get()
+
+    assert forked_client is not client
+    # Client from the parent process is not closed in the child process.
+    assert not client.is_closed
+
+
+def test_http_client_pool__async_client_per_event_loop():
+    pool = HTTPClientPool()
+
+    async def get_client():
+        client = pool.get_async()
+        assert pool.get_async() is client
+        return client
+
+    assert async_to_sync(get_client)() is not async_to_sync(get_client)()
+
+
+def test_http_client_pool__aclose():
+    pool = HTTPClientPool()
+
+    async def close_client():
+        client = pool.get_async()
+        await pool.aclose()
+        assert client.is_closed
+        assert pool.get_async() is not client
+        await pool.aclose()
+        return client
+
+    async_to_sync(close_client)()
+
+
+def test_aclose_http_clients():
+    async def close_client():
+        client = get_async_http_client()
+        await aclose_http_clients()
+        return client
+
+    assert async_to_sync(close_client)().is_closed
+
+
+def test_http_client__settings(settings):
+    settings.CAT_SETTINGS = {
+        "HTTP_TIMEOUT": datetime.timedelta(seconds=2),
+        "HTTP_MAX_CONNECTIONS": 3,
+    }
+
+    client = get_http_client()
+    assert client.timeout.read == 2
+    assert get_http_client() is client
+
+    async def get_client():
+        return get_async_http_client()
+
+    assert async_to_sync(get_client)().timeout.read == 2
+
+    # Clients are recreated when settings change.
+    settings.CAT_SETTINGS = {"HTTP_TIMEOUT": datetime.timedelta(seconds=5)}
+
+    assert client.is_closed
+    assert get_http_client().timeout.read == 5
+    assert get_http_client_pool().options["limits"].max_connections == 10
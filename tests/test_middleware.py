@@ -0,0 +1,144 @@
+import secrets
+import time
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test.client import Client
+from rest_framework.reverse import reverse
+
+from cat_ca.cryptography import get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common.settings import cat_common_settings
+from cat_service import core
+from cat_service.authentication import AUTHENTICATED_ATTRIBUTE, CATClaims
+from cat_service.cryptography import acreate_cat, create_cat_header
+from cat_service.middleware import CATAuthenticationMiddleware
+from cat_service.settings import cat_service_settings
+from tests.factories import ServiceEntityFactory, UserFactory
+from tests.helpers import use_test_client_for_async_http, use_test_client_for_http
+
+pytestmark = [
+    pytest.mark.django_db,
+]
+
+
+@pytest.fixture
+def cat_settings(settings):
+    service_entity = ServiceEntityFactory.create()
+    certificate = get_ca_certificate()
+
+    settings.MIDDLEWARE = [*settings.MIDDLEWARE, "cat_service.middleware.CATAuthenticationMiddleware"]
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": service_entity.type.name,
+        "SERVICE_NAME": service_entity.name,
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "MIDDLEWARE_PATHS": ["/example/"],
+        "TIMESTAMP_FORMAT": "epoch",
+        "NONCE_REPLAY_PROTECTION": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+    return settings
+
+
+def test_middleware(client: Client, cat_settings):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_name = cat_settings.CAT_SETTINGS["SERVICE_TYPE"]
+    nonce = secrets.token_urlsafe()
+    valid_until = int(time.time()) + 60
+
+    with use_test_client_for_http(client):
+        cat = create_cat_header(identity=identity, service_name=service_name, valid_until=str(valid_until), nonce=nonce)
+
+    headers = {
+        "HTTP_AUTHORIZATION": cat,
+        "HTTP_CAT_IDENTITY": identity,
+        "HTTP_CAT_SERVICE_NAME": service_name,
+        "HTTP_CAT_VALID_UNTIL": str(valid_until),
+        "HTTP_CAT_NONCE": nonce,
+    }
+
+    # CAT is verified only once, in the middleware, so its nonce is not seen as reused by the view.
+    with patch("cat_service.core.compare_cat", wraps=core.compare_cat) as compare_cat:
+        response = client.get(reverse("example_claims"), **headers)
+
+    assert response.status_code == 200
+    compare_cat.assert_called_once()
+    assert response.json() == {
+        "claims": {
+            "identity": identity,
+            "service_name": service_name,
+            "timestamp": None,
+            "valid_until": valid_until,
+            "nonce": nonce,
+            "extra": {},
+        },
+    }
+
+    response = client.get(reverse("example_claims"), **headers)
+
+    assert response.status_code == 401
+    assert response["WWW-Authenticate"] == cat_service_settings.AUTH_SCHEME
+    assert response.json() == {"detail": "'CAT-Nonce' has already been used."}
+
+
+def test_middleware__invalid_cat(client: Client, cat_settings):
+    user = UserFactory.create()
+    service_name = cat_settings.CAT_SETTINGS["SERVICE_TYPE"]
+
+    with use_test_client_for_http(client), patch("tests.example.views.ExampleView.get") as view:
+        response = client.get(
+            reverse("example"),
+            HTTP_AUTHORIZATION=f"{cat_service_settings.AUTH_SCHEME} foo",
+            HTTP_CAT_IDENTITY=str(user.pk),
+            HTTP_CAT_SERVICE_NAME=service_name,
+        )
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid CAT."}
+    view.assert_not_called()
+
+
+def test_middleware__path_not_authenticated(client: Client, cat_settings):
+    cat_settings.CAT_SETTINGS = {**cat_settings.CAT_SETTINGS, "MIDDLEWARE_PATHS": ["/other/"]}
+
+    with patch.object(CATAuthenticationMiddleware, "authentication_class") as authentication_class:
+        response = client.get(reverse("example"))
+
+    # Request is still authenticated by the view.
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Missing Authorization header."}
+    authentication_class.assert_not_called()
+
+
+def test_middleware__async(client: Client, cat_settings, rf):
+    user = UserFactory.create()
+    identity = str(user.pk)
+    service_name = cat_settings.CAT_SETTINGS["SERVICE_TYPE"]
+
+    with use_test_client_for_async_http(client):
+        cat = async_to_sync(acreate_cat)(identity=identity, service_name=service_name)
+
+    async def get_response(request):
+        return HttpResponse()
+
+    middleware = CATAuthenticationMiddleware(get_response)
+    request = rf.get(
+        reverse("example"),
+        HTTP_AUTHORIZATION=f"{cat_service_settings.AUTH_SCHEME} {cat}",
+        HTTP_CAT_IDENTITY=identity,
+        HTTP_CAT_SERVICE_NAME=service_name,
+    )
+
+    response = async_to_sync(middleware)(request)
+
+    assert response.status_code == 200
+    _, authenticated_user, claims = getattr(request, AUTHENTICATED_ATTRIBUTE)
+    assert authenticated_user == user
+    assert claims == CATClaims(identity=identity, service_name=service_name)
@@ -0,0 +1,69 @@
+import datetime
+
+from cat_service.nonces import NonceReplayStore, NonceStoreStats, get_nonce_expiry
+
+
+def test_nonce_replay_store():
+    store = NonceReplayStore(window=60, buckets=6)
+
+    assert store.add("foo", "a", expires_at=130, now=100) is True
+    assert store.add("foo", "a", expires_at=130, now=101) is False
+    assert store.add("foo", "b", expires_at=130, now=102) is True
+    assert store.add("bar", "a", expires_at=130, now=103) is True
+
+    assert store.stats == NonceStoreStats(size=3, evictions=0)
+
+
+def test_nonce_replay_store__expire():
+    store = NonceReplayStore(window=60, buckets=6)
+
+    assert store.add("foo", "a", expires_at=115, now=100) is True
+    assert store.add("foo", "b", expires_at=150, now=100) is True
+
+    # Nonce "a" expires with its bucket, nonce "b" is still remembered.
+    assert store.add("foo", "a", expires_at=150, now=125) is True
+    assert store.add("foo", "b", expires_at=150, now=125) is False
+
+    assert store.stats == NonceStoreStats(size=2, evictions=1)
+
+
+def test_nonce_replay_store__expiry_limited_to_window():
+    store = NonceReplayStore(window=60, buckets=6)
+
+    assert store.add("foo", "a", expires_at=1000, now=100) is True
+    assert store.add("foo", "a", expires_at=1000, now=159) is False
+    assert store.add("foo", "a", expires_at=1000, now=171) is True
+
+
+def test_nonce_replay_store__end_of_window():
+    store = NonceReplayStore(window=300, buckets=60)
+    now = 1004.9
+    expires_at = now + 300
+
+    assert store.add("1", "n", expires_at=expires_at, now=now) is True
+    # Nonce is remembered until it expires, even when it expires partway into a time slice.
+    assert store.add("1", "n", expires_at=expires_at, now=expires_at - 0.5) is False
+    assert store.add("1", "n", expires_at=expires_at + 300, now=expires_at + 5) is True
+
+
+def test_get_nonce_expiry():
+    timestamp = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    valid_until = datetime.datetime(2024, 1, 1, 0, 1)
+
+    assert get_nonce_expiry(timestamp=timestamp, valid_until=valid_until, window=10) == 1704067260
+    assert get_nonce_expiry(timestamp=timestamp, valid_until=None, window=10) == 1704067210
+    assert get_nonce_expiry(timestamp=None, valid_until=None, window=10) is None
+
+
+def test_nonce_replay_store__many_nonces():
+    store = NonceReplayStore(window=60, buckets=6)
+
+    for i in range(1000):
+        assert store.add("foo", str(i), expires_at=100 + i % 60, now=100) is True
+
+    assert store.stats.size == 1000
+    assert store.add("foo", "999", expires_at=150, now=100) is False
+
+    # All nonces have expired by the end of the window.
+    assert store.add("foo", "999", expires_at=200, now=170) is True
+    assert store.stats == NonceStoreStats(size=1, evictions=1000)
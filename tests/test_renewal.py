@@ -0,0 +1,146 @@
+import datetime
+import itertools
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from django.test.client import Client
+from rest_framework.reverse import reverse
+
+from cat_ca.cryptography import get_ca_certificate
+from cat_ca.settings import cat_ca_settings
+from cat_common.settings import cat_common_settings
+from cat_service.cryptography import get_certificate, get_certificate_renewer
+from cat_service.renewal import CertificateRenewer
+from tests.helpers import use_test_client_for_http
+
+serial_numbers = itertools.count()
+
+
+def create_certificate(validity: datetime.timedelta) -> SimpleNamespace:
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    return SimpleNamespace(
+        serial_number=next(serial_numbers),
+        not_valid_before_utc=now,
+        not_valid_after_utc=now + validity,
+    )
+
+
+def test_certificate_renewer():
+    certificates = [create_certificate(datetime.timedelta(seconds=0.2))]
+    renewed = threading.Event()
+
+    def renew():
+        certificates.append(create_certificate(datetime.timedelta(days=1)))
+        renewed.set()
+
+    renewer = CertificateRenewer(
+        get_certificate=lambda: certificates[-1],
+        renew=renew,
+        fraction=0.5,
+        jitter=0,
+        retry_interval=60,
+    )
+    renewer.start()
+    try:
+        assert renewed.wait(1)
+    finally:
+        renewer.stop(timeout=1)
+
+    assert len(certificates) == 2
+
+
+def test_certificate_renewer__retry_on_failure():
+    certificate = create_certificate(datetime.timedelta(seconds=0.1))
+    calls = 0
+    renewed = threading.Event()
+
+    def renew():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            msg = "CA not available"
+            raise ValueError(msg)
+        renewed.set()
+
+    renewer = CertificateRenewer(
+        get_certificate=lambda: certificate,
+        renew=renew,
+        fraction=0.5,
+        jitter=0,
+        retry_interval=0.1,
+    )
+    renewer.start()
+    try:
+        assert renewed.wait(1)
+    finally:
+        renewer.stop(timeout=1)
+
+    assert calls == 2
+
+
+def test_certificate_renewer__renewal_time_with_jitter():
+    certificate = create_certificate(datetime.timedelta(days=10))
+    renewer = CertificateRenewer(
+        get_certificate=lambda: certificate,
+        renew=lambda: None,
+        fraction=0.75,
+        jitter=0.05,
+        retry_interval=60,
+    )
+
+    start = certificate.not_valid_before_utc.timestamp()
+    renewal_time = renewer.get_renewal_time(certificate)
+
+    assert start + 7 * 86400 <= renewal_time <= start + 8 * 86400
+    # Renewal time is the same until the certificate changes.
+    assert renewer.get_renewal_time(certificate) == renewal_time
+
+
+@pytest.mark.django_db
+def test_certificate_renewer__started_when_certificate_is_fetched(client: Client, settings):
+    certificate = get_ca_certificate()
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": cat_common_settings.CA_NAME,
+        "CAT_ROOT_KEY": cat_ca_settings.CAT_ROOT_KEY,
+        "SERVICE_TYPE": "foo",
+        "SERVICE_NAME": "bar",
+        "VERIFICATION_KEY_URL": reverse("cat_ca:cat_verification_key"),
+        "CERTIFICATE_URL": reverse("cat_ca:cat_certificate"),
+        "CERTIFICATE_RENEWAL": True,
+        "CA_CERTIFICATE": certificate,
+        "CA_PRIVATE_KEY": cat_ca_settings.CA_PRIVATE_KEY,
+    }
+
+    with use_test_client_for_http(client), patch.object(CertificateRenewer, "start") as start:
+        get_certificate()
+
+    start.assert_called_once()
+    assert get_certificate_renewer().fraction == 0.75
+
+
+def test_certificate_renewer__restart_after_fork():
+    certificate = create_certificate(datetime.timedelta(days=1))
+    renewer = CertificateRenewer(
+        get_certificate=lambda: certificate,
+        renew=lambda: None,
+        fraction=0.5,
+        jitter=0,
+        retry_interval=60,
+    )
+    renewer.start()
+    try:
+        thread = renewer._thread
+
+        # Renewal thread is only woken up if it's running in this process.
+        renewer.start()
+        assert renewer._thread is thread
+
+        with patch("cat_service.renewal.os.getpid", return_value=-1):
+            renewer.start()
+
+        assert renewer._thread is not thread
+    finally:
+        renewer.stop(timeout=1)
@@ -0,0 +1,124 @@
+import datetime
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from cat_service.cryptography import get_cat_verification_key, refresh_flight
+from cat_service.exceptions import CAUnavailableError
+from cat_service.resilience import CircuitBreaker, call_ca, get_ca_circuit_breaker
+
+
+def response(status_code: int, **kwargs) -> httpx.Response:
+    return httpx.Response(status_code, request=httpx.Request("POST", "https://ca.example.com"), **kwargs)
+
+
+@pytest.fixture
+def ca_settings(settings):
+    settings.CAT_SETTINGS = {
+        "SERVICE_TYPE": "foo",
+        "SERVICE_NAME": "bar",
+        "VERIFICATION_KEY_URL": "https://ca.example.com/verification-key",
+        "CERTIFICATE_URL": "https://ca.example.com/certificate",
+        "VERIFICATION_KEY": "key",
+        "CA_RETRY_BACKOFF": datetime.timedelta(0),
+    }
+    return settings
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(threshold=2, timeout=0.05)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.failing_for > 0
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+    # A single call is let through after the timeout.
+    time.sleep(0.05)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+    assert breaker.failing_for == 0
+
+
+def test_circuit_breaker__disabled():
+    breaker = CircuitBreaker(threshold=0, timeout=60)
+
+    for _ in range(10):
+        breaker.record_failure()
+
+    assert breaker.allow()
+
+
+def test_call_ca__retry(ca_settings):
+    responses = [response(503), response(200, json={"foo": "bar"})]
+
+    assert call_ca(lambda: responses.pop(0)).json() == {"foo": "bar"}
+    assert get_ca_circuit_breaker().failing_for == 0
+
+
+def test_call_ca__no_retry_for_client_error(ca_settings):
+    calls = 0
+
+    def request():
+        nonlocal calls
+        calls += 1
+        return response(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        call_ca(request)
+
+    assert calls == 1
+
+
+def test_call_ca__fail_fast_when_circuit_is_open(ca_settings):
+    ca_settings.CAT_SETTINGS = {**ca_settings.CAT_SETTINGS, "CA_CIRCUIT_BREAKER_THRESHOLD": 3}
+    calls = 0
+
+    def request():
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectError("CA is down")
+
+    with pytest.raises(httpx.ConnectError):
+        call_ca(request)
+
+    assert calls == 3
+
+    with pytest.raises(CAUnavailableError):
+        call_ca(request)
+
+    assert calls == 3
+
+
+def test_get_cat_verification_key__stale_if_error(ca_settings):
+    with patch("cat_service.http.httpx.Client.post", return_value=response(503)):
+        assert get_cat_verification_key(force_refresh=True) == "key"
+
+
+def test_get_cat_verification_key__stale_if_error__grace_period_passed(ca_settings):
+    ca_settings.CAT_SETTINGS = {**ca_settings.CAT_SETTINGS, "CA_STALE_IF_ERROR": datetime.timedelta(0)}
+
+    with (
+        patch("cat_service.http.httpx.Client.post", return_value=response(503)),
+        pytest.raises(httpx.HTTPStatusError),
+    ):
+        get_cat_verification_key(force_refresh=True)
+
+
+def test_get_cat_verification_key__stale_while_revalidate(ca_settings):
+    with (
+        patch.object(refresh_flight, "in_flight", return_value=True),
+        patch("cat_service.http.httpx.Client.post") as post,
+    ):
+        assert get_cat_verification_key(force_refresh=True) == "key"
+
+    post.assert_not_called()
@@ -0,0 +1,51 @@
+from cat_service.authentication import CATAuthentication
+from cat_service.schema import _schemas, get_cat_header_schema
+
+
+def test_header_schema():
+    schema = get_cat_header_schema(CATAuthentication.header_validators)
+
+    assert schema.valid_headers == {
+        "CAT-Identity",
+        "CAT-Service-Name",
+        "CAT-Timestamp",
+        "CAT-Valid-Until",
+        "CAT-Nonce",
+    }
+    assert schema.required_headers == {"CAT-Identity", "CAT-Service-Name"}
+    assert schema.meta_keys["HTTP_CAT_SERVICE_NAME"] == "CAT-Service-Name"
+    assert schema.claim_names["CAT-Valid-Until"] == "valid_until"
+    assert schema.validators == CATAuthentication.header_validators
+
+
+def test_header_schema__cached():
+    schema_1 = get_cat_header_schema(CATAuthentication.header_validators)
+    schema_2 = get_cat_header_schema(CATAuthentication.header_validators)
+
+    assert schema_1 is schema_2
+
+
+def test_header_schema__rebuilt_on_settings_change(settings):
+    schema_1 = get_cat_header_schema(CATAuthentication.header_validators)
+
+    settings.CAT_SETTINGS = {
+        "CA_NAME": "ca",
+        "ADDITIONAL_VALID_CAT_HEADERS": ["CAT-Food"],
+        "ADDITIONAL_REQUIRED_CAT_HEADERS": ["CAT-Food"],
+    }
+
+    schema_2 = get_cat_header_schema(CATAuthentication.header_validators)
+
+    assert schema_1 is not schema_2
+    assert "CAT-Food" in schema_2.valid_headers
+    assert "CAT-Food" in schema_2.required_headers
+    assert schema_2.meta_keys["HTTP_CAT_FOOD"] == "CAT-Food"
+    assert "CAT-Food" not in schema_2.validators
+
+
+def test_header_schema__bounded():
+    for _ in range(1000):
+        get_cat_header_schema(dict(CATAuthentication.header_validators))
+
+    assert len(_schemas) <= _schemas.maxsize
+    assert get_cat_header_schema(CATAuthentication.header_validators) is not None
@@ -1,3 +1,6 @@
+import pytest
+
+from cat_common import authentication, utils
 from cat_service.utils import as_human_readable_list, snake_case_to_header_case
 
 
@@ -18,3 +21,12 @@ def test_snake_case_to_header_case():
     assert snake_case_to_header_case("snake") == "Snake"
     assert snake_case_to_header_case("snake_case") != "snake_case"
     assert snake_case_to_header_case("snake_case_longer") == "Snake-Case-Longer"
+
+
+def test_get_authorization_header__moved():
+    from cat_common.utils import get_authorization_header  # noqa: PLC0415
+
+    assert get_authorization_header is authentication.get_authorization_header
+
+    with pytest.raises(AttributeError):
+        utils.foo  # noqa: B018